@@ -0,0 +1,172 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+class Connectivity(object):
+    """
+    Disjoint sets over the roads and intersections of a map, joined wherever a road starts or ends at an
+    intersection. Adding roads, intersections and connections only unions sets, so the map stays connected or the
+    number of components is known in O(alpha(n)) after every edit.
+
+    Union-find cannot split a set, so removing a road, an intersection or a connection only marks its component. A
+    marked component is rebuilt from its own members the next time the components are queried, which costs as much
+    as that component, and many removals between two queries share one rebuild.
+
+    Road id r and intersection id i are the nodes 2r and 2i + 1.
+    """
+
+    def __init__(self):
+        self.parent = []
+        self.size = []
+        self.alive = []
+        # members of every set, by root, so a marked component can be rebuilt without looking at the rest of the map
+        self.members = {}
+        # intersection nodes at the ends of every road node
+        self.road_ends = {}
+        self.dirty_roots = set()
+        self.count = 0
+
+    def add_road(self, road_id):
+        """
+        Adds a road that is not connected to anything yet
+        :param road_id: id of the road in the model
+        :return: None
+        """
+        self._add_node(2 * road_id)
+
+    def add_intersection(self, intersection_id):
+        """
+        Adds an intersection that is not connected to anything yet
+        :param intersection_id: id of the intersection in the model
+        :return: None
+        """
+        self._add_node(2 * intersection_id + 1)
+
+    def set_road_ends(self, road_id, start_id, end_id):
+        """
+        Records the intersections a road starts and ends at
+        :param road_id: id of the road
+        :param start_id: id of the intersection at the start of the road, negative if there is none
+        :param end_id: id of the intersection at the end of the road, negative if there is none
+        :return: None
+        """
+        node = 2 * road_id
+        ends = tuple(2 * intersection_id + 1 for intersection_id in (start_id, end_id)
+                     if intersection_id >= 0)
+        old_ends = self.road_ends.get(node, ())
+        if ends == old_ends:
+            return
+
+        self.road_ends[node] = ends
+        if any(end not in ends for end in old_ends):
+            self.dirty_roots.add(self.find(node))
+        for end in ends:
+            if end not in old_ends:
+                self._union(node, end)
+
+    def remove_road(self, road_id):
+        """
+        Removes a road, its component is rebuilt on the next query
+        :param road_id: id of the road
+        :return: None
+        """
+        node = 2 * road_id
+        self.road_ends.pop(node, None)
+        self._remove_node(node)
+
+    def remove_intersection(self, intersection_id):
+        """
+        Removes an intersection, its component is rebuilt on the next query. The roads connected to it are expected to
+        have their ends recorded without it already.
+        :param intersection_id: id of the intersection
+        :return: None
+        """
+        self._remove_node(2 * intersection_id + 1)
+
+    def component_count(self):
+        """
+        :return: number of connected components formed by the roads and intersections
+        """
+        self._rebuild_dirty()
+        return self.count
+
+    def is_connected(self):
+        """
+        Same result as is_connected_traffic_map for the roads and intersections of the map
+        :return: boolean whether the map is empty or forms a single component
+        """
+        return self.component_count() <= 1
+
+    def find(self, node):
+        """
+        :param node: road or intersection node
+        :return: root node of the set holding the node
+        """
+        parent = self.parent
+        while parent[node] != node:
+            # path halving, every other node on the path is pointed at its grandparent
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def _add_node(self, node):
+        if node < len(self.parent):
+            if self.alive[node]:
+                return
+            # a removed node that is put back is still listed in its old component until that is rebuilt
+            self._rebuild_dirty()
+
+        while len(self.parent) <= node:
+            self.parent.append(len(self.parent))
+            self.size.append(0)
+            self.alive.append(False)
+
+        self.parent[node] = node
+        self.size[node] = 1
+        self.alive[node] = True
+        self.members[node] = [node]
+        self.count += 1
+
+    def _remove_node(self, node):
+        if node >= len(self.alive) or not self.alive[node]:
+            return
+        self.alive[node] = False
+        self.dirty_roots.add(self.find(node))
+
+    def _union(self, first, second):
+        first = self.find(first)
+        second = self.find(second)
+        if first == second:
+            return
+
+        # union by size, the smaller set is hung below the larger one and its members are moved over
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        self.members[first].extend(self.members.pop(second))
+        if second in self.dirty_roots:
+            self.dirty_roots.discard(second)
+            self.dirty_roots.add(first)
+        self.count -= 1
+
+    def _rebuild_dirty(self):
+        dirty_roots = self.dirty_roots
+        self.dirty_roots = set()
+        for root in dirty_roots:
+            members = self.members.pop(root)
+            self.count -= 1
+            alive = [node for node in members if self.alive[node]]
+            for node in members:
+                self.parent[node] = node
+                self.size[node] = 0
+            for node in alive:
+                self.size[node] = 1
+                self.members[node] = [node]
+                self.count += 1
+            for node in alive:
+                for end in self.road_ends.get(node, ()):
+                    if self.alive[end]:
+                        self._union(node, end)
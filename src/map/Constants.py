@@ -4,3 +4,6 @@ ROAD_OUT_EXIT_PT_INDEX = 2
 ROAD_IN_ENTRANCE_PT_INDEX = 3
 
 LANE_WIDTH = 10
+
+# distance outside of a road polygon that still counts as being on the road
+ROAD_EDGE_TOLERANCE = 1e-6
@@ -1,3 +1,6 @@
+from array import array
+
+
 class Coordinates:
     """
     This class represents a two-dimensional coordinate point in the MapBuilder section of our application.
@@ -7,6 +10,8 @@ class Coordinates:
 
     """
 
+    __slots__ = ('x', 'y')
+
     def __init__(self, x_val, y_val):
         """
         Establishes a coordinate point
@@ -29,4 +34,150 @@ class Coordinates:
         """
         :return: y value of the current coordinate point
         """
-        return self.y
\ No newline at end of file
+        return self.y
+
+
+class CoordinateBuffer(object):
+    """
+    This class stores many coordinate points in a single contiguous float64 array laid out as x0, y0, x1, y1, ...
+    Points are addressed by their index in the buffer, and get() returns a BufferedCoordinates view that roads and
+    intersections can hold in place of a Coordinates object.
+
+    """
+
+    def __init__(self, values=None):
+        """
+        Establishes a coordinate buffer
+        :param values: optional flat sequence of x and y values to start with
+
+        :type values: iterable of float
+        """
+        self.data = array('d', values if values is not None else [])
+        if len(self.data) % 2 != 0:
+            raise ValueError('CoordinateBuffer needs an even number of values')
+
+    @classmethod
+    def from_coordinates(cls, coordinates):
+        """
+        Builds a buffer holding a copy of the given coordinate points
+        :param coordinates: coordinate points to copy
+        :type coordinates: iterable of Coordinates
+        :return: new CoordinateBuffer
+        """
+        buffer = cls()
+        buffer.extend(coordinates)
+        return buffer
+
+    def __len__(self):
+        return len(self.data) // 2
+
+    def append(self, x_val, y_val):
+        """
+        Adds a coordinate point to the end of the buffer
+        :param x_val: x value for the coordinate point
+        :param y_val: y value for the coordinate point
+        :return: index of the new point
+        """
+        self.data.append(x_val)
+        self.data.append(y_val)
+        return len(self.data) // 2 - 1
+
+    def extend(self, coordinates):
+        """
+        Adds a copy of every given coordinate point to the end of the buffer
+        :param coordinates: coordinate points to copy
+        :type coordinates: iterable of Coordinates
+        :return: range of the indices of the new points
+        """
+        first = len(self)
+        for coordinate in coordinates:
+            self.data.append(coordinate.get_x())
+            self.data.append(coordinate.get_y())
+        return range(first, len(self))
+
+    def get_x(self, index):
+        """
+        :return: x value of the point at the given index
+        """
+        return self.data[2 * index]
+
+    def get_y(self, index):
+        """
+        :return: y value of the point at the given index
+        """
+        return self.data[2 * index + 1]
+
+    def set(self, index, x_val, y_val):
+        """
+        Moves the point at the given index
+        :param index: index of the point
+        :param x_val: new x value
+        :param y_val: new y value
+        :return: None
+        """
+        self.data[2 * index] = x_val
+        self.data[2 * index + 1] = y_val
+
+    def get(self, index):
+        """
+        :return: view of the point at the given index that shares its storage with the buffer
+        """
+        if not 0 <= index < len(self):
+            raise IndexError('CoordinateBuffer index out of range')
+        return BufferedCoordinates(self, index)
+
+    def to_coordinates(self, index):
+        """
+        :return: standalone Coordinates copy of the point at the given index
+        """
+        return Coordinates(self.data[2 * index], self.data[2 * index + 1])
+
+    def iter_xy(self):
+        """
+        :return: iterator over (x, y) tuples for every point in the buffer
+        """
+        data = self.data
+        return zip(data[0::2], data[1::2])
+
+
+class BufferedCoordinates(object):
+    """
+    This class is a view of a single point stored in a CoordinateBuffer. It offers the same interface as
+    Coordinates, and writes go straight to the buffer.
+
+    """
+
+    __slots__ = ('buffer', 'index')
+
+    def __init__(self, buffer, index):
+        """
+        Establishes a view of a buffered point
+        :param buffer: buffer that holds the point
+        :param index: index of the point in the buffer
+
+        :type buffer: CoordinateBuffer
+        :type index: int
+        """
+        self.buffer = buffer
+        self.index = index
+
+    def get_x(self):
+        """
+        :return: x value of the current coordinate point
+        """
+        return self.buffer.data[2 * self.index]
+
+    def get_y(self):
+        """
+        :return: y value of the current coordinate point
+        """
+        return self.buffer.data[2 * self.index + 1]
+
+    def _set_x(self, x_val):
+        self.buffer.data[2 * self.index] = x_val
+
+    def _set_y(self, y_val):
+        self.buffer.data[2 * self.index + 1] = y_val
+
+    x = property(get_x, _set_x)
+    y = property(get_y, _set_y)
@@ -0,0 +1,321 @@
+import sys
+import os
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# number of commands that can be undone before the oldest ones are forgotten
+DEFAULT_HISTORY_DEPTH = 100
+
+
+class Command(object):
+    """
+    An edit of a map model that can be undone and redone. Commands only record what they change, such as the id of an
+    added road or the old values of edited attributes, so both directions cost as much as the change itself.
+    """
+
+    def do(self, model):
+        """
+        Applies the edit to the model
+        :param model: model to be edited
+        :type model: MapModel
+        :return: None
+        """
+        raise NotImplementedError
+
+    def undo(self, model):
+        """
+        Reverts the edit, leaving the model as it was before do()
+        :param model: model to be edited
+        :type model: MapModel
+        :return: None
+        """
+        raise NotImplementedError
+
+
+class AddRoad(Command):
+    """
+    Adds a road to the model. The road is expected to be linked already: its start and end connections are set and it
+    is in their connection lists. Connecting two intersections is adding a road linked to both of them.
+    """
+
+    def __init__(self, road):
+        """
+        :param road: road to be added
+        :type road: Road
+        """
+        self.map_object = road
+        self.road_id = None
+        self.positions = []
+        self.cycles = []
+
+    def do(self, model):
+        road = self.map_object
+        # put the road back where it was in the connection lists, cycles refer to roads by their position
+        for intersection, position in self.positions:
+            intersection.connections.insert(position, road)
+        for intersection, green_cycle_roads in self.cycles:
+            intersection.green_cycle_roads = green_cycle_roads
+
+        if self.road_id is None:
+            self.road_id = model.add_road(road)
+        else:
+            model.restore_road(self.road_id, road)
+
+    def undo(self, model):
+        road = self.map_object
+        self.positions = []
+        self.cycles = []
+        for intersection in (road.get_start_connection(), road.get_end_connection()):
+            if intersection is not None and road in intersection.connections:
+                self.positions.append((intersection, intersection.connections.index(road)))
+                # removing the road renumbers the cycles, they are put back as they were
+                self.cycles.append((intersection, intersection.green_cycle_roads))
+        model.remove_road(self.road_id)
+
+
+class AddIntersection(Command):
+    """
+    Adds an intersection to the model. Roads ending at it, such as the road it was generated from, are expected to be
+    linked already.
+    """
+
+    def __init__(self, intersection):
+        """
+        :param intersection: intersection to be added
+        :type intersection: Intersection
+        """
+        self.map_object = intersection
+        self.intersection_id = None
+        self.starts = []
+        self.ends = []
+
+    def do(self, model):
+        intersection = self.map_object
+        for road in self.starts:
+            road.add_start_connection(intersection)
+        for road in self.ends:
+            road.add_end_connection(intersection)
+
+        if self.intersection_id is None:
+            self.intersection_id = model.add_intersection(intersection)
+        else:
+            model.restore_intersection(self.intersection_id, intersection)
+
+    def undo(self, model):
+        intersection = self.map_object
+        self.starts = [road for road in intersection.get_connections() if road.get_start_connection() is intersection]
+        self.ends = [road for road in intersection.get_connections() if road.get_end_connection() is intersection]
+        model.remove_intersection(self.intersection_id)
+
+
+class EditObject(Command):
+    """
+    Sets attributes of a road or intersection, such as its lanes, radius, speed limit or yellow light length
+    """
+
+    def __init__(self, map_object, changes):
+        """
+        :param map_object: road or intersection to be edited
+        :param changes: new values by attribute name
+        :type map_object: Road or Intersection
+        :type changes: dict
+        """
+        self.map_object = map_object
+        self.changes = changes
+        self.old_values = None
+
+    def do(self, model):
+        self.old_values = {name: getattr(self.map_object, name) for name in self.changes}
+        self._set(model, self.changes)
+
+    def undo(self, model):
+        self._set(model, self.old_values)
+
+    def _set(self, model, values):
+        for name, value in values.items():
+            setattr(self.map_object, name, value)
+        model.update(self.map_object)
+
+
+class AddCycle(Command):
+    """
+    Adds a traffic light cycle to an intersection
+    """
+
+    def __init__(self, intersection, name, roads, time):
+        """
+        :param intersection: intersection the cycle is added to
+        :param name: name of the cycle
+        :param roads: positions in the connection list of the roads that get a green light
+        :param time: length of the cycle in milliseconds
+
+        :type intersection: Intersection
+        :type name: str
+        :type roads: list of int
+        :type time: int
+        """
+        self.map_object = intersection
+        self.name = name
+        self.roads = roads
+        self.time = time
+
+    def do(self, model):
+        self.map_object.add_cycle(self.name, self.roads, self.time)
+        model.update(self.map_object)
+
+    def undo(self, model):
+        intersection = self.map_object
+        intersection.cycle_names.pop()
+        intersection.green_cycle_roads.pop()
+        intersection.green_cycle_times.pop()
+        model.update(intersection)
+
+
+class ResetLight(Command):
+    """
+    Removes every cycle of an intersection and sets its yellow light back to the default length
+    """
+
+    def __init__(self, intersection):
+        """
+        :param intersection: intersection whose light is reset
+        :type intersection: Intersection
+        """
+        self.map_object = intersection
+        self.old_light = None
+
+    def do(self, model):
+        intersection = self.map_object
+        self.old_light = (intersection.cycle_names, intersection.green_cycle_roads, intersection.green_cycle_times,
+                          intersection.yellow_light_length)
+        # reset_light() replaces the lists, so the old ones can be kept as they are
+        intersection.reset_light()
+        model.update(intersection)
+
+    def undo(self, model):
+        intersection = self.map_object
+        (intersection.cycle_names, intersection.green_cycle_roads, intersection.green_cycle_times,
+         intersection.yellow_light_length) = self.old_light
+        model.update(intersection)
+
+
+class AttachProfile(Command):
+    """
+    Attaches a spawning profile to an intersection
+    """
+
+    def __init__(self, intersection, profile):
+        """
+        :param intersection: intersection the profile is attached to
+        :param profile: profile to be attached
+        :type intersection: Intersection
+        :type profile: SpawningProfile
+        """
+        self.map_object = intersection
+        self.profile = profile
+
+    def do(self, model):
+        self.map_object.add_spawning_profile(self.profile)
+        model.update(self.map_object)
+
+    def undo(self, model):
+        self.map_object.spawn_profiles.pop()
+        model.update(self.map_object)
+
+
+class DetachProfile(Command):
+    """
+    Removes a spawning profile from an intersection
+    """
+
+    def __init__(self, intersection, profile):
+        """
+        :param intersection: intersection the profile is removed from
+        :param profile: profile to be removed
+        :type intersection: Intersection
+        :type profile: SpawningProfile
+        """
+        self.map_object = intersection
+        self.profile = profile
+        self.position = None
+
+    def do(self, model):
+        self.position = self.map_object.spawn_profiles.index(self.profile)
+        self.map_object.spawn_profiles.pop(self.position)
+        model.update(self.map_object)
+
+    def undo(self, model):
+        self.map_object.spawn_profiles.insert(self.position, self.profile)
+        model.update(self.map_object)
+
+
+class History(object):
+    """
+    This class runs edits of a map model as commands and keeps them so they can be undone and redone. Only the last
+    depth commands are kept, so memory stays bounded however long the map is edited.
+    """
+
+    def __init__(self, model, depth=DEFAULT_HISTORY_DEPTH):
+        """
+        Establishes an empty history
+
+        :param model: model the commands edit
+        :param depth: maximum number of commands that can be undone
+
+        :type model: MapModel
+        :type depth: int
+        """
+        self.model = model
+        self.undo_stack = deque(maxlen=depth)
+        self.redo_stack = deque(maxlen=depth)
+
+    def execute(self, command):
+        """
+        Applies a command and records it. Commands undone before can no longer be redone afterwards.
+        :param command: command to be applied
+        :type command: Command
+        :return: the command
+        """
+        command.do(self.model)
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+        return command
+
+    def undo(self):
+        """
+        Reverts the last applied command
+        :return: the reverted command, None if there is nothing to undo
+        """
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        command.undo(self.model)
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self):
+        """
+        Applies the last reverted command again
+        :return: the applied command, None if there is nothing to redo
+        """
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        command.do(self.model)
+        self.undo_stack.append(command)
+        return command
+
+    def can_undo(self):
+        return len(self.undo_stack) > 0
+
+    def can_redo(self):
+        return len(self.redo_stack) > 0
+
+    def clear(self):
+        """
+        Forgets every command, for example when the model is cleared
+        :return: None
+        """
+        self.undo_stack.clear()
+        self.redo_stack.clear()
@@ -0,0 +1,233 @@
+import sys
+import os
+import math
+from array import array
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# arrays of a LaneGraph in the order they are stored, with their array typecodes
+LANE_GRAPH_ARRAYS = (('road_lane_offsets', 'i'), ('road_forward_lanes', 'i'), ('lane_roads', 'i'),
+                     ('lane_offsets', 'i'), ('lane_targets', 'i'), ('edge_movements', 'i'),
+                     ('intersection_movement_offsets', 'i'), ('movement_from_roads', 'i'),
+                     ('movement_to_roads', 'i'), ('movement_turn_angles', 'd'), ('movement_cycle_offsets', 'i'),
+                     ('movement_cycles', 'i'))
+
+
+class LaneGraph(object):
+    """
+    This class is the lane level directed graph of a map, the form the simulator drives vehicles on. Every lane of
+    every road is a node, and an edge leads from a lane arriving at an intersection to each lane it can turn into.
+    The edges through an intersection from one road to another form a turn movement.
+
+    Everything is stored in flat arrays indexed by id, with CSR (compressed sparse row) offsets where a node has a
+    variable number of entries: the entries of node n are at offsets[n] up to offsets[n + 1]. Roads and
+    intersections have the ids export_xml gives them, their positions in the map lists.
+
+    The lanes of road r are road_lane_offsets[r] up to road_lane_offsets[r + 1]. The first road_forward_lanes[r] of
+    them run from the start to the end of the road, the road's out lanes, and the rest run back, its in lanes. In
+    both directions the lane nearest the median comes first.
+    """
+
+    def __init__(self):
+        for name, typecode in LANE_GRAPH_ARRAYS:
+            setattr(self, name, array(typecode))
+
+    def lane_count(self):
+        """
+        :return: number of lanes in the graph
+        """
+        return len(self.lane_roads)
+
+    def movement_count(self):
+        """
+        :return: number of turn movements in the graph
+        """
+        return len(self.movement_from_roads)
+
+    def road_lanes(self, road_id):
+        """
+        :param road_id: id of a road
+        :return: range of the ids of the lanes of the road
+        """
+        return range(self.road_lane_offsets[road_id], self.road_lane_offsets[road_id + 1])
+
+    def successors(self, lane):
+        """
+        :param lane: id of a lane
+        :return: array of the lanes that can be driven onto from the end of the lane
+        """
+        return self.lane_targets[self.lane_offsets[lane]:self.lane_offsets[lane + 1]]
+
+    def intersection_movements(self, intersection_id):
+        """
+        :param intersection_id: id of an intersection
+        :return: range of the ids of the turn movements through the intersection
+        """
+        return range(self.intersection_movement_offsets[intersection_id],
+                     self.intersection_movement_offsets[intersection_id + 1])
+
+    def green_cycles(self, movement):
+        """
+        :param movement: id of a turn movement
+        :return: array of the indices of the cycles of its intersection that give the movement green, empty if the
+        intersection has no traffic cycle
+        """
+        return self.movement_cycles[self.movement_cycle_offsets[movement]:self.movement_cycle_offsets[movement + 1]]
+
+
+class Approach(object):
+    """
+    The lanes of one road on the side of an intersection, either arriving at it or departing from it
+    """
+
+    def __init__(self, road_id, first_lane, lanes, heading):
+        """
+        :param road_id: id of the road
+        :param first_lane: id of the lane nearest the median
+        :param lanes: number of lanes
+        :param heading: direction the lanes are driven in, in Road.angle terms
+        """
+        self.road_id = road_id
+        self.first_lane = first_lane
+        self.lanes = lanes
+        self.heading = heading
+
+
+def compile_lane_graph(roads, intersections):
+    """
+    Compiles a map into its lane graph. At every intersection each road arriving with lanes gets a turn movement to
+    every other road departing with lanes, U-turns back onto the same road are left out. The arriving lanes are
+    spread evenly over the departing ones, so equal lane counts map lane to lane and every lane on either side is
+    used. A movement is green in the cycles listing the connection index of its arriving road.
+
+    Every road and intersection is handled once and the edges are placed into their CSR rows with a counting sort,
+    so compiling takes time linear in the size of the graph.
+    :param roads: list of the roads in the map
+    :param intersections: list of the intersections in the map
+    :return: LaneGraph of the map
+    """
+    graph = LaneGraph()
+    road_ids = dict((road, index) for index, road in enumerate(roads))
+
+    graph.road_lane_offsets.append(0)
+    for road_id, road in enumerate(roads):
+        graph.road_forward_lanes.append(road.get_out_lanes())
+        lanes = road.get_out_lanes() + road.get_in_lanes()
+        graph.lane_roads.extend([road_id] * lanes)
+        graph.road_lane_offsets.append(graph.road_lane_offsets[road_id] + lanes)
+
+    sources = array('i')
+    targets = array('i')
+    movements = array('i')
+    graph.intersection_movement_offsets.append(0)
+    graph.movement_cycle_offsets.append(0)
+    for intersection in intersections:
+        arrivals, departures = intersection_approaches(intersection, road_ids, graph)
+        for arrival, cycles in arrivals:
+            for departure in departures:
+                if departure.road_id == arrival.road_id:
+                    continue
+                movement = len(graph.movement_from_roads)
+                graph.movement_from_roads.append(arrival.road_id)
+                graph.movement_to_roads.append(departure.road_id)
+                graph.movement_turn_angles.append(turn_angle(arrival.heading, departure.heading))
+                graph.movement_cycles.extend(cycles)
+                graph.movement_cycle_offsets.append(len(graph.movement_cycles))
+                for lane, target in lane_pairs(arrival, departure):
+                    sources.append(lane)
+                    targets.append(target)
+                    movements.append(movement)
+        graph.intersection_movement_offsets.append(len(graph.movement_from_roads))
+
+    # counting sort of the edges by their source lane
+    lane_count = graph.lane_count()
+    counts = [0] * (lane_count + 1)
+    for lane in sources:
+        counts[lane + 1] += 1
+    for lane in range(lane_count):
+        counts[lane + 1] += counts[lane]
+    graph.lane_offsets = array('i', counts)
+    graph.lane_targets = array('i', [0]) * len(targets)
+    graph.edge_movements = array('i', [0]) * len(movements)
+    next_slot = counts[:-1]
+    for lane, target, movement in zip(sources, targets, movements):
+        slot = next_slot[lane]
+        graph.lane_targets[slot] = target
+        graph.edge_movements[slot] = movement
+        next_slot[lane] = slot + 1
+    return graph
+
+
+def intersection_approaches(intersection, road_ids, graph):
+    """
+    Finds the lanes arriving at and departing from an intersection. A road ending at the intersection arrives on its
+    forward lanes and departs on the lanes running back, a road starting at it the other way around. Roads that
+    are not in the map are left out.
+    :param intersection: intersection whose roads are looked at
+    :param road_ids: dictionary from road to its id
+    :param graph: lane graph holding the lanes of the roads
+    :return: tuple of the list of (arriving Approach, indices of the cycles giving it green) pairs and the list of
+    departing Approach
+    """
+    # a road starting and ending at the intersection is connected to it twice
+    connected_roads = []
+    connection_indices = {}
+    for index, road in enumerate(intersection.get_connections()):
+        if road not in connection_indices:
+            connected_roads.append(road)
+            connection_indices[road] = []
+        connection_indices[road].append(index)
+
+    arrivals = []
+    departures = []
+    for road in connected_roads:
+        indices = connection_indices[road]
+        road_id = road_ids.get(road)
+        if road_id is None:
+            continue
+        forward = Approach(road_id, graph.road_lane_offsets[road_id], road.get_out_lanes(), road.get_angle())
+        backward = Approach(road_id, forward.first_lane + forward.lanes, road.get_in_lanes(),
+                            road.get_angle() + math.pi)
+        cycles = [cycle for cycle, cycle_roads in enumerate(intersection.green_cycle_roads)
+                  if any(index in cycle_roads for index in indices)]
+        if road.get_end_connection() is intersection:
+            arrivals.append((forward, cycles))
+            departures.append(backward)
+        if road.get_start_connection() is intersection:
+            arrivals.append((backward, cycles))
+            departures.append(forward)
+
+    arrivals = [(arrival, cycles) for arrival, cycles in arrivals if arrival.lanes > 0]
+    departures = [departure for departure in departures if departure.lanes > 0]
+    return arrivals, departures
+
+
+def lane_pairs(arrival, departure):
+    """
+    Spreads the arriving lanes evenly over the departing ones. Arriving lane i of n covers the departing lanes from
+    i * m / n up to (i + 1) * m / n of m, so every lane on both sides gets at least one pair.
+    :param arrival: arriving Approach
+    :param departure: departing Approach
+    :return: list of (arriving lane, departing lane) pairs
+    """
+    pairs = []
+    arriving = arrival.lanes
+    departing = departure.lanes
+    for lane in range(arriving):
+        first = lane * departing // arriving
+        last = max(first, ((lane + 1) * departing - 1) // arriving)
+        for target in range(first, last + 1):
+            pairs.append((arrival.first_lane + lane, departure.first_lane + target))
+    return pairs
+
+
+def turn_angle(arriving_heading, departing_heading):
+    """
+    :param arriving_heading: direction of the arriving lanes, in Road.angle terms
+    :param departing_heading: direction of the departing lanes
+    :return: change of direction through the intersection in (-PI, PI], 0 when driving straight on
+    """
+    angle = (departing_heading - arriving_heading) % (2 * math.pi)
+    if angle > math.pi:
+        angle -= 2 * math.pi
+    return angle
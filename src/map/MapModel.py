@@ -0,0 +1,540 @@
+import sys
+import os
+import gc
+from array import array
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.SpatialIndex import SpatialIndex
+from src.map.Connectivity import Connectivity
+
+NO_CONNECTION = -1
+
+
+def copy_object(map_object):
+    """
+    Makes a shallow copy of a road or intersection. Copying the attribute dict directly is several times faster than
+    copy.copy, which matters when a snapshot copies every object of a large map on the editing thread.
+    :param map_object: road or intersection to be copied
+    :return: the copy
+    """
+    copied = object.__new__(type(map_object))
+    object.__setattr__(copied, '__dict__', dict(map_object.__dict__))
+    return copied
+
+
+class RoadColumns(object):
+    """
+    Struct-of-arrays storage for the roads of a map. Row i of every column belongs to the road with id i.
+    Rows of removed roads stay in place with alive set to 0 so that ids never shift.
+    """
+
+    def __init__(self):
+        self.start_x = array('d')
+        self.start_y = array('d')
+        self.end_x = array('d')
+        self.end_y = array('d')
+        self.length = array('d')
+        self.angle = array('d')
+        self.in_lanes = array('l')
+        self.out_lanes = array('l')
+        self.speed_limit = array('d')
+        self.start_intersection = array('l')
+        self.end_intersection = array('l')
+        self.alive = array('b')
+
+
+class IntersectionColumns(object):
+    """
+    Struct-of-arrays storage for the intersections of a map. Row i of every column belongs to the intersection
+    with id i. Rows of removed intersections stay in place with alive set to 0 so that ids never shift.
+    """
+
+    def __init__(self):
+        self.center_x = array('d')
+        self.center_y = array('d')
+        self.radius = array('d')
+        self.speed_limit = array('d')
+        self.alive = array('b')
+
+
+class MapModel(object):
+    """
+    This class holds a whole traffic map: its roads, intersections and profiles. Every road and intersection gets a
+    stable integer id when it is added, which is also its row in the road or intersection columns. The model does
+    not depend on Qt, so the MapBuilder, the exporter and headless tools can all share it.
+
+    Road and Intersection objects stay the editable representation of the map. Whenever one of them is changed
+    outside of the model, update() has to be called so the columns and the spatial index follow.
+
+    Listeners registered with add_listener() are called as listener(map_object, dirty_bounds) after every change.
+    dirty_bounds lists the bounding boxes the object covered before and after the change, and both arguments are
+    None when the whole map changed.
+    """
+
+    def __init__(self):
+        self.road_columns = RoadColumns()
+        self.intersection_columns = IntersectionColumns()
+        self.road_objects = []
+        self.intersection_objects = []
+        self.road_ids = {}
+        self.intersection_ids = {}
+        self.driver_profiles = []
+        self.vehicle_profiles = []
+        self.spawning_profiles = []
+        self.spatial_index = SpatialIndex()
+        self.connectivity = Connectivity()
+        self.version = 0
+        self.listeners = []
+        self._adjacency = None
+        self._adjacency_version = None
+
+    def clear(self, keep_profiles=False):
+        """
+        Removes every road and intersection from the model. Ids start from zero again afterwards.
+        :param keep_profiles: whether the driver, vehicle and spawning profiles should be kept
+        :type keep_profiles: bool
+        :return: None
+        """
+        self.road_columns = RoadColumns()
+        self.intersection_columns = IntersectionColumns()
+        self.road_objects = []
+        self.intersection_objects = []
+        self.road_ids = {}
+        self.intersection_ids = {}
+        self.spatial_index.clear()
+        self.connectivity = Connectivity()
+        if not keep_profiles:
+            del self.driver_profiles[:]
+            del self.vehicle_profiles[:]
+            del self.spawning_profiles[:]
+        self.version += 1
+        self._notify(None, None)
+
+    def add_listener(self, listener):
+        """
+        Registers a function that is called after every change to the roads and intersections of the model
+        :param listener: function taking the changed object and a list of its old and new bounding boxes
+        :return: None
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        Unregisters a function added with add_listener
+        :param listener: function to be removed
+        :return: None
+        """
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # ---- lookups ----
+
+    def get_road(self, road_id):
+        """
+        :return: road with the given id, or None if it was removed
+        """
+        return self.road_objects[road_id]
+
+    def get_intersection(self, intersection_id):
+        """
+        :return: intersection with the given id, or None if it was removed
+        """
+        return self.intersection_objects[intersection_id]
+
+    def road_id(self, road):
+        """
+        :return: id of the given road, or None if the road is not part of the model
+        """
+        return self.road_ids.get(road)
+
+    def intersection_id(self, intersection):
+        """
+        :return: id of the given intersection, or None if the intersection is not part of the model
+        """
+        return self.intersection_ids.get(intersection)
+
+    def get_roads(self):
+        """
+        :return: list of the roads in the model, ordered by id
+        """
+        return [road for road in self.road_objects if road is not None]
+
+    def get_intersections(self):
+        """
+        :return: list of the intersections in the model, ordered by id
+        """
+        return [intersection for intersection in self.intersection_objects if intersection is not None]
+
+    def road_count(self):
+        """
+        :return: number of roads in the model
+        """
+        return len(self.road_ids)
+
+    def intersection_count(self):
+        """
+        :return: number of intersections in the model
+        """
+        return len(self.intersection_ids)
+
+    def __contains__(self, map_object):
+        return map_object in self.road_ids or map_object in self.intersection_ids
+
+    def component_count(self):
+        """
+        :return: number of connected components formed by the roads and intersections of the model
+        """
+        return self.connectivity.component_count()
+
+    def is_connected(self):
+        """
+        Tells whether the map could be exported, without the full traversal of is_connected_traffic_map
+        :return: boolean whether the roads and intersections of the model form at most one component
+        """
+        return self.connectivity.is_connected()
+
+    # ---- adding and removing ----
+
+    def add_road(self, road):
+        """
+        Adds a road to the model. Its start and end connections are recorded if they are already in the model.
+        :param road: road to be added
+        :type road: Road
+        :return: id of the road
+        """
+        if road in self.road_ids:
+            return self.road_ids[road]
+
+        road_id = len(self.road_objects)
+        self.road_objects.append(road)
+        self.road_ids[road] = road_id
+
+        columns = self.road_columns
+        columns.start_x.append(0)
+        columns.start_y.append(0)
+        columns.end_x.append(0)
+        columns.end_y.append(0)
+        columns.length.append(0)
+        columns.angle.append(0)
+        columns.in_lanes.append(0)
+        columns.out_lanes.append(0)
+        columns.speed_limit.append(0)
+        columns.start_intersection.append(NO_CONNECTION)
+        columns.end_intersection.append(NO_CONNECTION)
+        columns.alive.append(1)
+        self.connectivity.add_road(road_id)
+        self._write_road_row(road_id, road)
+
+        self.spatial_index.insert(road)
+        self.version += 1
+        self._notify(road, [self.spatial_index.get_bounds(road)])
+        return road_id
+
+    def add_roads(self, roads):
+        """
+        Adds many roads to the model
+        :param roads: roads to be added
+        :type roads: iterable of Road
+        :return: list of the ids of the roads
+        """
+        return [self.add_road(road) for road in roads]
+
+    def add_intersection(self, intersection):
+        """
+        Adds an intersection to the model. Roads in the model that are connected to it get their start or end
+        connection recorded.
+        :param intersection: intersection to be added
+        :type intersection: Intersection
+        :return: id of the intersection
+        """
+        if intersection in self.intersection_ids:
+            return self.intersection_ids[intersection]
+
+        intersection_id = len(self.intersection_objects)
+        self.intersection_objects.append(intersection)
+        self.intersection_ids[intersection] = intersection_id
+
+        columns = self.intersection_columns
+        columns.center_x.append(0)
+        columns.center_y.append(0)
+        columns.radius.append(0)
+        columns.speed_limit.append(0)
+        columns.alive.append(1)
+        self.connectivity.add_intersection(intersection_id)
+        self._write_intersection_row(intersection_id, intersection)
+
+        for road in intersection.get_connections():
+            road_id = self.road_ids.get(road)
+            if road_id is not None:
+                self._write_road_connections(road_id, road)
+
+        self.spatial_index.insert(intersection)
+        self.version += 1
+        self._notify(intersection, [self.spatial_index.get_bounds(intersection)])
+        return intersection_id
+
+    def add_intersections(self, intersections):
+        """
+        Adds many intersections to the model
+        :param intersections: intersections to be added
+        :type intersections: iterable of Intersection
+        :return: list of the ids of the intersections
+        """
+        return [self.add_intersection(intersection) for intersection in intersections]
+
+    def remove_road(self, road_id):
+        """
+        Removes a road from the model and detaches it from the intersections at its ends. Cycles of those
+        intersections refer to roads by their position in the connection list, so the road is dropped from them and
+        the positions after it are moved down.
+        :param road_id: id of the road to be removed
+        :type road_id: int
+        :return: the removed road
+        """
+        road = self.road_objects[road_id]
+        if road is None:
+            return None
+
+        for connection in (road.get_start_connection(), road.get_end_connection()):
+            if connection is not None and road in connection.connections:
+                position = connection.connections.index(road)
+                del connection.connections[position]
+                connection.green_cycle_roads = [[index - 1 if index > position else index
+                                                 for index in cycle_roads if index != position]
+                                                for cycle_roads in connection.green_cycle_roads]
+
+        self.road_objects[road_id] = None
+        del self.road_ids[road]
+        self.road_columns.alive[road_id] = 0
+        self.connectivity.remove_road(road_id)
+        old_bounds = self.spatial_index.get_bounds(road)
+        self.spatial_index.remove(road)
+        self.version += 1
+        self._notify(road, [old_bounds])
+        return road
+
+    def remove_roads(self, road_ids):
+        """
+        Removes many roads from the model
+        :param road_ids: ids of the roads to be removed
+        :return: list of the removed roads
+        """
+        return [self.remove_road(road_id) for road_id in road_ids]
+
+    def remove_intersection(self, intersection_id):
+        """
+        Removes an intersection from the model. Roads that were connected to it lose that connection.
+        :param intersection_id: id of the intersection to be removed
+        :type intersection_id: int
+        :return: the removed intersection
+        """
+        intersection = self.intersection_objects[intersection_id]
+        if intersection is None:
+            return None
+
+        for road in intersection.get_connections():
+            if road.get_start_connection() is intersection:
+                road.add_start_connection(None)
+            if road.get_end_connection() is intersection:
+                road.add_end_connection(None)
+            road_id = self.road_ids.get(road)
+            if road_id is not None:
+                self._write_road_connections(road_id, road)
+
+        self.intersection_objects[intersection_id] = None
+        del self.intersection_ids[intersection]
+        self.intersection_columns.alive[intersection_id] = 0
+        self.connectivity.remove_intersection(intersection_id)
+        old_bounds = self.spatial_index.get_bounds(intersection)
+        self.spatial_index.remove(intersection)
+        self.version += 1
+        self._notify(intersection, [old_bounds])
+        return intersection
+
+    def restore_road(self, road_id, road):
+        """
+        Puts a removed road back under its old id, so that ids recorded before the removal stay valid
+        :param road_id: id the road had before it was removed
+        :param road: the removed road
+        :type road_id: int
+        :type road: Road
+        :return: id of the road
+        """
+        if self.road_objects[road_id] is not None:
+            raise ValueError("Road id {} is in use".format(road_id))
+
+        self.road_objects[road_id] = road
+        self.road_ids[road] = road_id
+        self.road_columns.alive[road_id] = 1
+        self.connectivity.add_road(road_id)
+        self._write_road_row(road_id, road)
+
+        self.spatial_index.insert(road)
+        self.version += 1
+        self._notify(road, [self.spatial_index.get_bounds(road)])
+        return road_id
+
+    def restore_intersection(self, intersection_id, intersection):
+        """
+        Puts a removed intersection back under its old id, so that ids recorded before the removal stay valid.
+        Roads in the model that are connected to it get their start or end connection recorded again.
+        :param intersection_id: id the intersection had before it was removed
+        :param intersection: the removed intersection
+        :type intersection_id: int
+        :type intersection: Intersection
+        :return: id of the intersection
+        """
+        if self.intersection_objects[intersection_id] is not None:
+            raise ValueError("Intersection id {} is in use".format(intersection_id))
+
+        self.intersection_objects[intersection_id] = intersection
+        self.intersection_ids[intersection] = intersection_id
+        self.intersection_columns.alive[intersection_id] = 1
+        self.connectivity.add_intersection(intersection_id)
+        self._write_intersection_row(intersection_id, intersection)
+
+        for road in intersection.get_connections():
+            road_id = self.road_ids.get(road)
+            if road_id is not None:
+                self._write_road_connections(road_id, road)
+
+        self.spatial_index.insert(intersection)
+        self.version += 1
+        self._notify(intersection, [self.spatial_index.get_bounds(intersection)])
+        return intersection_id
+
+    def remove_intersections(self, intersection_ids):
+        """
+        Removes many intersections from the model
+        :param intersection_ids: ids of the intersections to be removed
+        :return: list of the removed intersections
+        """
+        return [self.remove_intersection(intersection_id) for intersection_id in intersection_ids]
+
+    def update(self, map_object):
+        """
+        Copies the current state of a road or intersection into the columns and the spatial index. Has to be called
+        after the object was changed outside of the model.
+        :param map_object: road or intersection that changed
+        :type map_object: Road or Intersection
+        :return: None
+        """
+        if map_object in self.road_ids:
+            self._write_road_row(self.road_ids[map_object], map_object)
+        elif map_object in self.intersection_ids:
+            intersection_id = self.intersection_ids[map_object]
+            self._write_intersection_row(intersection_id, map_object)
+            for road in map_object.get_connections():
+                road_id = self.road_ids.get(road)
+                if road_id is not None:
+                    self._write_road_connections(road_id, road)
+        else:
+            return
+
+        old_bounds = self.spatial_index.get_bounds(map_object)
+        self.spatial_index.update(map_object)
+        self.version += 1
+        self._notify(map_object, [old_bounds, self.spatial_index.get_bounds(map_object)])
+
+    # ---- snapshots ----
+
+    def snapshot(self):
+        """
+        Copies the roads and intersections of the model so that another thread, such as a background export, can read
+        them while the map keeps being edited. The copies are linked to each other instead of to the originals, and
+        their connection, cycle and profile lists are copied too, since edits and undo change those lists in place.
+        Coordinates and profiles are shared, they are replaced rather than changed by edits.
+        :return: tuple of the list of copied roads and the list of copied intersections, ordered by id
+        """
+        # the copies are allocated in one burst, automatic garbage collection would otherwise walk the whole map
+        # many times over while they are made
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            intersections = {}
+            for intersection in self.intersection_objects:
+                if intersection is not None:
+                    copied = copy_object(intersection)
+                    copied.spawn_profiles = list(intersection.spawn_profiles)
+                    copied.cycle_names = list(intersection.cycle_names)
+                    copied.green_cycle_roads = [list(roads) for roads in intersection.green_cycle_roads]
+                    copied.green_cycle_times = list(intersection.green_cycle_times)
+                    intersections[intersection] = copied
+
+            roads = {}
+            for road in self.road_objects:
+                if road is not None:
+                    copied = copy_object(road)
+                    copied.start_connection = intersections.get(road.start_connection)
+                    copied.end_connection = intersections.get(road.end_connection)
+                    roads[road] = copied
+
+            for intersection, copied in intersections.items():
+                copied.connections = [roads.get(road, road) for road in intersection.connections]
+        finally:
+            if collecting:
+                gc.enable()
+
+        return ([roads[road] for road in self.road_objects if road is not None],
+                [intersections[intersection] for intersection in self.intersection_objects if intersection is not None])
+
+    # ---- adjacency ----
+
+    def intersection_adjacency(self):
+        """
+        Builds the intersection to road adjacency in compressed sparse row form. The roads connected to the
+        intersection with id i are road_ids[offsets[i]:offsets[i + 1]], in connection order.
+        :return: tuple of the offsets array and the road id array
+        """
+        if self._adjacency is not None and self._adjacency_version == self.version:
+            return self._adjacency
+
+        offsets = array('l', [0])
+        road_ids = array('l')
+        for intersection in self.intersection_objects:
+            if intersection is not None:
+                for road in intersection.get_connections():
+                    road_id = self.road_ids.get(road)
+                    if road_id is not None:
+                        road_ids.append(road_id)
+            offsets.append(len(road_ids))
+
+        self._adjacency = (offsets, road_ids)
+        self._adjacency_version = self.version
+        return self._adjacency
+
+    # ---- column maintenance ----
+
+    def _notify(self, map_object, dirty_bounds):
+        for listener in list(self.listeners):
+            listener(map_object, dirty_bounds)
+
+    def _write_road_row(self, road_id, road):
+        columns = self.road_columns
+        columns.start_x[road_id] = road.get_start_coords().get_x()
+        columns.start_y[road_id] = road.get_start_coords().get_y()
+        columns.end_x[road_id] = road.get_end_coords().get_x()
+        columns.end_y[road_id] = road.get_end_coords().get_y()
+        columns.length[road_id] = road.get_length()
+        columns.angle[road_id] = road.get_angle()
+        columns.in_lanes[road_id] = road.get_in_lanes()
+        columns.out_lanes[road_id] = road.get_out_lanes()
+        columns.speed_limit[road_id] = road.get_speed_limit()
+        self._write_road_connections(road_id, road)
+
+    def _write_road_connections(self, road_id, road):
+        columns = self.road_columns
+        start_id = self.intersection_ids.get(road.get_start_connection())
+        end_id = self.intersection_ids.get(road.get_end_connection())
+        columns.start_intersection[road_id] = NO_CONNECTION if start_id is None else start_id
+        columns.end_intersection[road_id] = NO_CONNECTION if end_id is None else end_id
+        self.connectivity.set_road_ends(road_id, columns.start_intersection[road_id],
+                                        columns.end_intersection[road_id])
+
+    def _write_intersection_row(self, intersection_id, intersection):
+        columns = self.intersection_columns
+        columns.center_x[intersection_id] = intersection.get_center().get_x()
+        columns.center_y[intersection_id] = intersection.get_center().get_y()
+        columns.radius[intersection_id] = intersection.get_radius()
+        columns.speed_limit[intersection_id] = intersection.get_speed_limit()
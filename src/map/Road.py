@@ -4,14 +4,25 @@ import math
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
-from src.map.Coordinates import Coordinates
-from src.map.Constants import LANE_WIDTH
+from src.map.Coordinates import Coordinates, CoordinateBuffer
+from src.map.Constants import LANE_WIDTH, ROAD_EDGE_TOLERANCE
 import src.map as traffic_map
 
+# attributes that the cached corner polygon is derived from
+GEOMETRY_ATTRIBUTES = frozenset(['start_coord', 'end_coord', 'in_lanes', 'out_lanes', 'angle'])
+
+# values derived from the corner polygon, dropped whenever a geometry attribute changes
+GEOMETRY_CACHES = ('_corner_points', '_edge_vectors', '_half_planes')
+
+# polygons with a smaller (doubled) area are treated as line segments when hit testing
+DEGENERATE_AREA = 1e-9
+
 
 class Road(object):
     """
-    This class represents a road object in the MapBuilder section of our application
+    This class represents a road object in the MapBuilder section of our application.
+    The four corner points of the road are computed once and cached until one of the attributes in
+    GEOMETRY_ATTRIBUTES is assigned again.
 
     """
 
@@ -35,6 +46,8 @@ class Road(object):
         :type angle: float
         :type name: str
         """
+        for cache in GEOMETRY_CACHES:
+            object.__setattr__(self, cache, None)
         self.start_coord = start_coord
         self.end_coord = end_coord
         self.length = length
@@ -47,9 +60,29 @@ class Road(object):
         self.name = name
 
 
+    def __setattr__(self, name, value):
+        if name in GEOMETRY_ATTRIBUTES:
+            for cache in GEOMETRY_CACHES:
+                object.__setattr__(self, cache, None)
+        object.__setattr__(self, name, value)
+
+    def invalidate_geometry(self):
+        """
+        Drops the cached corner points. Only needed when one of the road's Coordinates objects is mutated in place,
+        assigning any geometry attribute already does this.
+        :return: None
+        """
+        for cache in GEOMETRY_CACHES:
+            object.__setattr__(self, cache, None)
+
     @classmethod
-    def create_import_road(cls, length, out_lanes, in_lanes, angle):
-        obj = cls(Coordinates(0, 0), Coordinates(0, 0), length, out_lanes, in_lanes, angle)
+    def create_import_road(cls, length, out_lanes, in_lanes, angle, speed_limit, name):
+        """
+        Creates a road whose start and end coordinates are not known yet, they are both set to the origin and have
+        to be assigned once the road's connections are resolved
+        :return: new road
+        """
+        obj = cls(Coordinates(0, 0), Coordinates(0, 0), length, out_lanes, in_lanes, angle, speed_limit, name)
         return obj
 
     def get_speed_limit(self):
@@ -142,110 +175,94 @@ class Road(object):
         """
         self.in_lanes = new_in_lanes
 
-    def is_on_road(self, coordinate):
+    def is_on_road(self, coordinate, tolerance=ROAD_EDGE_TOLERANCE):
         """
-        Determines if a given coordinate point is within the boundaries of the current road
+        Determines if a given coordinate point is within the boundaries of the current road. The point has to lie on
+        the inner side of every edge of the road polygon, which is checked with one cross product per edge.
         :param coordinate: coordinate point that will be tested for being within road boundaries
+        :param tolerance: distance outside of the road boundaries that still counts as being on the road
         :type coordinate: Coordinates
+        :type tolerance: float
         :return: returns true if given coordinate is within the boundaries of the road. Otherwise, returns false
         """
-        point_list = self.get_points()
-
-        # left of the starting point
-        p_1 = point_list[0]
-
-        # right of the starting point
-        p_2 = point_list[1]
-
-        # right of the ending point
-        p_3 = point_list[3]
-
-        # left of the ending point
-        p_4 = point_list[2]
-
-        cx = coordinate.get_x()
-        cy = coordinate.get_y()
-
-        p1x = p_1.get_x()
-        p1y = p_1.get_y()
-        p2x = p_2.get_x()
-        p2y = p_2.get_y()
-        p3x = p_3.get_x()
-        p3y = p_3.get_y()
-        p4x = p_4.get_x()
-        p4y = p_4.get_y()
-
-        # this chunk of code determines the area of the rectangle
-        width_delta_x = p_2.get_x() - p_1.get_x()
-        width_delta_y = p_2.get_y() - p_1.get_y()
-        length_delta_x = p_4.get_x() - p_1.get_x()
-        length_delta_y = p_4.get_y() - p_1.get_y()
-
-        rect_width = math.sqrt((width_delta_x * width_delta_x) + (width_delta_y * width_delta_y))
-        rect_length = math.sqrt((length_delta_x * length_delta_x) + (length_delta_y * length_delta_y))
-
-        # area of the rectangle (road)
-        rect_area = rect_width * rect_length
-
-        # this next chunk of code determines the lengths of triangles created between rect sides and the coord point
-        # for reference, point 1 = A, point 2 = B, point 3 = C, and point 4 = D
-        ab_delta_x = p2x - p1x
-        ab_delta_y = p2y - p1y
+        return self._contains(coordinate.get_x(), coordinate.get_y(), self._get_half_planes(), tolerance)
 
-        cd_delta_x = p4x - p3x
-        cd_delta_y = p4y - p3y
-
-        ac_delta_x = p3x - p1x
-        ac_delta_y = p3y - p1y
-
-        bd_delta_x = p4x - p2x
-        bd_delta_y = p4y - p2y
-
-        lab = math.sqrt((ab_delta_x * ab_delta_x) + (ab_delta_y * ab_delta_y))
-        lcd = math.sqrt((cd_delta_x * cd_delta_x) + (cd_delta_y * cd_delta_y))
-        lac = math.sqrt((ac_delta_x * ac_delta_x) + (ac_delta_y * ac_delta_y))
-        lbd = math.sqrt((bd_delta_x * bd_delta_x) + (bd_delta_y * bd_delta_y))
-
-        pa_delta_x = cx - p1x
-        pa_delta_y = cy - p1y
-
-        pb_delta_x = cx - p2x
-        pb_delta_y = cy - p2y
-
-        pc_delta_x = cx - p3x
-        pc_delta_y = cy - p3y
-
-        pd_delta_x = cx - p4x
-        pd_delta_y = cy - p4y
-
-        lpa = math.sqrt((pa_delta_x * pa_delta_x) + (pa_delta_y * pa_delta_y))
-        lpb = math.sqrt((pb_delta_x * pb_delta_x) + (pb_delta_y * pb_delta_y))
-        lpc = math.sqrt((pc_delta_x * pc_delta_x) + (pc_delta_y * pc_delta_y))
-        lpd = math.sqrt((pd_delta_x * pd_delta_x) + (pd_delta_y * pd_delta_y))
-
-        # this chunk of code determines the sum of the area of the triangles generated above
-        pab_half_perim = (lpa + lab + lpb) / 2.0
-        pbd_half_perim = (lbd + lpb + lpd) / 2.0
-        pcd_half_perim = (lcd + lpc + lpd) / 2.0
-        pac_half_perim = (lac + lpa + lpc) / 2.0
-
-        sqrt_inner_pab = pab_half_perim * (pab_half_perim - lpa) * (pab_half_perim - lab) * (pab_half_perim - lpb)
-        sqrt_inner_pbd = pbd_half_perim * (pbd_half_perim - lbd) * (pbd_half_perim - lpb) * (pbd_half_perim - lpd)
-        sqrt_inner_pcd = pcd_half_perim * (pcd_half_perim - lcd) * (pcd_half_perim - lpc) * (pcd_half_perim - lpd)
-        sqrt_inner_pac = pac_half_perim * (pac_half_perim - lac) * (pac_half_perim - lpa) * (pac_half_perim - lpc)
-
-        area_pab = math.sqrt(sqrt_inner_pab)
-        area_pbd = math.sqrt(sqrt_inner_pbd)
-        area_pcd = math.sqrt(sqrt_inner_pcd)
-        area_pac = math.sqrt(sqrt_inner_pac)
-
-        # the sum of all calculated triangles
-        tot_triangle_sum = area_pab + area_pbd + area_pcd + area_pac
-
-        if tot_triangle_sum <= rect_area:
-            return True
+    def are_on_road(self, coordinates, tolerance=ROAD_EDGE_TOLERANCE):
+        """
+        Batched version of is_on_road that classifies many coordinate points against the current road at once
+        :param coordinates: coordinate points that will be tested for being within road boundaries
+        :param tolerance: distance outside of the road boundaries that still counts as being on the road
+        :type coordinates: CoordinateBuffer or iterable of Coordinates
+        :type tolerance: float
+        :return: list holding one boolean per coordinate point, in the same order
+        """
+        if isinstance(coordinates, CoordinateBuffer):
+            points = coordinates.iter_xy()
         else:
-            return False
+            points = ((coordinate.get_x(), coordinate.get_y()) for coordinate in coordinates)
+
+        half_planes = self._get_half_planes()
+        if not half_planes:
+            return [self._contains(x, y, half_planes, tolerance) for x, y in points]
+
+        results = []
+        for x, y in points:
+            inside = True
+            for origin_x, origin_y, normal_x, normal_y in half_planes:
+                if (x - origin_x) * normal_x + (y - origin_y) * normal_y < -tolerance:
+                    inside = False
+                    break
+            results.append(inside)
+        return results
+
+    def _contains(self, x, y, half_planes, tolerance):
+        if not half_planes:
+            # the road has no area, so only points close to its outline are on it
+            return self._distance_to_outline(x, y) <= tolerance
+
+        for origin_x, origin_y, normal_x, normal_y in half_planes:
+            if (x - origin_x) * normal_x + (y - origin_y) * normal_y < -tolerance:
+                return False
+        return True
+
+    def _get_half_planes(self):
+        """
+        Retrieves one (origin_x, origin_y, normal_x, normal_y) tuple per edge of the road polygon, where the normal is
+        a unit vector pointing into the road. The list is empty when the polygon has no area.
+        :return: list of half planes bounding the road
+        """
+        if self._half_planes is None:
+            points = self.get_points()
+            edges = self.get_edge_vectors()
+
+            twice_area = 0.0
+            for point, (delta_x, delta_y) in zip(points, edges):
+                twice_area += point.x * delta_y - point.y * delta_x
+
+            half_planes = []
+            if abs(twice_area) > DEGENERATE_AREA:
+                orientation = 1.0 if twice_area > 0 else -1.0
+                for point, (delta_x, delta_y) in zip(points, edges):
+                    edge_length = math.hypot(delta_x, delta_y)
+                    if edge_length > 0:
+                        half_planes.append((point.x, point.y,
+                                            -delta_y * orientation / edge_length,
+                                            delta_x * orientation / edge_length))
+            self._half_planes = half_planes
+        return self._half_planes
+
+    def _distance_to_outline(self, x, y):
+        closest = float('inf')
+        for point, (delta_x, delta_y) in zip(self.get_points(), self.get_edge_vectors()):
+            edge_length_squared = delta_x * delta_x + delta_y * delta_y
+            offset_x = x - point.x
+            offset_y = y - point.y
+            if edge_length_squared > 0:
+                t = max(0.0, min(1.0, (offset_x * delta_x + offset_y * delta_y) / edge_length_squared))
+                offset_x -= t * delta_x
+                offset_y -= t * delta_y
+            closest = min(closest, math.hypot(offset_x, offset_y))
+        return closest
 
     def add_start_connection(self, start_connection):
         """
@@ -318,9 +335,29 @@ class Road(object):
 
     def get_points(self):
         """
-        Retrieves the four corner points of the road
+        Retrieves the four corner points of the road. The points are cached, so the returned list must not be modified.
         :return: a list of all corner points of the road
         """
+        if self._corner_points is None:
+            self._corner_points = self._compute_points()
+        return self._corner_points
+
+    def get_edge_vectors(self):
+        """
+        Retrieves the vectors along the four edges of the road polygon, where edge i runs from corner i to
+        corner i + 1 (wrapping around). The vectors are cached together with the corner points.
+        :return: a list of four (delta_x, delta_y) tuples
+        """
+        if self._edge_vectors is None:
+            points = self.get_points()
+            edges = []
+            for index, point in enumerate(points):
+                next_point = points[(index + 1) % len(points)]
+                edges.append((next_point.x - point.x, next_point.y - point.y))
+            self._edge_vectors = edges
+        return self._edge_vectors
+
+    def _compute_points(self):
         points = []
         start_x = self.start_coord.get_x()
         start_y = self.start_coord.get_y()
@@ -350,4 +387,4 @@ class Road(object):
         points.append(Coordinates(x_right_of_end, y_right_of_end))
         points.append(Coordinates(x_left_of_end, y_left_of_end))
 
-        return points
\ No newline at end of file
+        return points
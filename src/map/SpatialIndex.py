@@ -0,0 +1,207 @@
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+
+DEFAULT_CELL_SIZE = 100
+
+
+class SpatialIndex(object):
+    """
+    This class is a uniform grid over the MapBuilder plane that stores the bounding boxes of roads and
+    intersections. Every object is registered in each grid cell its bounding box touches, so finding the objects
+    under a point only needs to look at a single cell instead of scanning the whole map.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        """
+        Establishes an empty spatial index
+
+        :param cell_size: width and height of a single grid cell
+
+        :type cell_size: float
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = {}
+        self.object_cells = {}
+        self.insert_order = {}
+        self.next_order = 0
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __contains__(self, map_object):
+        return map_object in self.bounds
+
+    def get_bounds(self, map_object):
+        """
+        :param map_object: road or intersection stored in the index
+        :return: bounding box of the object as a (min_x, min_y, max_x, max_y) tuple
+        """
+        return self.bounds[map_object]
+
+    def insert(self, map_object):
+        """
+        Adds a road or an intersection to the index
+        :param map_object: object to be added
+        :type map_object: Road or Intersection
+        :return: None
+        """
+        if map_object in self.bounds:
+            self.update(map_object)
+            return
+
+        self.insert_order[map_object] = self.next_order
+        self.next_order += 1
+        self._add_to_cells(map_object)
+
+    def remove(self, map_object):
+        """
+        Removes a road or an intersection from the index
+        :param map_object: object to be removed
+        :type map_object: Road or Intersection
+        :return: None
+        """
+        if map_object not in self.bounds:
+            return
+
+        self._remove_from_cells(map_object)
+        del self.insert_order[map_object]
+
+    def update(self, map_object):
+        """
+        Re-registers an object after its geometry changed. The object keeps its place in the insertion order.
+        :param map_object: object whose geometry changed
+        :type map_object: Road or Intersection
+        :return: None
+        """
+        if map_object not in self.bounds:
+            self.insert(map_object)
+            return
+
+        self._remove_from_cells(map_object)
+        self._add_to_cells(map_object)
+
+    def clear(self):
+        """
+        Removes every object from the index
+        :return: None
+        """
+        self.cells = {}
+        self.bounds = {}
+        self.object_cells = {}
+        self.insert_order = {}
+        self.next_order = 0
+
+    def query_point(self, coordinate):
+        """
+        Finds every object whose shape contains the given point
+        :param coordinate: point to be tested
+        :type coordinate: Coordinates
+        :return: list of objects containing the point, ordered by the time they were inserted
+        """
+        x = coordinate.get_x()
+        y = coordinate.get_y()
+        candidates = self.cells.get(self._cell_of(x, y))
+
+        if not candidates:
+            return []
+
+        hits = []
+        for map_object in candidates:
+            min_x, min_y, max_x, max_y = self.bounds[map_object]
+            if min_x <= x <= max_x and min_y <= y <= max_y and _contains(map_object, coordinate):
+                hits.append(map_object)
+
+        hits.sort(key=self.insert_order.__getitem__)
+        return hits
+
+    def query_rect(self, min_x, min_y, max_x, max_y):
+        """
+        Finds every object whose bounding box overlaps the given rectangle
+        :param min_x: left edge of the rectangle
+        :param min_y: top edge of the rectangle
+        :param max_x: right edge of the rectangle
+        :param max_y: bottom edge of the rectangle
+        :return: list of overlapping objects, ordered by the time they were inserted
+        """
+        start_cx, start_cy = self._cell_of(min_x, min_y)
+        end_cx, end_cy = self._cell_of(max_x, max_y)
+
+        found = set()
+        for cx in range(start_cx, end_cx + 1):
+            for cy in range(start_cy, end_cy + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+
+        hits = []
+        for map_object in found:
+            o_min_x, o_min_y, o_max_x, o_max_y = self.bounds[map_object]
+            if o_min_x <= max_x and min_x <= o_max_x and o_min_y <= max_y and min_y <= o_max_y:
+                hits.append(map_object)
+
+        hits.sort(key=self.insert_order.__getitem__)
+        return hits
+
+    def _cell_of(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _add_to_cells(self, map_object):
+        bounds = bounding_box(map_object)
+        start_cx, start_cy = self._cell_of(bounds[0], bounds[1])
+        end_cx, end_cy = self._cell_of(bounds[2], bounds[3])
+
+        keys = []
+        for cx in range(start_cx, end_cx + 1):
+            for cy in range(start_cy, end_cy + 1):
+                key = (cx, cy)
+                cell = self.cells.get(key)
+                if cell is None:
+                    cell = set()
+                    self.cells[key] = cell
+                cell.add(map_object)
+                keys.append(key)
+
+        self.bounds[map_object] = bounds
+        self.object_cells[map_object] = keys
+
+    def _remove_from_cells(self, map_object):
+        for key in self.object_cells.pop(map_object):
+            cell = self.cells[key]
+            cell.discard(map_object)
+            if not cell:
+                del self.cells[key]
+        del self.bounds[map_object]
+
+
+def bounding_box(map_object):
+    """
+    Computes the axis aligned bounding box of a road or an intersection
+    :param map_object: road or intersection
+    :type map_object: Road or Intersection
+    :return: (min_x, min_y, max_x, max_y) tuple
+    """
+    if isinstance(map_object, Intersection):
+        center = map_object.get_center()
+        radius = map_object.get_radius()
+        return (center.get_x() - radius, center.get_y() - radius,
+                center.get_x() + radius, center.get_y() + radius)
+
+    xs = []
+    ys = []
+    for point in map_object.get_points():
+        xs.append(point.get_x())
+        ys.append(point.get_y())
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _contains(map_object, coordinate):
+    if isinstance(map_object, Road):
+        return map_object.is_on_road(coordinate)
+    return map_object.is_on_intersection(coordinate)
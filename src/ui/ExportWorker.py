@@ -0,0 +1,77 @@
+import sys
+import os
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.xml_parse.Export import export_xml
+from src.xml_parse.Exceptions import XMLFormatError, ExportCancelled
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class ExportSignals(QObject):
+    """
+    Signals of an ExportWorker. They are emitted on the worker thread and delivered on the thread the signals object
+    was created on, normally the GUI thread.
+    """
+    # stage name, items done and items in the stage
+    progress = pyqtSignal(str, int, int)
+    # location the map was saved to
+    finished = pyqtSignal(str)
+    # message of the error that stopped the export
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class ExportWorker(QRunnable):
+    """
+    Exports a map to xml, together with its lane graph for the simulator, on a QThreadPool thread, so the map builder
+    keeps drawing and handling input during long exports. The worker is given a snapshot of the map from
+    MapModel.snapshot(), edits made during the export do not reach the file.
+    """
+
+    def __init__(self, roads, intersections, save_location):
+        """
+        :param roads: list of the roads of the snapshot
+        :param intersections: list of the intersections of the snapshot
+        :param save_location: where to save the xml file
+
+        :type roads: list of Road
+        :type intersections: list of Intersection
+        :type save_location: str
+        """
+        super().__init__()
+        self.roads = roads
+        self.intersections = intersections
+        self.save_location = save_location
+        self.signals = ExportSignals()
+        self.cancel_requested = threading.Event()
+        # the pool must not delete the runnable while its signals may still be delivered
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        """
+        Asks the export to stop at its next progress report. The file at save_location is left as it was.
+        :return: None
+        """
+        self.cancel_requested.set()
+
+    def run(self):
+        try:
+            export_xml(self.roads, self.intersections, self.save_location, progress=self.report,
+                       lane_graph=True)
+        except ExportCancelled:
+            self.signals.cancelled.emit()
+        except (XMLFormatError, OSError) as error:
+            self.signals.failed.emit(str(error))
+        except Exception as error:
+            # nothing may escape the pool thread, the map builder waits for one of the signals to end the export
+            self.signals.failed.emit("Export failed: {}: {}".format(type(error).__name__, error))
+        else:
+            self.signals.finished.emit(self.save_location)
+
+    def report(self, stage, done, total):
+        if self.cancel_requested.is_set():
+            raise ExportCancelled()
+        self.signals.progress.emit(stage, done, total)
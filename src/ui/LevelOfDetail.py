@@ -0,0 +1,100 @@
+import sys
+import os
+import math
+from collections import OrderedDict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+
+from PyQt5 import QtGui, QtCore
+
+# side length of an aggregated geometry tile, in map coordinates
+LOD_TILE_SIZE = 2000
+
+# number of aggregated tiles kept before the least recently used one is evicted, more than a 1920x1200 window shows
+# at MIN_ZOOM, so a single frame never evicts its own tiles
+LOD_TILE_CACHE_CAPACITY = 32768
+
+
+class TilePathCache(object):
+    """
+    This class keeps the map geometry of square tiles aggregated for drawing zoomed far out. Every road in a tile
+    becomes one segment of a single QPainterPath and every intersection one point, so a whole tile is drawn with two
+    calls. Tiles are built the first time they are drawn and dropped when an edit touches them. When more than
+    capacity tiles are stored the least recently used one is dropped.
+    """
+
+    def __init__(self, spatial_index, tile_size=LOD_TILE_SIZE, capacity=LOD_TILE_CACHE_CAPACITY):
+        """
+        Establishes an empty tile cache
+
+        :param spatial_index: index used to find the objects in a tile
+        :param tile_size: side length of a tile in map coordinates
+        :param capacity: maximum number of tiles kept
+
+        :type spatial_index: SpatialIndex
+        :type tile_size: float
+        :type capacity: int
+        """
+        self.spatial_index = spatial_index
+        self.tile_size = tile_size
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def get(self, tile_x, tile_y):
+        """
+        :param tile_x: column of the tile
+        :param tile_y: row of the tile
+        :return: tuple of the QPainterPath of the road center lines and the QPolygonF of the intersection centers
+        """
+        key = (tile_x, tile_y)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self._build(tile_x, tile_y)
+            self.tiles[key] = tile
+            while len(self.tiles) > self.capacity:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def tiles_in(self, min_x, min_y, max_x, max_y):
+        """
+        :return: list of (tile x, tile y) keys of the tiles overlapping the given rectangle in map coordinates
+        """
+        start_x, start_y = self._tile_of(min_x, min_y)
+        end_x, end_y = self._tile_of(max_x, max_y)
+        return [(tile_x, tile_y) for tile_x in range(start_x, end_x + 1) for tile_y in range(start_y, end_y + 1)]
+
+    def invalidate(self, bounds):
+        """
+        Drops every tile overlapping a bounding box
+        :param bounds: (min_x, min_y, max_x, max_y) bounding box in map coordinates, None drops every tile
+        :return: None
+        """
+        if bounds is None:
+            self.tiles.clear()
+            return
+        for key in self.tiles_in(*bounds):
+            self.tiles.pop(key, None)
+
+    def _tile_of(self, x, y):
+        return int(math.floor(x / self.tile_size)), int(math.floor(y / self.tile_size))
+
+    def _build(self, tile_x, tile_y):
+        min_x = tile_x * self.tile_size
+        min_y = tile_y * self.tile_size
+        road_path = QtGui.QPainterPath()
+        points = QtGui.QPolygonF()
+        for map_object in self.spatial_index.query_rect(min_x, min_y, min_x + self.tile_size, min_y + self.tile_size):
+            if type(map_object) is Road:
+                road_path.moveTo(map_object.start_coord.x, map_object.start_coord.y)
+                road_path.lineTo(map_object.end_coord.x, map_object.end_coord.y)
+            elif type(map_object) is Intersection:
+                points.append(QtCore.QPointF(map_object.center.x, map_object.center.y))
+        return road_path, points
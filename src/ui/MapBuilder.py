@@ -9,41 +9,94 @@ from src.map.DriverProfile import DriverProfile
 from src.map.VehicleProfile import VehicleProfile
 from src.map.SpawningProfile import SpawningProfile
 from src.map.Constants import LANE_WIDTH
-from src.xml_parse.Export import export_xml
+from src.map.MapModel import MapModel
+from src.map.History import History, AddRoad, AddIntersection, EditObject, AddCycle, ResetLight, \
+    AttachProfile, DetachProfile
+from src.xml_parse.Import import import_xml
+from src.xml_parse.Journal import Journal
+from src.xml_parse.Exceptions import XMLFormatError, JournalFormatError
+from src.xml_parse.Utils import find_components
+from src.ui.LevelOfDetail import TilePathCache
+from src.ui.TileCache import TileCache
+from src.ui.ExportWorker import ExportWorker
 import math
 
 from PyQt5.QtWidgets import QApplication, QWidget, QAction, QMainWindow, \
     QPushButton, QGridLayout, QComboBox, QDialog, QButtonGroup, QDialogButtonBox, \
     QFormLayout, QGridLayout, QGroupBox, QHBoxLayout, QCheckBox, QLabel, QLineEdit, \
-    QMenu, QMenuBar, QPushButton, QSpinBox, QTextEdit, QVBoxLayout, QFileDialog, QMessageBox
-from PyQt5.QtCore import pyqtSlot, Qt
+    QMenu, QMenuBar, QPushButton, QSpinBox, QTextEdit, QVBoxLayout, QFileDialog, QMessageBox, \
+    QProgressDialog
+from PyQt5.QtCore import pyqtSlot, pyqtSignal, Qt, QThreadPool
 from PyQt5 import QtGui, QtCore
 
 selected_object = None
 profile_action_type = None
-road = []
-intersection = []
-driver_profiles = []
-vehicle_profiles = []
-spawning_profiles = []
+map_model = MapModel()
+history = History(map_model)
 app = None
 
+# crash recovery journal of map_model, replayed and started when the MapBuilder is run as a program
+journal = None
+AUTOSAVE_LOCATION = os.path.join(os.path.expanduser("~"), ".mapbuilder_journal")
+
 testing = False
 
+# pixels added around dirty bounding boxes so that the outline pen is repainted as well
+DIRTY_RECT_MARGIN = 2
+
+# zoom limits and the factor applied by one wheel step or +/- key press
+MIN_ZOOM = 0.005
+MAX_ZOOM = 8
+ZOOM_STEP = 1.25
+
+# roads narrower and intersections smaller than this many pixels are drawn as lines and points
+LOD_PIXEL_SIZE = 3
+
+# below this zoom the map is drawn from aggregated tiles instead of object by object
+AGGREGATE_ZOOM = 0.1
+
+# milliseconds between repaints while panning or zooming, about one display frame
+FRAME_INTERVAL = 16
+
+# milliseconds an export has to run before its progress dialog is shown
+EXPORT_DIALOG_DELAY = 500
+
+
 class MapBuilder(QMainWindow):
     """
     The main class for the MapBuilder. Instantiates the UI that is used to construct traffic maps.
     """
 
-    global road
-    global intersection
-    global driver_profiles
-    global vehicle_profiles
-    global spawning_profiles
     global app
 
     y_offset = 0
     x_offset = 0
+    zoom = 1.0
+
+    # static map layer, rendered at backing_offset and backing_zoom. Only the parts in dirty_region are redrawn on
+    # the next paint.
+    backing = None
+    backing_offset = None
+    backing_zoom = None
+    dirty_region = None
+    tile_paths = None
+
+    # pre-rendered raster tiles of the static map layer, the backing is filled from these
+    tile_cache = None
+
+    # pans and zooms arriving within one frame share a single repaint started by this timer
+    frame_timer = None
+
+    # emitted when the selection or the map changes, the menu state is recomputed on these instead of on every paint
+    selection_changed = pyqtSignal()
+    model_changed = pyqtSignal()
+
+    # export running on the thread pool and the dialog showing its progress, None when no export is running
+    export_worker = None
+    export_dialog = None
+
+    # roads and intersections outside the largest part of the map and dangling roads, drawn in red until the next edit
+    highlighted = []
 
     selected_object = None
     profile_action_num = None
@@ -63,8 +116,11 @@ class MapBuilder(QMainWindow):
     driver_profile_menu = None
     auto_connect = None
     save_action = None
+    undo_action = None
+    redo_action = None
     open_action = None
     new_action = None
+    highlight_action = None
 
     # Traffic Light Menu Actions
     traffic_light_menu = None
@@ -80,15 +136,28 @@ class MapBuilder(QMainWindow):
         self.top = 10
         self.width = 300
         self.height = 200
+        self.dirty_region = QtGui.QRegion()
+        self.tile_paths = TilePathCache(map_model.spatial_index)
+        self.tile_cache = TileCache()
+        map_model.add_listener(self.map_changed)
+        self.frame_timer = QtCore.QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(FRAME_INTERVAL)
+        self.frame_timer.timeout.connect(self.update)
         self.initUI()
+        self.selection_changed.connect(self.update_menu_bar)
+        self.model_changed.connect(self.update_menu_bar)
+        self.model_changed.connect(self.update_status_bar)
 
         default_driver = DriverProfile("Default", 8, 2, 2, 0, 30, 3, 1)
         default_vehicle = VehicleProfile("Default", 5, 15, 2, 2, 1000, 65)
         default_spawn = SpawningProfile("Default", default_driver, default_vehicle)
 
-        driver_profiles.append(default_driver)
-        vehicle_profiles.append(default_vehicle)
-        spawning_profiles.append(default_spawn)
+        map_model.driver_profiles.append(default_driver)
+        map_model.vehicle_profiles.append(default_vehicle)
+        map_model.spawning_profiles.append(default_spawn)
+        self.update_menu_bar()
+        self.update_status_bar()
 
     def initUI(self):
         menu_bar = self.menuBar()
@@ -118,8 +187,18 @@ class MapBuilder(QMainWindow):
         #File Actions
         self.new_action = QAction("New", self)
         self.new_action.triggered.connect(self.reset_file)
+        self.open_action = QAction("Open", self)
+        self.open_action.triggered.connect(self.import_to_file)
+        self.undo_action = QAction("Undo", self)
+        self.undo_action.setShortcut(QtGui.QKeySequence.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        self.redo_action = QAction("Redo", self)
+        self.redo_action.setShortcut(QtGui.QKeySequence.Redo)
+        self.redo_action.triggered.connect(self.redo)
         self.save_action = QAction("Save", self)
         self.save_action.triggered.connect(self.export_to_file)
+        self.highlight_action = QAction("Highlight Disconnected Parts", self)
+        self.highlight_action.triggered.connect(self.highlight_components)
 
         self.add_driver_action = QAction("Add Driver Profile", self)
         self.delete_driver_action = QAction("Delete Driver Profile", self)
@@ -146,6 +225,10 @@ class MapBuilder(QMainWindow):
         file_menu.addAction(self.new_action)
         file_menu.addAction(self.open_action)
         file_menu.addAction(self.save_action)
+        file_menu.addAction(self.highlight_action)
+        file_menu.addSeparator()
+        file_menu.addAction(self.undo_action)
+        file_menu.addAction(self.redo_action)
 
         self.selected_menu.addAction(self.add_action)
         self.selected_menu.addAction(self.edit_action)
@@ -189,10 +272,9 @@ class MapBuilder(QMainWindow):
         self.show()
 
     def reset_file(self):
-        global road, intersection, selected_object
-        road = []
-        intersection = []
-        selected_object = None
+        history.clear()
+        map_model.clear(keep_profiles=True)
+        self.select(None)
         self.first_road()
 
     def export_to_file(self):
@@ -200,63 +282,387 @@ class MapBuilder(QMainWindow):
         filename, _ = QFileDialog.getSaveFileName(self, "QFileDialog.getSaveFileName()", "", "XML Files (*.xml)", options=options)
         if filename:
             print(filename)
-            export_xml(road, intersection, filename)
+            self.start_export(filename)
+
+    def start_export(self, filename):
+        """
+        Exports a snapshot of the map to xml on the thread pool. The map can be edited while the export runs, its
+        progress is shown in a dialog that can cancel it.
+        :param filename: where to save the xml file
+        :type filename: str
+        :return: the worker running the export, None if another export is still running
+        """
+        if self.export_worker is not None:
+            return None
+
+        roads, intersections = map_model.snapshot()
+        self.export_worker = ExportWorker(roads, intersections, filename)
+        self.export_worker.signals.progress.connect(self.export_progress)
+        self.export_worker.signals.finished.connect(self.export_finished)
+        self.export_worker.signals.failed.connect(self.export_failed)
+        self.export_worker.signals.cancelled.connect(self.export_finished)
+
+        self.export_dialog = QProgressDialog("Exporting map", "Cancel", 0, 1, self)
+        self.export_dialog.setWindowTitle("Export")
+        self.export_dialog.setAutoReset(False)
+        self.export_dialog.setAutoClose(False)
+        self.export_dialog.setMinimumDuration(EXPORT_DIALOG_DELAY)
+        self.export_dialog.canceled.connect(self.export_worker.cancel)
+
+        QThreadPool.globalInstance().start(self.export_worker)
+        self.model_changed.emit()
+        return self.export_worker
+
+    def export_progress(self, stage, done, total):
+        if self.export_dialog is not None:
+            self.export_dialog.setLabelText("Exporting {}".format(stage))
+            self.export_dialog.setMaximum(max(total, 1))
+            self.export_dialog.setValue(done)
+
+    def export_finished(self, filename=None):
+        """
+        Closes the progress dialog of the running export once it is finished, cancelled or failed
+        :param filename: location the map was saved to, None if it was not saved
+        :return: None
+        """
+        self.export_dialog.canceled.disconnect()
+        self.export_dialog.close()
+        self.export_dialog = None
+        self.export_worker = None
+        self.model_changed.emit()
+
+    def export_failed(self, message):
+        self.export_finished()
+        QMessageBox.warning(self, "Export", message)
 
     def import_to_file(self):
         options = QFileDialog.Options()
         filename, _ = QFileDialog.getOpenFileName(self, "QFileDialog.getOpenFileName()", "", "XML Files (*.xml)", options=options)
         if filename:
             print(filename)
-            import_xml(filename)
+            self.open_file(filename)
+
+    def open_file(self, filename):
+        """
+        Replaces the map with the one saved in an xml file. A file that cannot be read is reported and leaves the map
+        as it was.
+        :param filename: location of the xml file
+        :type filename: str
+        :return: True if the map was loaded
+        """
+        try:
+            import_xml(filename, map_model)
+        except (XMLFormatError, OSError) as error:
+            QMessageBox.warning(self, "Open", "{}: {}".format(filename, error))
+            return False
+        history.clear()
+        if journal is not None:
+            journal.record_profiles()
+        self.select(None)
+        self.update()
+        return True
+
+    def to_screen(self, x, y, offset=None):
+        """
+        :param offset: (x, y) offset the map is drawn at, the current offsets if None
+        :return: QPointF in widget coordinates of a point in map coordinates
+        """
+        if offset is None:
+            offset = (self.x_offset, self.y_offset)
+        return QtCore.QPointF(x * self.zoom + offset[0], y * self.zoom + offset[1])
 
-    def draw_road(self, road, qp):
+    def draw_road(self, road, qp, offset=None):
+        point_one = self.to_screen(road.start_coord.x, road.start_coord.y, offset)
+        point_two = self.to_screen(road.end_coord.x, road.end_coord.y, offset)
+
+        # too narrow to see the lanes, so only the center line in the fill color is drawn
+        if (road.in_lanes + road.out_lanes) * LANE_WIDTH * self.zoom < LOD_PIXEL_SIZE:
+            qp.setPen(qp.brush().color())
+            qp.drawLine(point_one, point_two)
+            qp.setPen(Qt.black)
+            return
 
         polygon = QtGui.QPolygonF()
 
         for point in road.get_points():
-            polygon.append(QtCore.QPoint(point.x + self.x_offset, point.y + self.y_offset))
+            polygon.append(self.to_screen(point.x, point.y, offset))
 
         qp.drawPolygon(polygon)
 
         qp.setPen(Qt.lightGray)
-        point_one = QtCore.QPoint(road.start_coord.x + self.x_offset, road.start_coord.y + self.y_offset)
-        point_two = QtCore.QPoint(road.end_coord.x + self.x_offset, road.end_coord.y + self.y_offset)
         qp.drawLine(point_one, point_two)
         qp.setPen(Qt.black)
 
-    def draw_intersection(self, center, radius, qp):
-        qp.drawEllipse(center.x - radius + self.x_offset, center.y - radius + self.y_offset, radius * 2, radius * 2)
+    def draw_intersection(self, center, radius, qp, offset=None):
+        radius = radius * self.zoom
+        screen_center = self.to_screen(center.x, center.y, offset)
+
+        if radius * 2 < LOD_PIXEL_SIZE:
+            qp.setPen(QtGui.QPen(qp.brush().color(), 2))
+            qp.drawPoint(screen_center)
+            qp.setPen(Qt.black)
+            return
+
+        qp.drawEllipse(screen_center, radius, radius)
+
+    def draw_tiles(self, bounds, qp, offset):
+        """
+        Draws the aggregated tiles that overlap a bounding box, for zoom levels where single objects are only a few
+        pixels in size
+        :param bounds: (min_x, min_y, max_x, max_y) bounding box in map coordinates
+        :param qp: painter to draw with
+        :param offset: (x, y) offset the map is drawn at
+        :return: None
+        """
+        qp.save()
+        qp.translate(offset[0], offset[1])
+        qp.scale(self.zoom, self.zoom)
+        road_pen = QtGui.QPen(Qt.darkGray, 0)
+        point_pen = QtGui.QPen(Qt.darkGray, 2)
+        point_pen.setCosmetic(True)
+        for tile_x, tile_y in self.tile_paths.tiles_in(*bounds):
+            road_path, points = self.tile_paths.get(tile_x, tile_y)
+            qp.strokePath(road_path, road_pen)
+            qp.setPen(point_pen)
+            qp.drawPoints(points)
+        qp.restore()
 
     def paintEvent(self, e):
         global selected_object
 
+        self.sync_backing()
+
         qp = QtGui.QPainter()
         qp.begin(self)
-        qp.setBrush(Qt.darkGray)
-        for obj in road:
-            self.draw_road(obj, qp)
-        qp.setBrush(Qt.darkGray)
-        for obj in intersection:
-            self.draw_intersection(obj.center, obj.radius, qp)
+        qp.drawPixmap(e.rect(), self.backing, e.rect())
+        qp.setBrush(Qt.red)
+        for map_object in self.highlighted:
+            highlight_rect = self.object_rect(map_object)
+            if highlight_rect is not None and highlight_rect.intersects(e.rect()):
+                if type(map_object) is Road:
+                    self.draw_road(map_object, qp)
+                else:
+                    self.draw_intersection(map_object.center, map_object.radius, qp)
         if selected_object is not None:
-            qp.setBrush(Qt.yellow)
-            if type(selected_object) is Road:
-                self.draw_road(selected_object, qp)
-            if type(selected_object) is Intersection:
-                self.draw_intersection(selected_object.center, selected_object.radius, qp)
-            self.update_menu_bar()
+            selection_rect = self.object_rect(selected_object)
+            if selection_rect is not None and selection_rect.intersects(e.rect()):
+                qp.setBrush(Qt.yellow)
+                if type(selected_object) is Road:
+                    self.draw_road(selected_object, qp)
+                if type(selected_object) is Intersection:
+                    self.draw_intersection(selected_object.center, selected_object.radius, qp)
         qp.end()
 
-    def first_road(self):
+    def sync_backing(self):
+        """
+        Brings the static map layer up to date with the current offsets and the model. A pan scrolls the existing
+        pixmap so that only the newly exposed strip has to be drawn, and edits only redraw their dirty rectangles.
+        :return: None
+        """
+        if self.backing is None or self.backing.size() != self.size() or self.backing_zoom != self.zoom:
+            self.backing = QtGui.QPixmap(self.size())
+            self.backing_offset = (self.x_offset, self.y_offset)
+            self.backing_zoom = self.zoom
+            self.dirty_region = QtGui.QRegion(self.backing.rect())
+        elif self.backing_offset != (self.x_offset, self.y_offset):
+            dx = self.x_offset - self.backing_offset[0]
+            dy = self.y_offset - self.backing_offset[1]
+            exposed = self.backing.scroll(dx, dy, self.backing.rect())
+            self.dirty_region = self.dirty_region.translated(dx, dy).united(exposed)
+            self.backing_offset = (self.x_offset, self.y_offset)
+
+        if not self.dirty_region.isEmpty():
+            for rect in self.dirty_region.intersected(QtGui.QRegion(self.backing.rect())).rects():
+                self.render_backing(rect)
+            self.dirty_region = QtGui.QRegion()
+
+    def render_backing(self, rect):
+        """
+        Redraws one rectangle of the static map layer by copying the raster tiles that overlap it. Tiles missing
+        from the cache are rendered first, so panning over parts of the map seen before is only a blit.
+        :param rect: rectangle in widget coordinates
+        :type rect: QRect
+        :return: None
+        """
+        tile_size = self.tile_cache.tile_size
+        qp = QtGui.QPainter()
+        qp.begin(self.backing)
+        qp.setClipRect(rect)
+        for tile_x, tile_y in self.tile_cache.tiles_in(rect.left() - self.x_offset, rect.top() - self.y_offset,
+                                                       rect.right() - self.x_offset, rect.bottom() - self.y_offset):
+            qp.drawPixmap(tile_x * tile_size + self.x_offset, tile_y * tile_size + self.y_offset,
+                          self.get_tile(tile_x, tile_y))
+        qp.end()
+
+    def get_tile(self, tile_x, tile_y):
+        """
+        :param tile_x: column of the tile at the current zoom
+        :param tile_y: row of the tile at the current zoom
+        :return: QPixmap of the static map layer in the tile, from the cache if it was rendered before
+        """
+        key = (tile_x, tile_y, self.zoom)
+        tile = self.tile_cache.get(key)
+        if tile is None:
+            tile = self.render_tile(key)
+            self.tile_cache.put(key, tile)
+        return tile
+
+    def render_tile(self, key):
+        """
+        Renders one raster tile of the static map layer. Only the roads and intersections the spatial index finds in
+        the tile are drawn, so the cost depends on what is visible rather than on the size of the map.
+        :param key: (tile x, tile y, zoom) of the tile
+        :return: QPixmap of the tile
+        """
+        tile_size = self.tile_cache.tile_size
+        offset = (-key[0] * tile_size, -key[1] * tile_size)
+        tile = QtGui.QPixmap(tile_size, tile_size)
+        tile.fill(self.palette().color(self.backgroundRole()))
+
+        qp = QtGui.QPainter()
+        qp.begin(tile)
+        bounds = self.tile_cache.map_bounds(key, DIRTY_RECT_MARGIN)
+        if self.zoom < AGGREGATE_ZOOM:
+            self.draw_tiles(bounds, qp, offset)
+            qp.end()
+            return tile
+
+        visible = map_model.spatial_index.query_rect(*bounds)
+        qp.setBrush(Qt.darkGray)
+        for obj in visible:
+            if type(obj) is Road:
+                self.draw_road(obj, qp, offset)
+        for obj in visible:
+            if type(obj) is Intersection:
+                self.draw_intersection(obj.center, obj.radius, qp, offset)
+        qp.end()
+        return tile
+
+    def view_rect(self, bounds, offset):
+        """
+        :param bounds: (min_x, min_y, max_x, max_y) bounding box in map coordinates
+        :param offset: (x, y) offset the map is drawn at
+        :return: QRect in widget coordinates that covers the bounding box and its outline
+        """
+        left = int(math.floor(bounds[0] * self.zoom + offset[0])) - DIRTY_RECT_MARGIN
+        top = int(math.floor(bounds[1] * self.zoom + offset[1])) - DIRTY_RECT_MARGIN
+        right = int(math.ceil(bounds[2] * self.zoom + offset[0])) + DIRTY_RECT_MARGIN
+        bottom = int(math.ceil(bounds[3] * self.zoom + offset[1])) + DIRTY_RECT_MARGIN
+        return QtCore.QRect(left, top, right - left + 1, bottom - top + 1)
+
+    def object_rect(self, map_object):
+        """
+        :return: QRect in widget coordinates covering a road or intersection, or None if it is not in the map
+        """
+        if map_object not in map_model.spatial_index:
+            return None
+        return self.view_rect(map_model.spatial_index.get_bounds(map_object), (self.x_offset, self.y_offset))
+
+    def map_changed(self, map_object, dirty_bounds):
+        """
+        Listener of the map model. Marks the rectangles an edit touched as dirty and repaints only those.
+        :param map_object: road or intersection that changed, None if the whole map changed
+        :param dirty_bounds: bounding boxes covered by the object before and after the change
+        :return: None
+        """
+        if self.highlighted:
+            self.set_highlighted([])
+
+        if dirty_bounds is None:
+            self.tile_paths.invalidate(None)
+            self.tile_cache.invalidate(None)
+            self.backing = None
+            self.update()
+            self.model_changed.emit()
+            return
+
+        for bounds in dirty_bounds:
+            self.tile_paths.invalidate(bounds)
+            self.tile_cache.invalidate(bounds, DIRTY_RECT_MARGIN)
+            if self.backing is not None:
+                self.dirty_region = self.dirty_region.united(self.view_rect(bounds, self.backing_offset))
+            self.update(self.view_rect(bounds, (self.x_offset, self.y_offset)))
+        self.model_changed.emit()
+
+    def select(self, map_object):
+        """
+        Selects a road or intersection and repaints the old and new selection highlight
+        :param map_object: object to be selected
+        :return: None
+        """
         global selected_object
+
+        if map_object is selected_object:
+            return
+
+        for obj in (selected_object, map_object):
+            rect = self.object_rect(obj)
+            if rect is not None:
+                self.update(rect)
+        selected_object = map_object
+        self.selection_changed.emit()
+
+    def set_highlighted(self, map_objects):
+        """
+        Replaces the highlighted roads and intersections and repaints the old and new highlight
+        :param map_objects: list of roads and intersections to be highlighted
+        :return: None
+        """
+        for map_object in self.highlighted + map_objects:
+            rect = self.object_rect(map_object)
+            if rect is not None:
+                self.update(rect)
+        self.highlighted = map_objects
+
+    def highlight_components(self):
+        """
+        Highlights every road and intersection outside the largest part of the map, along with the roads missing an
+        intersection at either end, and names how many of each there are in the status bar
+        :return: None
+        """
+        components, dangling_roads = find_components(map_model.get_roads(), map_model.get_intersections())
+        components.sort(key=len, reverse=True)
+        highlighted = []
+        for component in components[1:]:
+            highlighted.extend(component.roads)
+            highlighted.extend(component.intersections)
+        in_smaller_parts = set(highlighted)
+        highlighted.extend(road for road in dangling_roads if road not in in_smaller_parts)
+        self.set_highlighted(highlighted)
+        self.statusBar().showMessage("{} separate parts, {} dangling roads highlighted".format(
+            len(components), len(dangling_roads)))
+
+    def closeEvent(self, event):
+        map_model.remove_listener(self.map_changed)
+        super().closeEvent(event)
+
+    def recover(self, recovery_journal):
+        """
+        Loads the map left by the last session, or by a crash, from the journal, and the default first road if there
+        is none. A journal that cannot be replayed is moved aside and reported, so the MapBuilder still starts.
+        :param recovery_journal: journal of the last session
+        :type recovery_journal: Journal
+        :return: True if the map was recovered
+        """
+        try:
+            if recovery_journal.replay(map_model):
+                return True
+        except (JournalFormatError, OSError) as error:
+            moved = recovery_journal.set_aside()
+            map_model.clear()
+            QMessageBox.warning(self, "Recovery", "The map of the last session could not be recovered: {}\n"
+                                                  "Its journal was moved to {}".format(error, ", ".join(moved)))
+        self.first_road()
+        return False
+
+    def first_road(self):
         start_coord = Coordinates(400,250)
 
         center = Coordinates(start_coord.x, start_coord.y)
         i = Intersection(center, 40, 25)
-        intersection.append(i)
+        map_model.add_intersection(i)
 
-        selected_object = intersection[0]
-        self.update()
+        self.select(i)
 
     def keyPressEvent(self, event):
         key = event.key()
@@ -268,26 +674,74 @@ class MapBuilder(QMainWindow):
             self.y_offset = self.y_offset - 5
         elif key == QtCore.Qt.Key_D:
             self.x_offset = self.x_offset - 5
+        elif key == QtCore.Qt.Key_Plus or key == QtCore.Qt.Key_Equal:
+            self.zoom_at(ZOOM_STEP, self.rect().center())
+        elif key == QtCore.Qt.Key_Minus:
+            self.zoom_at(1 / ZOOM_STEP, self.rect().center())
         elif key == QtCore.Qt.Key_R:
             self.x_offset = 0
             self.y_offset = 0
-        self.update()
+            self.zoom = 1.0
+        self.schedule_update()
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120.0
+        if steps != 0:
+            self.zoom_at(ZOOM_STEP ** steps, event.pos())
+            self.schedule_update()
+
+    def schedule_update(self):
+        """
+        Repaints the window after the current frame. Auto-repeated keys and wheel steps arriving in the meantime only
+        move the offsets, so they are drawn together by a single repaint.
+        :return: None
+        """
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def zoom_at(self, factor, anchor):
+        """
+        Changes the zoom while keeping the map point under the anchor in place
+        :param factor: factor the zoom is multiplied by
+        :param anchor: position in widget coordinates that stays fixed
+        :type anchor: QPoint
+        :return: None
+        """
+        new_zoom = min(MAX_ZOOM, max(MIN_ZOOM, self.zoom * factor))
+        map_x = (anchor.x() - self.x_offset) / self.zoom
+        map_y = (anchor.y() - self.y_offset) / self.zoom
+        self.zoom = new_zoom
+        self.x_offset = int(round(anchor.x() - map_x * new_zoom))
+        self.y_offset = int(round(anchor.y() - map_y * new_zoom))
 
     def mousePressEvent(self, QMouseEvent):
-        global selected_object
         print(QMouseEvent.pos())
-        converted_position = Coordinates(QMouseEvent.pos().x() - self.x_offset, QMouseEvent.pos().y() - self.y_offset)
-        for obj in road:
-            if obj.is_on_road(converted_position):
-                selected_object = obj
+        hit = self.object_at((QMouseEvent.pos().x() - self.x_offset) / self.zoom,
+                             (QMouseEvent.pos().y() - self.y_offset) / self.zoom)
+        if hit is not None:
+            self.select(hit)
+
+    def object_at(self, x, y):
+        """
+        :param x: x coordinate in map coordinates
+        :param y: y coordinate in map coordinates
+        :return: topmost road or intersection at the point, None if there is none
+        """
+        hits = map_model.spatial_index.query_point(Coordinates(x, y))
+        hit = None
 
-        for obj in intersection:
-            if obj.is_on_intersection(converted_position):
-                selected_object = obj
+        # intersections are drawn on top of roads, so they win the click
+        for obj in hits:
+            if type(obj) is Road:
+                hit = obj
 
-        self.update()
+        for obj in hits:
+            if type(obj) is Intersection:
+                hit = obj
 
-    # called in paint function to make sure menu bar updates immediately with added objects
+        return hit
+
+    # called when the selection or the map changes to make sure menu bar updates immediately with added objects
     def update_menu_bar(self):
         if selected_object is not None:
             self.edit_action.setEnabled(True)
@@ -308,7 +762,7 @@ class MapBuilder(QMainWindow):
                     self.add_action.setEnabled(False)
             else:
 
-                if len(intersection) > 1:
+                if map_model.intersection_count() > 1:
                     self.auto_connect.setEnabled(True)
                 else:
                     self.auto_connect.setEnabled(False)
@@ -327,45 +781,88 @@ class MapBuilder(QMainWindow):
             self.add_action.setEnabled(False)
             self.edit_action.setEnabled(False)
 
-        if len(driver_profiles) > 1:
+        if len(map_model.driver_profiles) > 1:
             self.delete_driver_action.setEnabled(True)
         else:
             self.delete_driver_action.setEnabled(False)
 
-        if len(vehicle_profiles) > 1:
+        if len(map_model.vehicle_profiles) > 1:
             self.delete_vehicle_action.setEnabled(True)
         else:
             self.delete_vehicle_action.setEnabled(False)
 
-        if len(spawning_profiles) > 1:
+        if len(map_model.spawning_profiles) > 1:
             self.delete_spawn_action.setEnabled(True)
         else:
             self.delete_spawn_action.setEnabled(False)
 
+        self.undo_action.setEnabled(history.can_undo())
+        self.redo_action.setEnabled(history.can_redo())
+        self.save_action.setEnabled(self.export_worker is None)
+
+    def update_status_bar(self):
+        """
+        Shows whether the map is connected. The model tracks its components as it is edited, so this does not walk the
+        map.
+        :return: None
+        """
+        components = map_model.component_count()
+        if components <= 1:
+            self.statusBar().showMessage("Map is connected")
+        else:
+            self.statusBar().showMessage("Map is not connected: {} separate parts".format(components))
+
     def reset_stoplight(self):
         global selected_object
 
-        selected_object.reset_light()
+        history.execute(ResetLight(selected_object))
 
-    def open_edit_dialog(self):
-        dialog = EditDialog()
+    def undo(self):
+        """
+        Reverts the last edit of the map
+        :return: None
+        """
+        command = history.undo()
+        if command is not None and command.map_object not in map_model:
+            self.select(None)
+        self.model_changed.emit()
+
+    def redo(self):
+        """
+        Applies the last reverted edit of the map again
+        :return: None
+        """
+        history.redo()
+        self.model_changed.emit()
+
+    def exec_dialog(self, dialog):
+        """
+        Runs a dialog, then journals the profiles and recomputes the menu state, since dialogs also edit the profile
+        lists, which the map model does not report
+        :param dialog: dialog to be run
+        :return: None
+        """
         dialog.exec_()
         dialog.show()
+        if journal is not None:
+            journal.record_profiles()
+        self.model_changed.emit()
+
+    def open_edit_dialog(self):
+        dialog = EditDialog()
+        self.exec_dialog(dialog)
 
     def open_add_dialog(self):
         dialog = AddDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_update_yellow_dialog(self):
         dialog = YellowDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_add_cycle_dialog(self):
         dialog = AddCycleDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
 
     def open_connect_dialog(self):
@@ -374,8 +871,7 @@ class MapBuilder(QMainWindow):
         :return: the prompt that allows users to connect two intersections
         """
         dialog = ConnectDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_add_driver_profile_dialog(self):
         """
@@ -385,8 +881,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 0
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_add_vehicle_profile_dialog(self):
         """
@@ -396,8 +891,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 1
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_delete_driver_profile_dialog(self):
         """
@@ -407,8 +901,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 2
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_delete_vehicle_profile_dialog(self):
         """
@@ -418,8 +911,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 3
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_add_spawn_profile_dialog(self):
         """
@@ -429,8 +921,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 4
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def open_delete_spawn_profile_dialog(self):
         """
@@ -440,8 +931,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 5
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def add_profile_to_intersection_dialog(self):
         """
@@ -451,8 +941,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 6
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
     def delete_profile_from_intersection_dialog(self):
         """
@@ -462,8 +951,7 @@ class MapBuilder(QMainWindow):
         global profile_action_type
         profile_action_type = 7
         dialog = ProfileDialog()
-        dialog.exec_()
-        dialog.show()
+        self.exec_dialog(dialog)
 
 class ConnectDialog(QDialog):
     """
@@ -495,18 +983,15 @@ class ConnectDialog(QDialog):
         """
 
         global selected_object
-        global intersection
         layout = QFormLayout()
 
         self.formGroupBox = QGroupBox("Choose Intersection to Connect to")
 
-        index_of_selected_object = intersection.index(selected_object)
-
         self.intersection_list = QComboBox(self)
 
-        for x in range(len(intersection)):
-            if x != index_of_selected_object:
-                self.intersection_list.addItem(str(x))
+        for i in map_model.get_intersections():
+            if i is not selected_object:
+                self.intersection_list.addItem(str(map_model.intersection_id(i)))
 
         layout.addRow(QLabel("Intersection: "), self.intersection_list)
 
@@ -524,9 +1009,9 @@ class ConnectDialog(QDialog):
 
         num = int(self.intersection_list.currentText())
 
-        dest_intersect = intersection[num]
+        dest_intersect = map_model.get_intersection(num)
 
-        end_roads = intersection[num].get_connections()
+        end_roads = dest_intersect.get_connections()
 
         connected = False
 
@@ -593,10 +1078,10 @@ class ConnectDialog(QDialog):
             new_road.add_start_connection(selected_object)
             new_road.add_end_connection(dest_intersect)
 
-            road.append(new_road)
-
             dest_intersect.add_incoming_connection(new_road)
 
+            history.execute(AddRoad(new_road))
+
         self.close()
 
 class ProfileDialog(QDialog):
@@ -786,7 +1271,7 @@ class ProfileDialog(QDialog):
 
             driver_profile_names = []
 
-            for prof_name in driver_profiles:
+            for prof_name in map_model.driver_profiles:
                 name = prof_name.get_driver_profile_name()
                 if name != 'Default':
                     driver_profile_names.append(name)
@@ -808,7 +1293,7 @@ class ProfileDialog(QDialog):
 
             vehicle_profile_names = []
 
-            for prof_name in vehicle_profiles:
+            for prof_name in map_model.vehicle_profiles:
                 name = prof_name.get_vehicle_profile_name()
                 if name != 'Default':
                     vehicle_profile_names.append(name)
@@ -831,12 +1316,12 @@ class ProfileDialog(QDialog):
             vehicle_profile_name_list = []
             driver_profile_name_list = []
 
-            for v in vehicle_profiles:
+            for v in map_model.vehicle_profiles:
                 name = v.get_vehicle_profile_name()
                 vehicle_profile_name_list.append(name)
 
 
-            for d in driver_profiles:
+            for d in map_model.driver_profiles:
                 name = d.get_driver_profile_name()
                 driver_profile_name_list.append(name)
 
@@ -865,7 +1350,7 @@ class ProfileDialog(QDialog):
 
             spawning_profile_names = []
 
-            for prof_name in spawning_profiles:
+            for prof_name in map_model.spawning_profiles:
                 name = prof_name.get_spawning_profile_name()
                 if name != 'Default':
                     spawning_profile_names.append(name)
@@ -887,7 +1372,7 @@ class ProfileDialog(QDialog):
 
             spawning_profile_names = []
 
-            for prof_name in spawning_profiles:
+            for prof_name in map_model.spawning_profiles:
                 name = prof_name.get_spawning_profile_name()
                 spawning_profile_names.append(name)
 
@@ -928,11 +1413,7 @@ class ProfileDialog(QDialog):
         :return: a modified state
         """
         global profile_action_type
-        global driver_profiles
-        global vehicle_profiles
-        global spawning_profiles
         global selected_object
-        global intersection
 
         if profile_action_type == 0:
             """
@@ -945,14 +1426,14 @@ class ProfileDialog(QDialog):
 
             name_in_use = False
 
-            for profile in driver_profiles:
+            for profile in map_model.driver_profiles:
                 if profile.get_driver_profile_name() == self.driver_name.text():
                     name_in_use = True
                     break
 
 
             if (self.driver_name.text() != '') & (not name_in_use):
-                driver_profiles.append(driver)
+                map_model.driver_profiles.append(driver)
                 # need to enable the delete_driver_action
                 # need to display error message of some sort when no name is given
 
@@ -966,13 +1447,13 @@ class ProfileDialog(QDialog):
 
             name_in_use = False
 
-            for profile in vehicle_profiles:
+            for profile in map_model.vehicle_profiles:
                 if profile.get_vehicle_profile_name() == self.vehicle_name.text():
                     name_in_use = True
                     break
 
             if (self.vehicle_name.text() != '') & (not name_in_use):
-                vehicle_profiles.append(vehicle)
+                map_model.vehicle_profiles.append(vehicle)
 
         elif profile_action_type == 2:
             """
@@ -984,7 +1465,7 @@ class ProfileDialog(QDialog):
             deleted_profile = None
             spawning_profiles_to_delete = []
 
-            for profile in driver_profiles:
+            for profile in map_model.driver_profiles:
                 name = profile.get_driver_profile_name()
                 if name == str(self.deleted_driver):
                     deleted_profile = profile
@@ -992,26 +1473,28 @@ class ProfileDialog(QDialog):
 
             if deleted_profile is not None:
 
-                for profile in spawning_profiles:
+                for profile in map_model.spawning_profiles:
                     if profile.get_driver_profile() == deleted_profile:
                         spawning_profiles_to_delete.append(profile)
 
                 for profile in spawning_profiles_to_delete:
-                    for i in intersection:
+                    for i in map_model.get_intersections():
                         for spawn in i.get_spawning_profile_list():
                             if spawn == profile:
                                 i.get_spawning_profile_list().remove(spawn)
 
                 for profile in spawning_profiles_to_delete:
-                    spawning_profiles.remove(profile)
+                    map_model.spawning_profiles.remove(profile)
 
-                driver_profiles.remove(deleted_profile)
+                map_model.driver_profiles.remove(deleted_profile)
+                # intersections lost profiles outside of the history, so older commands can no longer be undone
+                history.clear()
 
 
             #Remaining code in this else if statement is used for testing.
-            print(str(len(driver_profiles)))
+            print(str(len(map_model.driver_profiles)))
 
-            for profile in driver_profiles:
+            for profile in map_model.driver_profiles:
                 print(str(profile.get_driver_profile_name()) + ' ')
 
         elif profile_action_type == 3:
@@ -1024,7 +1507,7 @@ class ProfileDialog(QDialog):
             deleted_profile = None
             spawning_profiles_to_delete = []
 
-            for profile in vehicle_profiles:
+            for profile in map_model.vehicle_profiles:
                 name = profile.get_vehicle_profile_name()
                 if name == str(self.deleted_vehicle):
                     deleted_profile = profile
@@ -1032,25 +1515,27 @@ class ProfileDialog(QDialog):
 
             if deleted_profile is not None:
 
-                for profile in spawning_profiles:
+                for profile in map_model.spawning_profiles:
                     if profile.get_vehicle_profile() == deleted_profile:
                         spawning_profiles_to_delete.append(profile)
 
                 for profile in spawning_profiles_to_delete:
-                    for i in intersection:
+                    for i in map_model.get_intersections():
                         for spawn in i.get_spawning_profile_list():
                             if spawn == profile:
                                 i.get_spawning_profile_list().remove(spawn)
 
                 for profile in spawning_profiles_to_delete:
-                    spawning_profiles.remove(profile)
+                    map_model.spawning_profiles.remove(profile)
 
-                vehicle_profiles.remove(deleted_profile)
+                map_model.vehicle_profiles.remove(deleted_profile)
+                # intersections lost profiles outside of the history, so older commands can no longer be undone
+                history.clear()
 
             #Remaining code in this else if statement is used for testing.
-            print(str(len(vehicle_profiles)))
+            print(str(len(map_model.vehicle_profiles)))
 
-            for profile in vehicle_profiles:
+            for profile in map_model.vehicle_profiles:
                 print(str(profile.get_vehicle_profile_name()) + ' ')
 
         elif profile_action_type == 4:
@@ -1064,20 +1549,20 @@ class ProfileDialog(QDialog):
             selected_driver = None
             selected_vehicle = None
 
-            for profile in driver_profiles:
+            for profile in map_model.driver_profiles:
                 name = profile.get_driver_profile_name()
                 if name == str(self.driver_name_for_spawn):
                     selected_driver = profile
                     break
 
-            for vprofile in vehicle_profiles:
+            for vprofile in map_model.vehicle_profiles:
                 name = vprofile.get_vehicle_profile_name()
                 if name == str(self.vehicle_name_for_spawn):
                     selected_vehicle = vprofile
 
             name_in_use = False
 
-            for profile in spawning_profiles:
+            for profile in map_model.spawning_profiles:
                 if profile.get_spawning_profile_name() == self.spawn_name.text():
                     name_in_use = True
                     break
@@ -1085,12 +1570,12 @@ class ProfileDialog(QDialog):
 
             if (self.spawn_name.text() != '') & (not name_in_use):
                 spawning_profile = SpawningProfile(self.spawn_name.text(), selected_driver, selected_vehicle)
-                spawning_profiles.append(spawning_profile)
+                map_model.spawning_profiles.append(spawning_profile)
 
             #Remaining code in this else if statement is used for testing.
-            print(str(len(spawning_profiles)))
+            print(str(len(map_model.spawning_profiles)))
 
-            for profile in spawning_profiles:
+            for profile in map_model.spawning_profiles:
                 print(str(profile.get_spawning_profile_name()) + ' ')
 
         elif profile_action_type == 5:
@@ -1102,7 +1587,7 @@ class ProfileDialog(QDialog):
 
             deleted_profile = None
 
-            for profile in spawning_profiles:
+            for profile in map_model.spawning_profiles:
                 name = profile.get_spawning_profile_name()
                 if name == str(self.deleted_spawn):
                     deleted_profile = profile
@@ -1110,17 +1595,19 @@ class ProfileDialog(QDialog):
 
             if deleted_profile is not None:
 
-                for i in intersection:
+                for i in map_model.get_intersections():
                     for profile in i.get_spawning_profile_list():
                         if profile == deleted_profile:
                          i.get_spawning_profile_list().remove(profile)
 
-                spawning_profiles.remove(deleted_profile)
+                map_model.spawning_profiles.remove(deleted_profile)
+                # intersections lost profiles outside of the history, so older commands can no longer be undone
+                history.clear()
 
             # Remaining code in this else if statement is used for testing.
-            print(str(len(spawning_profiles)))
+            print(str(len(map_model.spawning_profiles)))
 
-            for profile in spawning_profiles:
+            for profile in map_model.spawning_profiles:
                 print(str(profile.get_spawning_profile_name()) + ' ')
 
         elif profile_action_type == 6:
@@ -1131,7 +1618,7 @@ class ProfileDialog(QDialog):
 
             added_profile = None
 
-            for profile in spawning_profiles:
+            for profile in map_model.spawning_profiles:
                 name = profile.get_spawning_profile_name()
                 if name == str(self.intersection_add_spawn):
                     added_profile = profile
@@ -1145,7 +1632,7 @@ class ProfileDialog(QDialog):
                     break
 
             if (added_profile is not None) & (not name_in_use):
-                selected_object.add_spawning_profile(added_profile)
+                history.execute(AttachProfile(selected_object, added_profile))
 
         else:
             """
@@ -1155,27 +1642,25 @@ class ProfileDialog(QDialog):
 
             profile_to_delete = None
 
-            for profile in spawning_profiles:
+            for profile in map_model.spawning_profiles:
                 name = profile.get_spawning_profile_name()
                 if name == str(self.intersection_deleted_spawn):
                     profile_to_delete = profile
 
-            if profile_to_delete is not None:
-                selected_object.remove_spawning_profile(profile_to_delete)
+            if profile_to_delete in selected_object.get_spawning_profile_list():
+                history.execute(DetachProfile(selected_object, profile_to_delete))
+            elif profile_to_delete is not None:
+                print('Profile not found in list!')
 
-        # print('num driver profiles = ' + str(len(driver_profiles)))
+        # print('num driver profiles = ' + str(len(map_model.driver_profiles)))
 
-        # print('driver profile name = ' + driver_profiles[0].get_driver_profile_name())
-        # print('num vehicle profiles = ' + str(len(vehicle_profiles)))
+        # print('driver profile name = ' + map_model.driver_profiles[0].get_driver_profile_name())
+        # print('num vehicle profiles = ' + str(len(map_model.vehicle_profiles)))
 
         self.close()
 
 
 class EditDialog(QDialog):
-    global road
-    global intersection
-    global driver_profiles
-    global vehicle_profiles
 
     radius = None
     in_lanes = None
@@ -1250,20 +1735,15 @@ class EditDialog(QDialog):
     def accept(self):
         global selected_object
         if type(selected_object) is Intersection:
-            selected_object.radius = self.radius.value()
-            selected_object.speed_limit = self.intersection_speed.value()
+            changes = {'radius': self.radius.value(), 'speed_limit': self.intersection_speed.value()}
         else:
-            selected_object.in_lanes = self.in_lanes.value()
-            selected_object.out_lanes = self.out_lanes.value()
-            selected_object.speed_limit = self.speed_limit.value()
+            changes = {'in_lanes': self.in_lanes.value(), 'out_lanes': self.out_lanes.value(),
+                       'speed_limit': self.speed_limit.value()}
+        history.execute(EditObject(selected_object, changes))
         self.close()
 
 
 class AddDialog(QDialog):
-    global road
-    global intersection
-    global driver_profiles
-    global vehicle_profiles
 
     add_position = None
     radius = None
@@ -1350,21 +1830,22 @@ class AddDialog(QDialog):
         global selected_object
         if type(selected_object) is Road:
             if self.add_position.currentText() == "End":
-                intersection.append(selected_object.generate_end_connection(self.radius.value(),
-                                                                            self.intersection_speed_limit.value()))
+                new_object = selected_object.generate_end_connection(self.radius.value(),
+                                                                     self.intersection_speed_limit.value())
             else:
-                intersection.append(selected_object.generate_start_connection(self.radius.value(),
-                                                                              self.intersection_speed_limit.value()))
+                new_object = selected_object.generate_start_connection(self.radius.value(),
+                                                                       self.intersection_speed_limit.value())
+            history.execute(AddIntersection(new_object))
         else:
-            road.append(selected_object.add_connection(self.angle.value() * math.pi / 180, self.radius.value(),
-                                           self.in_lanes.value(), self.out_lanes.value(), self.speed_limit.value(),
-                                                       self.road_name.text()))
+            new_object = selected_object.add_connection(self.angle.value() * math.pi / 180, self.radius.value(),
+                                                        self.in_lanes.value(), self.out_lanes.value(),
+                                                        self.speed_limit.value(), self.road_name.text())
+            history.execute(AddRoad(new_object))
 
         self.close()
 
 
 class YellowDialog(QDialog):
-    global intersection
 
     yellow_length = None
 
@@ -1399,13 +1880,12 @@ class YellowDialog(QDialog):
     def accept(self):
         global selected_object
 
-        selected_object.set_yellow_length(self.yellow_length.value())
+        history.execute(EditObject(selected_object, {'yellow_light_length': self.yellow_length.value()}))
 
         self.close()
 
 
 class AddCycleDialog(QDialog):
-    global intersection
 
     name = None
     roads = []
@@ -1466,7 +1946,7 @@ class AddCycleDialog(QDialog):
 
         # if no roads are selected for cycle, do not add cycle!
         if len(r) != 0:
-            selected_object.add_cycle(self.name.text(), r, self.time.value())
+            history.execute(AddCycle(selected_object, self.name.text(), r, self.time.value()))
 
         self.close()
 
@@ -1476,37 +1956,34 @@ class TestClass:
     def setup(self):
         global app
 
-        app = QApplication(sys.argv)
+        app = QApplication.instance() or QApplication(sys.argv)
         mb = MapBuilder()
         mb.first_road()
+        self.map_builder = mb
 
     def map_builder_start(self):
-        global intersection
 
         self.setup()
 
-        return intersection
+        return map_model.get_intersections()
 
     def add_dialog_road(self):
         global selected_object
-        global road
-        global intersection
 
-        selected_object = intersection[0]
+        selected_object = map_model.get_intersections()[0]
 
         dialog = AddDialog()
         dialog.accept()
 
-        return road
+        return map_model.get_roads()
 
     def edit_dialog_road(self):
         global selected_object
-        global road
         global testing
 
         testing = True
 
-        selected_object = road[0]
+        selected_object = map_model.get_roads()[0]
 
         dialog = EditDialog()
         dialog.accept()
@@ -1515,24 +1992,21 @@ class TestClass:
 
     def add_dialog_intersection(self):
         global selected_object
-        global road
-        global intersection
 
-        selected_object = road[0]
+        selected_object = map_model.get_roads()[0]
 
         dialog = AddDialog()
         dialog.accept()
 
-        return intersection
+        return map_model.get_intersections()
 
     def edit_dialog_intersection(self):
         global selected_object
-        global road
         global testing
 
         testing = True
 
-        selected_object = intersection[0]
+        selected_object = map_model.get_intersections()[0]
 
         dialog = EditDialog()
         dialog.accept()
@@ -1541,20 +2015,17 @@ class TestClass:
 
 
     def get_empty_driver_profile_list(self):
-        global driver_profiles
 
-        return driver_profiles
+        return map_model.driver_profiles
 
 
     def get_empty_vehicle_profile_list(self):
-        global vehicle_profiles
 
-        return vehicle_profiles
+        return map_model.vehicle_profiles
 
 
     def populate_driver_profile_list(self):
         global profile_action_type
-        global driver_profiles
 
         profile_action_type = 0
 
@@ -1562,12 +2033,11 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return driver_profiles
+        return map_model.driver_profiles
 
 
     def populate_vehicle_profile_list(self):
         global profile_action_type
-        global vehicle_profiles
 
         profile_action_type = 1
 
@@ -1575,11 +2045,10 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return vehicle_profiles
+        return map_model.vehicle_profiles
 
     def delete_driver_profile(self):
         global profile_action_type
-        global driver_profiles
 
         profile_action_type = 2
 
@@ -1587,11 +2056,10 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return driver_profiles
+        return map_model.driver_profiles
 
     def delete_vehicle_profile(self):
         global  profile_action_type
-        global  vehicle_profiles
 
         profile_action_type = 3
 
@@ -1599,13 +2067,10 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return vehicle_profiles
+        return map_model.vehicle_profiles
 
     def populate_spawning_profile_list(self):
         global profile_action_type
-        global vehicle_profiles
-        global driver_profiles
-        global spawning_profiles
 
         profile_action_type = 4
 
@@ -1613,13 +2078,10 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return spawning_profiles
+        return map_model.spawning_profiles
 
     def delete_spawning_profile(self):
         global profile_action_type
-        global vehicle_profiles
-        global driver_profiles
-        global spawning_profiles
 
         profile_action_type = 5
 
@@ -1627,10 +2089,9 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return spawning_profiles
+        return map_model.spawning_profiles
 
     def add_spawning_profile_to_intersection(self):
-        global intersection
         global profile_action_type
 
         profile_action_type = 6
@@ -1639,10 +2100,9 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return intersection
+        return map_model.get_intersections()
 
     def delete_spawning_profile_from_intersection(self):
-        global intersection
         global profile_action_type
 
         profile_action_type = 7
@@ -1651,13 +2111,12 @@ class TestClass:
         pd.createFormGroupBox()
         pd.accept()
 
-        return intersection
+        return map_model.get_intersections()
 
     def connect_intersections(self):
-        global intersection
         global selected_object
 
-        selected_object = intersection[0]
+        selected_object = map_model.get_intersections()[0]
 
         cd = ConnectDialog()
         cd.createFormGroupBox()
@@ -1665,9 +2124,49 @@ class TestClass:
 
         return selected_object
 
+    def render_incremental_and_full(self, zoom=1.0):
+        """
+        Renders the map builder after a series of edits, pans and selections, and then again from scratch
+        :param zoom: zoom the map is rendered at
+        :return: tuple of the incrementally rendered image and the fully rendered image
+        """
+        self.setup()
+        mb = self.map_builder
+        mb.reset_file()
+        mb.zoom = zoom
+
+        self.add_dialog_road()
+        mb.grab()
+        # scroll the first intersection against the right edge so that the exposed strips cut through it
+        mb.x_offset = int(mb.size().width() - 410 * zoom)
+        mb.y_offset = int(mb.size().height() / 2 - 250 * zoom)
+        mb.grab()
+        for key in (QtCore.Qt.Key_D, QtCore.Qt.Key_D, QtCore.Qt.Key_S, QtCore.Qt.Key_A, QtCore.Qt.Key_D):
+            mb.keyPressEvent(QtGui.QKeyEvent(QtCore.QEvent.KeyPress, key, Qt.NoModifier))
+            mb.grab()
+
+        road = map_model.get_roads()[0]
+        mb.select(road)
+        mb.grab()
+        road.in_lanes = 1
+        map_model.update(road)
+        self.add_dialog_intersection()
+        incremental = mb.grab().toImage()
+
+        mb.backing = None
+        mb.tile_paths.invalidate(None)
+        mb.tile_cache.invalidate(None)
+        full = mb.grab().toImage()
+
+        return incremental, full
+
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     mb = MapBuilder()
-    mb.first_road()
-    sys.exit(app.exec_())
+    journal = Journal(AUTOSAVE_LOCATION)
+    mb.recover(journal)
+    journal.start(map_model)
+    status = app.exec_()
+    journal.stop()
+    sys.exit(status)
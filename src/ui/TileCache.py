@@ -0,0 +1,98 @@
+import math
+from collections import OrderedDict
+
+# side length of a raster tile, in pixels
+TILE_SIZE = 256
+
+# number of tiles kept before the least recently used one is evicted
+TILE_CACHE_CAPACITY = 128
+
+
+class TileCache(object):
+    """
+    This class keeps pre-rendered square tiles of the static map layer. Tiles are keyed by (tile x, tile y, zoom),
+    where tile (0, 0) starts at the map origin, so the same tiles are reused however the map is panned. When more
+    than capacity tiles are stored the least recently used one is dropped, and edits only drop the tiles they touch.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE, capacity=TILE_CACHE_CAPACITY):
+        """
+        Establishes an empty tile cache
+
+        :param tile_size: side length of a tile in pixels
+        :param capacity: maximum number of tiles kept
+
+        :type tile_size: int
+        :type capacity: int
+        """
+        self.tile_size = tile_size
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def get(self, key):
+        """
+        :param key: (tile x, tile y, zoom) of the tile
+        :return: the cached tile, or None if it has to be rendered
+        """
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        """
+        Stores a rendered tile, evicting the least recently used tiles if the cache is full
+        :param key: (tile x, tile y, zoom) of the tile
+        :param tile: rendered tile
+        :return: None
+        """
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.capacity:
+            self.tiles.popitem(last=False)
+
+    def tiles_in(self, left, top, right, bottom):
+        """
+        :param left: left edge of a rectangle in pixels, relative to the map origin
+        :param top: top edge of the rectangle
+        :param right: right edge of the rectangle, inclusive
+        :param bottom: bottom edge of the rectangle, inclusive
+        :return: list of (tile x, tile y) of the tiles overlapping the rectangle
+        """
+        start_x = int(math.floor(left / float(self.tile_size)))
+        start_y = int(math.floor(top / float(self.tile_size)))
+        end_x = int(math.floor(right / float(self.tile_size)))
+        end_y = int(math.floor(bottom / float(self.tile_size)))
+        return [(tile_x, tile_y) for tile_y in range(start_y, end_y + 1) for tile_x in range(start_x, end_x + 1)]
+
+    def map_bounds(self, key, margin=0):
+        """
+        :param key: (tile x, tile y, zoom) of a tile
+        :param margin: pixels added around the tile
+        :return: (min_x, min_y, max_x, max_y) area of the map covered by the tile, in map coordinates
+        """
+        tile_x, tile_y, zoom = key
+        return ((tile_x * self.tile_size - margin) / zoom, (tile_y * self.tile_size - margin) / zoom,
+                ((tile_x + 1) * self.tile_size + margin) / zoom, ((tile_y + 1) * self.tile_size + margin) / zoom)
+
+    def invalidate(self, bounds, margin=0):
+        """
+        Drops every tile, at any zoom, that shows part of a bounding box
+        :param bounds: (min_x, min_y, max_x, max_y) bounding box in map coordinates, None drops every tile
+        :param margin: pixels drawn outside of the bounding box, such as an outline
+        :return: None
+        """
+        if bounds is None:
+            self.tiles.clear()
+            return
+
+        for key in list(self.tiles):
+            min_x, min_y, max_x, max_y = self.map_bounds(key, margin)
+            if min_x <= bounds[2] and bounds[0] <= max_x and min_y <= bounds[3] and bounds[1] <= max_y:
+                del self.tiles[key]
@@ -0,0 +1,422 @@
+import sys
+import os
+import mmap
+import struct
+from collections import namedtuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.DriverProfile import DriverProfile
+from src.map.VehicleProfile import VehicleProfile
+from src.map.SpawningProfile import SpawningProfile
+from src.map.MapModel import MapModel, NO_CONNECTION
+from src.xml_parse.Exceptions import BinaryFormatError
+
+BINARY_MAGIC = b'TSMB'
+BINARY_VERSION = 1
+
+# sections of the file in the order they are written, the header stores a (count, offset) pair for each of them
+SECTIONS = ('roads', 'intersections', 'connections', 'cycles', 'cycle_roads', 'drivers', 'vehicles', 'profiles',
+            'profile_refs', 'strings', 'string_data')
+
+HEADER = struct.Struct('<4sI' + 'QQ' * len(SECTIONS))
+
+# fixed width records, all little endian. Names are indices into the string table and every reference to another
+# record is its index in that record's table, with NO_CONNECTION for a missing intersection.
+ROAD_RECORD = struct.Struct('<7d5i')
+INTERSECTION_RECORD = struct.Struct('<4d7i')
+CYCLE_RECORD = struct.Struct('<idii')
+DRIVER_RECORD = struct.Struct('<i7d')
+VEHICLE_RECORD = struct.Struct('<i6d')
+PROFILE_RECORD = struct.Struct('<3i')
+INDEX_RECORD = struct.Struct('<i')
+STRING_RECORD = struct.Struct('<QI')
+
+RoadRecord = namedtuple('RoadRecord', ['start_x', 'start_y', 'end_x', 'end_y', 'length', 'angle', 'speed_limit',
+                                       'in_lanes', 'out_lanes', 'start_intersection', 'end_intersection', 'name'])
+IntersectionRecord = namedtuple('IntersectionRecord', ['center_x', 'center_y', 'radius', 'speed_limit',
+                                                       'yellow_light', 'connections', 'cycles', 'profiles'])
+CycleRecord = namedtuple('CycleRecord', ['name', 'timing', 'roads'])
+
+
+def export_binary(roads, intersections, save_location):
+    """
+    Saves a map in the binary map format. Unlike export_xml this does not check the map, so maps that are still
+    being built can be saved and loaded again with load_binary.
+    :param roads: list of the roads in the map
+    :param intersections: list of the intersections in the map
+    :param save_location: where to save the binary file
+    :return: None
+    """
+    with open(save_location, 'wb') as binary_file:
+        write_binary(roads, intersections, binary_file)
+
+
+def write_binary(roads, intersections, binary_file):
+    """
+    Writes a map in the binary map format to an open, seekable binary file handle. Every section is written in one
+    pass over the map and the header is filled in at the end.
+    :param roads: list of the roads in the map
+    :param intersections: list of the intersections in the map
+    :param binary_file: binary file handle to write to
+    :return: None
+    """
+    road_ids = dict((road, index) for index, road in enumerate(roads))
+    intersection_ids = dict((intersection, index) for index, intersection in enumerate(intersections))
+    strings = StringTable()
+    sections = {}
+
+    def begin(section):
+        sections[section] = [0, binary_file.tell()]
+
+    def write(section, record, *values):
+        binary_file.write(record.pack(*values))
+        sections[section][0] += 1
+
+    binary_file.write(b'\0' * HEADER.size)
+
+    begin('roads')
+    for road in roads:
+        start_id = intersection_ids.get(road.get_start_connection(), NO_CONNECTION)
+        end_id = intersection_ids.get(road.get_end_connection(), NO_CONNECTION)
+        write('roads', ROAD_RECORD, road.get_start_coords().get_x(), road.get_start_coords().get_y(),
+              road.get_end_coords().get_x(), road.get_end_coords().get_y(), road.get_length(), road.get_angle(),
+              road.get_speed_limit(), road.get_in_lanes(), road.get_out_lanes(), start_id, end_id,
+              strings.add(road.get_name()))
+
+    connection_count = 0
+    cycle_count = 0
+    profile_ref_count = 0
+    begin('intersections')
+    for intersection in intersections:
+        connections = len(intersection.get_connections())
+        cycles = len(intersection.green_cycle_roads)
+        profiles = len(intersection.get_spawning_profile_list() or [])
+        write('intersections', INTERSECTION_RECORD, intersection.get_center().get_x(),
+              intersection.get_center().get_y(), intersection.get_radius(), intersection.get_speed_limit(),
+              intersection.yellow_light_length, connection_count, connections, cycle_count, cycles,
+              profile_ref_count, profiles)
+        connection_count += connections
+        cycle_count += cycles
+        profile_ref_count += profiles
+
+    begin('connections')
+    for intersection in intersections:
+        for road in intersection.get_connections():
+            write('connections', INDEX_RECORD, road_ids.get(road, NO_CONNECTION))
+
+    cycle_road_count = 0
+    begin('cycles')
+    for intersection in intersections:
+        for i, cycle_roads in enumerate(intersection.green_cycle_roads):
+            write('cycles', CYCLE_RECORD, strings.add(intersection.cycle_names[i]),
+                  intersection.green_cycle_times[i], cycle_road_count, len(cycle_roads))
+            cycle_road_count += len(cycle_roads)
+
+    begin('cycle_roads')
+    for intersection in intersections:
+        for cycle_roads in intersection.green_cycle_roads:
+            for road in cycle_roads:
+                write('cycle_roads', INDEX_RECORD, road)
+
+    profile_ids = {}
+    driver_ids = {}
+    vehicle_ids = {}
+    for intersection in intersections:
+        for profile in intersection.get_spawning_profile_list() or []:
+            if profile not in profile_ids:
+                profile_ids[profile] = len(profile_ids)
+                driver_ids.setdefault(profile.driver_profile, len(driver_ids))
+                vehicle_ids.setdefault(profile.vehicle_profile, len(vehicle_ids))
+
+    begin('drivers')
+    for driver in sorted(driver_ids, key=driver_ids.get):
+        write('drivers', DRIVER_RECORD, strings.add(driver.driver_profile_name), driver.over_braking_factor,
+              driver.following_time, driver.max_accel, driver.min_accel, driver.max_speed, driver.accel_time,
+              driver.update_time_ms)
+
+    begin('vehicles')
+    for vehicle in sorted(vehicle_ids, key=vehicle_ids.get):
+        write('vehicles', VEHICLE_RECORD, strings.add(vehicle.profile_name), vehicle.width, vehicle.length,
+              vehicle.max_accel, vehicle.max_braking_decel, vehicle.mass, vehicle.max_speed)
+
+    begin('profiles')
+    for profile in sorted(profile_ids, key=profile_ids.get):
+        write('profiles', PROFILE_RECORD, strings.add(profile.profile_name), driver_ids[profile.driver_profile],
+              vehicle_ids[profile.vehicle_profile])
+
+    begin('profile_refs')
+    for intersection in intersections:
+        for profile in intersection.get_spawning_profile_list() or []:
+            write('profile_refs', INDEX_RECORD, profile_ids[profile])
+
+    begin('strings')
+    data_offset = 0
+    for data in strings.encoded:
+        write('strings', STRING_RECORD, data_offset, len(data))
+        data_offset += len(data)
+
+    begin('string_data')
+    for data in strings.encoded:
+        binary_file.write(data)
+    sections['string_data'][0] = data_offset
+
+    end = binary_file.tell()
+    binary_file.seek(0)
+    header = []
+    for section in SECTIONS:
+        header.extend(sections[section])
+    binary_file.write(HEADER.pack(BINARY_MAGIC, BINARY_VERSION, *header))
+    binary_file.seek(end)
+
+
+class StringTable(object):
+    """
+    Collects the distinct strings of a map while it is written. Each string is stored once, utf-8 encoded.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.encoded = []
+
+    def add(self, text):
+        """
+        :param text: string to store, None is stored as an empty string
+        :return: index of the string in the table
+        """
+        text = "" if text is None else str(text)
+        if text not in self.ids:
+            self.ids[text] = len(self.encoded)
+            self.encoded.append(text.encode('utf-8'))
+        return self.ids[text]
+
+
+def load_binary(load_location):
+    """
+    Opens a binary map file. Only the header is read, records are decoded when they are asked for.
+    :param load_location: location of the binary file
+    :return: BinaryMap over the file, which should be closed when it is no longer needed
+    """
+    return BinaryMap(load_location)
+
+
+class BinaryMap(object):
+    """
+    This class is a read only view of a binary map file. The file is memory mapped, and roads, intersections and
+    profiles are decoded from their fixed width records one at a time, so opening a map takes the same time no
+    matter how large it is. to_model() turns the whole file into editable objects.
+    """
+
+    def __init__(self, load_location):
+        """
+        Opens and memory maps a binary map file
+        :param load_location: location of the binary file
+        :type load_location: str
+        """
+        self.file = open(load_location, 'rb')
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size < HEADER.size:
+                raise BinaryFormatError('{} is too short to be a binary map'.format(load_location))
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+
+        header = HEADER.unpack_from(self.data, 0)
+        if header[0] != BINARY_MAGIC:
+            self.close()
+            raise BinaryFormatError('{} is not a binary map'.format(load_location))
+        if header[1] != BINARY_VERSION:
+            self.close()
+            raise BinaryFormatError('Unsupported binary map version {}'.format(header[1]))
+
+        self.counts = {}
+        self.offsets = {}
+        for i, section in enumerate(SECTIONS):
+            self.counts[section] = header[2 + 2 * i]
+            self.offsets[section] = header[3 + 2 * i]
+        if self.offsets['string_data'] + self.counts['string_data'] > size:
+            self.close()
+            raise BinaryFormatError('{} is truncated'.format(load_location))
+
+    def close(self):
+        """
+        Unmaps and closes the file
+        :return: None
+        """
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def road_count(self):
+        """
+        :return: number of roads in the map
+        """
+        return self.counts['roads']
+
+    def intersection_count(self):
+        """
+        :return: number of intersections in the map
+        """
+        return self.counts['intersections']
+
+    def road(self, road_id):
+        """
+        :param road_id: index of the road
+        :return: RoadRecord of the road, with its name decoded
+        """
+        values = self._unpack('roads', ROAD_RECORD, road_id)
+        return RoadRecord(*(values[:-1] + (self.string(values[-1]),)))
+
+    def intersection(self, intersection_id):
+        """
+        :param intersection_id: index of the intersection
+        :return: IntersectionRecord of the intersection, holding the ids of its connected roads, its CycleRecords
+        and the ids of its spawning profiles
+        """
+        values = self._unpack('intersections', INTERSECTION_RECORD, intersection_id)
+        (center_x, center_y, radius, speed_limit, yellow_light, connection_start, connection_count, cycle_start,
+         cycle_count, profile_start, profile_count) = values
+        cycles = [self.cycle(cycle_start + i) for i in range(cycle_count)]
+        return IntersectionRecord(center_x, center_y, radius, speed_limit, yellow_light,
+                                  self._indices('connections', connection_start, connection_count), cycles,
+                                  self._indices('profile_refs', profile_start, profile_count))
+
+    def cycle(self, cycle_id):
+        """
+        :param cycle_id: index of the traffic cycle
+        :return: CycleRecord of the cycle
+        """
+        name, timing, roads_start, roads_count = self._unpack('cycles', CYCLE_RECORD, cycle_id)
+        return CycleRecord(self.string(name), timing, self._indices('cycle_roads', roads_start, roads_count))
+
+    def profile_count(self):
+        """
+        :return: number of spawning profiles in the map
+        """
+        return self.counts['profiles']
+
+    def profile(self, profile_id):
+        """
+        :param profile_id: index of the spawning profile
+        :return: tuple of the name, driver index and vehicle index of the spawning profile
+        """
+        name, driver_id, vehicle_id = self._unpack('profiles', PROFILE_RECORD, profile_id)
+        return self.string(name), driver_id, vehicle_id
+
+    def driver(self, driver_id):
+        """
+        :return: tuple of the name and the parameters of a driver profile, in constructor order
+        """
+        values = self._unpack('drivers', DRIVER_RECORD, driver_id)
+        return (self.string(values[0]),) + values[1:]
+
+    def vehicle(self, vehicle_id):
+        """
+        :return: tuple of the name and the parameters of a vehicle profile, in constructor order
+        """
+        values = self._unpack('vehicles', VEHICLE_RECORD, vehicle_id)
+        return (self.string(values[0]),) + values[1:]
+
+    def string(self, string_id):
+        """
+        :return: string with the given index in the string table
+        """
+        offset, length = self._unpack('strings', STRING_RECORD, string_id)
+        start = self.offsets['string_data'] + offset
+        return self.data[start:start + length].decode('utf-8')
+
+    def iter_roads(self):
+        """
+        :return: iterator over the RoadRecords of every road, in id order
+        """
+        return (self.road(road_id) for road_id in range(self.road_count()))
+
+    def iter_intersections(self):
+        """
+        :return: iterator over the IntersectionRecords of every intersection, in id order
+        """
+        return (self.intersection(intersection_id) for intersection_id in range(self.intersection_count()))
+
+    def to_model(self, model=None):
+        """
+        Builds Road, Intersection and profile objects for the whole map
+        :param model: model to load the map into, its roads and intersections are replaced but its profiles are kept
+        :return: model holding the map
+        """
+        drivers = [DriverProfile(*[as_number(value) for value in self.driver(i)])
+                   for i in range(self.counts['drivers'])]
+        vehicles = [VehicleProfile(*[as_number(value) for value in self.vehicle(i)])
+                    for i in range(self.counts['vehicles'])]
+        profiles = []
+        for i in range(self.profile_count()):
+            name, driver_id, vehicle_id = self.profile(i)
+            profiles.append(SpawningProfile(name, drivers[driver_id], vehicles[vehicle_id]))
+
+        roads = []
+        for record in self.iter_roads():
+            roads.append(Road(Coordinates(as_number(record.start_x), as_number(record.start_y)),
+                              Coordinates(as_number(record.end_x), as_number(record.end_y)),
+                              as_number(record.length), record.out_lanes, record.in_lanes, record.angle,
+                              as_number(record.speed_limit), record.name))
+
+        intersections = []
+        for record in self.iter_intersections():
+            intersection = Intersection(Coordinates(as_number(record.center_x), as_number(record.center_y)),
+                                        as_number(record.radius), as_number(record.speed_limit))
+            intersection.set_yellow_length(record.yellow_light)
+            intersection.connections = [roads[road_id] for road_id in record.connections
+                                        if road_id != NO_CONNECTION]
+            for cycle in record.cycles:
+                intersection.add_cycle(cycle.name, cycle.roads, as_number(cycle.timing))
+            for profile_id in record.profiles:
+                intersection.add_spawning_profile(profiles[profile_id])
+            intersections.append(intersection)
+
+        for road_id, road in enumerate(roads):
+            start_id, end_id = self._unpack('roads', ROAD_RECORD, road_id)[9:11]
+            if start_id != NO_CONNECTION:
+                road.add_start_connection(intersections[start_id])
+            if end_id != NO_CONNECTION:
+                road.add_end_connection(intersections[end_id])
+
+        if model is None:
+            model = MapModel()
+        else:
+            model.clear(keep_profiles=True)
+        model.add_intersections(intersections)
+        model.add_roads(roads)
+        model.driver_profiles.extend(drivers)
+        model.vehicle_profiles.extend(vehicles)
+        model.spawning_profiles.extend(profiles)
+        return model
+
+    def _unpack(self, section, record, index):
+        if not 0 <= index < self.counts[section]:
+            raise IndexError('{} index out of range'.format(section))
+        return record.unpack_from(self.data, self.offsets[section] + index * record.size)
+
+    def _indices(self, section, start, count):
+        return list(struct.unpack_from('<{}i'.format(count), self.data,
+                                       self.offsets[section] + start * INDEX_RECORD.size))
+
+
+def as_number(value):
+    """
+    :return: the value as an int if it is a whole number, so that numbers keep the form they were created with in
+    the editor when the map is exported again
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
@@ -1,2 +1,26 @@
 IMPORT_ROAD_TOLERANCE = 0.001
-SIG_FIGS = 4
\ No newline at end of file
+SIG_FIGS = 4
+
+# radians roads may share on an intersection circle before they count as overlapping, so touching roads are valid
+OVERLAP_TOLERANCE = 1e-9
+
+# distance road and intersection shapes may overlap before they count as overlapping, so touching shapes are valid
+CONTACT_TOLERANCE = 1e-6
+
+# number of separate parts whose location is listed when an export is refused for a map that is not connected
+MAX_REPORTED_COMPONENTS = 5
+
+# number of elements serialized at once by the streaming xml writer
+XML_CHUNK_SIZE = 1000
+
+# number of roads or intersections exported between two progress reports
+EXPORT_PROGRESS_INTERVAL = 1000
+
+# suffix of the file an export is written to before it replaces the chosen file
+EXPORT_TEMP_SUFFIX = '.part'
+
+# extension of the lane graph file export_xml writes next to the xml map
+LANE_GRAPH_EXTENSION = '.lanes'
+
+# speed limit given to imported intersections, the xml format does not store one
+IMPORT_INTERSECTION_SPEED_LIMIT = 25
@@ -8,4 +8,28 @@ class XMLFormatError(Exception):
         self.msg = msg
 
     def __str__(self):
-        return self.msg
\ No newline at end of file
+        return self.msg
+
+
+class BinaryFormatError(XMLFormatError):
+    """
+    Import Exception for binary map files that are truncated or were not written by export_binary
+    :param XMLFormatError:
+    :return:
+    """
+
+
+class JournalFormatError(XMLFormatError):
+    """
+    Exception for journal or snapshot files holding records that cannot be read
+    :param XMLFormatError:
+    :return:
+    """
+
+
+class ExportCancelled(Exception):
+    """
+    Raised by a progress callback to stop an export. The file being exported to is left as it was.
+    :param Exception:
+    :return:
+    """
@@ -5,96 +5,351 @@ import xml.etree.ElementTree as ET
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
-from src.xml_parse.Utils import is_connected_traffic_map
+from src.xml_parse.Utils import is_connected_traffic_map, check_overload_intersection, find_components, \
+    describe_bounds
+from src.xml_parse.Validation import find_overlaps
+from src.xml_parse.LaneGraphFile import export_lane_graph, lane_graph_location, xml_fingerprint
+from src.map.LaneGraph import compile_lane_graph
 from src.map.Coordinates import Coordinates
 from src.map.Constants import LANE_WIDTH
 from src.xml_parse.Exceptions import XMLFormatError
+from src.xml_parse.Constants import XML_CHUNK_SIZE, EXPORT_PROGRESS_INTERVAL, EXPORT_TEMP_SUFFIX, \
+    MAX_REPORTED_COMPONENTS
 
 
-def export_xml(roads, intersections, save_location):
+def export_xml(roads, intersections, save_location, streaming=True, inline_profiles=True, progress=None,
+               lane_graph=False):
     """
-    Main function of export that makes that the map is valid and then creates an xml file
+    Main function of export that makes that the map is valid and then creates an xml file. The file is written next
+    to save_location first and only replaces it once complete, so a failed or cancelled export leaves it untouched.
     :param roads: list of the roads in the map
     :param intersections: list of the roads in the map
     :param save_location: where to save the xml file
+    :param streaming: write the file one road or intersection at a time instead of building the whole tree first
+    :param inline_profiles: write the full spawning profiles into every intersection, as the simulator currently
+    expects, instead of a shared profile table
+    :param progress: called as progress(stage, done, total) for the 'validation', 'roads', 'intersections', 'lanes'
+    and 'write' stages, it may raise ExportCancelled to stop the export
+    :param lane_graph: also compile the lane graph of the map and save it next to the xml file, at
+    lane_graph_location(save_location), so the simulator does not have to build it from the xml. The graph records
+    a fingerprint of the xml and load_lane_graph refuses it once the xml changes. Without it, a lane graph left
+    there by an earlier export is deleted.
     :return:
     """
-    if is_connected_traffic_map(roads, intersections) and valid_intersections(intersections):
-        make_xml(roads, intersections, save_location)
-    else:
-        raise XMLFormatError('Map is not connected')
+    report_progress(progress, 'validation', 0, 3)
+    if not is_connected_traffic_map(roads, intersections):
+        raise XMLFormatError(disconnected_message(roads, intersections))
+    report_progress(progress, 'validation', 1, 3)
+    if not valid_intersections(intersections):
+        raise XMLFormatError('Roads overlap on an intersection')
+    report_progress(progress, 'validation', 2, 3)
+    if find_overlaps(roads, intersections):
+        raise XMLFormatError('Roads or intersections overlap')
+    report_progress(progress, 'validation', 3, 3)
+
+    temp_location = save_location + EXPORT_TEMP_SUFFIX
+    lanes_location = lane_graph_location(save_location)
+    temp_lanes_location = lanes_location + EXPORT_TEMP_SUFFIX
+    try:
+        if streaming:
+            stream_xml(roads, intersections, temp_location, inline_profiles, progress)
+        else:
+            make_xml(roads, intersections, temp_location, inline_profiles, progress)
+        if lane_graph:
+            report_progress(progress, 'lanes', 0, 1)
+            export_lane_graph(compile_lane_graph(roads, intersections), temp_lanes_location,
+                              xml_fingerprint(temp_location))
+            report_progress(progress, 'lanes', 1, 1)
+        report_progress(progress, 'write', 0, 1)
+        os.replace(temp_location, save_location)
+        if lane_graph:
+            os.replace(temp_lanes_location, lanes_location)
+        elif os.path.exists(lanes_location):
+            os.remove(lanes_location)
+    except BaseException:
+        for location in (temp_location, temp_lanes_location):
+            if os.path.exists(location):
+                os.remove(location)
+        raise
+    report_progress(progress, 'write', 1, 1)
+
+
+def disconnected_message(roads, intersections):
+    """
+    Describes where the parts of a map that is not connected are, so they can be found in the MapBuilder
+    :param roads: list of the roads in the map
+    :param intersections: list of the intersections in the map
+    :return: error message naming the number of parts and the bounding boxes of all but the largest one
+    """
+    components, _ = find_components(roads, intersections)
+    components.sort(key=len, reverse=True)
+    smaller = [describe_bounds(component.bounds) for component in components[1:MAX_REPORTED_COMPONENTS + 1]]
+    if len(components) > MAX_REPORTED_COMPONENTS + 1:
+        smaller.append('...')
+    return 'Map is not connected: {} separate parts, apart from the largest at {}'.format(len(components),
+                                                                                         ', '.join(smaller))
+
+
+def report_progress(progress, stage, done, total):
+    """
+    Reports the progress of an export stage if a progress callback was given
+    :param progress: progress callback or None
+    :param stage: name of the stage
+    :param done: number of items of the stage that are done
+    :param total: number of items of the stage
+    :return: None
+    """
+    if progress is not None:
+        progress(stage, done, total)
 
 
-def make_xml(roads, intersections, save_location):
+def make_xml(roads, intersections, save_location, inline_profiles=True, progress=None):
     """
     Creates an xml document from a map and saves it to a given location
     :param roads: list of roads in the map
     :param intersections: list of intersections in the mpa
     :param save_location: location of the xml file
+    :param inline_profiles: whether spawning profiles are written inline or as a shared profile table
+    :param progress: progress callback, see export_xml
     :return:
     """
     traffic_map = ET.Element("map")
 
-    for index, road in enumerate(roads):
-        temp_road = ET.SubElement(traffic_map, "road", name=str(index))
-        length, anchor_coordinate = convert_road_to_simulation_size(road)
+    for element in map_elements(roads, intersections, inline_profiles, progress):
+        traffic_map.append(element)
+
+    tree = ET.ElementTree(traffic_map)
+    tree.write(save_location)
+
+
+def stream_xml(roads, intersections, save_location, inline_profiles=True, progress=None):
+    """
+    Creates the same xml document as make_xml, but writes it to the given location one element at a time
+    :param roads: list of roads in the map
+    :param intersections: list of intersections in the map
+    :param save_location: location of the xml file
+    :param inline_profiles: whether spawning profiles are written inline or as a shared profile table
+    :param progress: progress callback, see export_xml
+    :return:
+    """
+    with open(save_location, 'wb') as xml_file:
+        write_xml(roads, intersections, xml_file, inline_profiles, progress)
+
+
+def write_xml(roads, intersections, xml_file, inline_profiles=True, progress=None):
+    """
+    Writes the xml document of a map to an open binary file handle. Elements are serialized in chunks of
+    XML_CHUNK_SIZE, so memory use does not grow with the map, and the output is byte for byte identical to make_xml.
+    :param roads: list of roads in the map
+    :param intersections: list of intersections in the map
+    :param xml_file: binary file handle to write to
+    :param inline_profiles: whether spawning profiles are written inline or as a shared profile table
+    :param progress: progress callback, see export_xml
+    :return:
+    """
+    opened = False
+    chunk = ET.Element("map")
+
+    for element in map_elements(roads, intersections, inline_profiles, progress):
+        chunk.append(element)
+        if len(chunk) >= XML_CHUNK_SIZE:
+            if not opened:
+                xml_file.write(b"<map>")
+                opened = True
+            # strip the surrounding <map> and </map> tags of the chunk
+            xml_file.write(ET.tostring(chunk)[5:-6])
+            chunk = ET.Element("map")
+
+    if not opened:
+        xml_file.write(ET.tostring(chunk))
+        return
 
-        ET.SubElement(temp_road, "length").text = str(length)
-        ET.SubElement(temp_road, "incoming_lanes").text = str(road.get_in_lanes())
-        ET.SubElement(temp_road, "outgoing_lanes").text = str(road.get_out_lanes())
+    if len(chunk) > 0:
+        xml_file.write(ET.tostring(chunk)[5:-6])
+    xml_file.write(b"</map>")
 
-        ET.SubElement(temp_road, "angle_radians").text = str(road.get_compatible_angle())
-        ET.SubElement(temp_road, "anchor_point").text = \
-            "{} {}".format(anchor_coordinate.get_x(), anchor_coordinate.get_y())
 
-        ET.SubElement(temp_road, "speed_limit").text = "30"  # TODO change when speed limit is added
+def map_elements(roads, intersections, inline_profiles=True, progress=None):
+    """
+    Generates the children of the map element: the shared profile table if profiles are not inlined, then all
+    roads and then all intersections
+    :param roads: list of roads in the map
+    :param intersections: list of intersections in the map
+    :param inline_profiles: whether spawning profiles are written inline or as a shared profile table
+    :param progress: progress callback, see export_xml. It is called every EXPORT_PROGRESS_INTERVAL elements.
+    :return: generator of profile table, road and intersection elements
+    """
+    intersection_ids = get_intersection_ids(intersections)
+
+    if inline_profiles:
+        profile_ids = None
+    else:
+        profile_ids, unique_profiles = get_profile_ids(intersections)
+        yield profile_table_element(unique_profiles)
 
-        if road.get_start_connection() is not None:
-            ET.SubElement(temp_road, "start_intersection").text = \
-                str(intersections.index(road.get_start_connection()))
-        if road.get_end_connection() is not None:
-            ET.SubElement(temp_road, "end_intersection").text = \
-                str(intersections.index(road.get_end_connection()))
+    for index, road in enumerate(roads):
+        if index % EXPORT_PROGRESS_INTERVAL == 0:
+            report_progress(progress, 'roads', index, len(roads))
+        yield road_element(index, road, intersection_ids)
+    report_progress(progress, 'roads', len(roads), len(roads))
 
     for index, intersection in enumerate(intersections):
-        temp_intersection = ET.SubElement(traffic_map, "intersection", name=str(index))
-        ET.SubElement(temp_intersection, "center_point").text = "{} {}".format(intersection.get_center().get_x(),
-                                                                               intersection.get_center().get_y())
-        ET.SubElement(temp_intersection, "radius").text = str(intersection.get_radius())
-        if intersection.get_spawning_profile_list() is not None and len(intersection.get_spawning_profile_list()) > 0:
-            profiles = ET.SubElement(temp_intersection, "spawning_profiles")
-            ET.SubElement(temp_intersection, "frequency").text = str(intersection.get_frequency())
-            for profile in intersection.get_spawning_profile_list():
-                temp_profile = ET.SubElement(profiles, "profile")
-                driver = ET.SubElement(temp_profile, "driver")
-                vehicle = ET.SubElement(temp_profile, "vehicle")
-
-                ET.SubElement(driver, "brake_factor").text = str(profile.driver_profile.over_braking_factor)
-                ET.SubElement(driver, "follow_time").text = str(profile.driver_profile.following_time)
-                ET.SubElement(driver, "max_accel").text = str(profile.driver_profile.max_accel)
-                ET.SubElement(driver, "min_accel").text = str(profile.driver_profile.min_accel)
-                ET.SubElement(driver, "max_speed").text = str(profile.driver_profile.max_speed)
-                ET.SubElement(driver, "accel_time").text = str(profile.driver_profile.accel_time)
-                ET.SubElement(driver, "update_time").text = str(profile.driver_profile.update_time_ms)
-
-                ET.SubElement(vehicle, "width").text = str(profile.vehicle_profile.width)
-                ET.SubElement(vehicle, "length").text = str(profile.vehicle_profile.length)
-                ET.SubElement(vehicle, "max_accel").text = str(profile.vehicle_profile.max_accel)
-                ET.SubElement(vehicle, "max_decel").text = str(profile.vehicle_profile.max_braking_decel)
-                ET.SubElement(vehicle, "mass").text = str(profile.vehicle_profile.mass)
-                ET.SubElement(vehicle, "max_speed").text = str(profile.vehicle_profile.max_speed)
-                ET.SubElement(vehicle, "turn_speed").text = str(3)
-
-        if len(intersection.green_cycle_roads) > 0:
-            traffic_cycle = ET.SubElement(temp_intersection, "traffic_cycle")
-            ET.SubElement(traffic_cycle, "yellow_light").text = str(intersection.yellow_light_length)
-            for i, cycle in enumerate(intersection.green_cycle_roads):
-                temp_cycle = ET.SubElement(traffic_cycle, "cycle")
-                ET.SubElement(temp_cycle, 'roads').text = str(cycle).replace('[','').replace(']','').replace(',','')
-                ET.SubElement(temp_cycle, 'timing').text = str(intersection.green_cycle_times[i])
+        if index % EXPORT_PROGRESS_INTERVAL == 0:
+            report_progress(progress, 'intersections', index, len(intersections))
+        yield intersection_element(index, intersection, profile_ids)
+    report_progress(progress, 'intersections', len(intersections), len(intersections))
 
-    tree = ET.ElementTree(traffic_map)
-    tree.write(save_location)
+
+def road_element(index, road, intersection_ids):
+    """
+    Creates the xml element of a single road
+    :param index: id the road is exported with
+    :param road: road to be exported
+    :param intersection_ids: dictionary from intersection to exported id
+    :return: road element
+    """
+    temp_road = ET.Element("road", name=str(index))
+    length, anchor_coordinate = convert_road_to_simulation_size(road)
+
+    ET.SubElement(temp_road, "length").text = str(length)
+    ET.SubElement(temp_road, "incoming_lanes").text = str(road.get_in_lanes())
+    ET.SubElement(temp_road, "outgoing_lanes").text = str(road.get_out_lanes())
+
+    ET.SubElement(temp_road, "angle_radians").text = str(road.get_compatible_angle())
+    ET.SubElement(temp_road, "anchor_point").text = \
+        "{} {}".format(anchor_coordinate.get_x(), anchor_coordinate.get_y())
+
+    ET.SubElement(temp_road, "speed_limit").text = "30"  # TODO change when speed limit is added
+
+    if road.get_start_connection() is not None:
+        ET.SubElement(temp_road, "start_intersection").text = \
+            str(intersection_ids[road.get_start_connection()])
+    if road.get_end_connection() is not None:
+        ET.SubElement(temp_road, "end_intersection").text = \
+            str(intersection_ids[road.get_end_connection()])
+
+    return temp_road
+
+
+def intersection_element(index, intersection, profile_ids=None):
+    """
+    Creates the xml element of a single intersection, including its spawning profiles and traffic cycle
+    :param index: id the intersection is exported with
+    :param intersection: intersection to be exported
+    :param profile_ids: dictionary from spawning profile to its id in the shared profile table, or None to write
+    the profiles inline
+    :return: intersection element
+    """
+    temp_intersection = ET.Element("intersection", name=str(index))
+    ET.SubElement(temp_intersection, "center_point").text = "{} {}".format(intersection.get_center().get_x(),
+                                                                           intersection.get_center().get_y())
+    ET.SubElement(temp_intersection, "radius").text = str(intersection.get_radius())
+    if intersection.get_spawning_profile_list() is not None and len(intersection.get_spawning_profile_list()) > 0:
+        profiles = ET.SubElement(temp_intersection, "spawning_profiles")
+        ET.SubElement(temp_intersection, "frequency").text = str(intersection.get_frequency())
+        for profile in intersection.get_spawning_profile_list():
+            if profile_ids is None:
+                add_profile_parameters(ET.SubElement(profiles, "profile"), profile)
+            else:
+                ET.SubElement(profiles, "profile_id").text = str(profile_ids[profile])
+
+    if len(intersection.green_cycle_roads) > 0:
+        traffic_cycle = ET.SubElement(temp_intersection, "traffic_cycle")
+        ET.SubElement(traffic_cycle, "yellow_light").text = str(intersection.yellow_light_length)
+        for i, cycle in enumerate(intersection.green_cycle_roads):
+            temp_cycle = ET.SubElement(traffic_cycle, "cycle")
+            ET.SubElement(temp_cycle, 'roads').text = str(cycle).replace('[','').replace(']','').replace(',','')
+            ET.SubElement(temp_cycle, 'timing').text = str(intersection.green_cycle_times[i])
+
+    return temp_intersection
+
+
+def profile_table_element(unique_profiles):
+    """
+    Creates the shared profile table that intersections refer to by profile id
+    :param unique_profiles: spawning profiles with distinct parameters, ordered by id
+    :return: profiles element
+    """
+    table = ET.Element("profiles")
+    for index, profile in enumerate(unique_profiles):
+        add_profile_parameters(ET.SubElement(table, "profile", id=str(index)), profile)
+    return table
+
+
+def add_profile_parameters(temp_profile, profile):
+    """
+    Adds the driver and vehicle parameters of a spawning profile to a profile element
+    :param temp_profile: profile element to fill
+    :param profile: spawning profile to be exported
+    :return: None
+    """
+    driver = ET.SubElement(temp_profile, "driver")
+    vehicle = ET.SubElement(temp_profile, "vehicle")
+
+    ET.SubElement(driver, "brake_factor").text = str(profile.driver_profile.over_braking_factor)
+    ET.SubElement(driver, "follow_time").text = str(profile.driver_profile.following_time)
+    ET.SubElement(driver, "max_accel").text = str(profile.driver_profile.max_accel)
+    ET.SubElement(driver, "min_accel").text = str(profile.driver_profile.min_accel)
+    ET.SubElement(driver, "max_speed").text = str(profile.driver_profile.max_speed)
+    ET.SubElement(driver, "accel_time").text = str(profile.driver_profile.accel_time)
+    ET.SubElement(driver, "update_time").text = str(profile.driver_profile.update_time_ms)
+
+    ET.SubElement(vehicle, "width").text = str(profile.vehicle_profile.width)
+    ET.SubElement(vehicle, "length").text = str(profile.vehicle_profile.length)
+    ET.SubElement(vehicle, "max_accel").text = str(profile.vehicle_profile.max_accel)
+    ET.SubElement(vehicle, "max_decel").text = str(profile.vehicle_profile.max_braking_decel)
+    ET.SubElement(vehicle, "mass").text = str(profile.vehicle_profile.mass)
+    ET.SubElement(vehicle, "max_speed").text = str(profile.vehicle_profile.max_speed)
+    ET.SubElement(vehicle, "turn_speed").text = str(3)
+
+
+def get_profile_ids(intersections):
+    """
+    Assigns an id to every distinct spawning profile attached to the intersections. Profiles that would be exported
+    with the same parameters share one id.
+    :param intersections: list of intersections in the map
+    :return: tuple of a dictionary from spawning profile to id and the list of unique profiles ordered by id
+    """
+    profile_ids = {}
+    ids_by_parameters = {}
+    unique_profiles = []
+
+    for intersection in intersections:
+        for profile in intersection.get_spawning_profile_list() or []:
+            if profile in profile_ids:
+                continue
+            parameters = profile_parameters(profile)
+            if parameters not in ids_by_parameters:
+                ids_by_parameters[parameters] = len(unique_profiles)
+                unique_profiles.append(profile)
+            profile_ids[profile] = ids_by_parameters[parameters]
+
+    return profile_ids, unique_profiles
+
+
+def profile_parameters(profile):
+    """
+    :param profile: spawning profile
+    :return: tuple of the exported driver and vehicle parameters of the profile
+    """
+    driver = profile.driver_profile
+    vehicle = profile.vehicle_profile
+    return (str(driver.over_braking_factor), str(driver.following_time), str(driver.max_accel),
+            str(driver.min_accel), str(driver.max_speed), str(driver.accel_time), str(driver.update_time_ms),
+            str(vehicle.width), str(vehicle.length), str(vehicle.max_accel), str(vehicle.max_braking_decel),
+            str(vehicle.mass), str(vehicle.max_speed))
+
+
+def get_intersection_ids(intersections):
+    """
+    Maps every intersection to its position in the list, which is the id it is exported with
+    :param intersections: list of intersections in the map
+    :return: dictionary from intersection to id
+    """
+    intersection_ids = {}
+    for index, intersection in enumerate(intersections):
+        intersection_ids.setdefault(intersection, index)
+    return intersection_ids
 
 
 def convert_road_to_simulation_size(road):
@@ -143,5 +398,7 @@ def valid_intersections(intersections):
     :param intersections: list of intersections to check
     :return: boolean whether all intersections are valid
     """
-    # TODO check to make sure no overlapping roads on any intersection
+    for intersection in intersections:
+        if check_overload_intersection(intersection):
+            return False
     return True
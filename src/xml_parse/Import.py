@@ -0,0 +1,325 @@
+import math
+import sys
+import os
+import xml.etree.ElementTree as ET
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.DriverProfile import DriverProfile
+from src.map.VehicleProfile import VehicleProfile
+from src.map.SpawningProfile import SpawningProfile
+from src.map.MapModel import MapModel
+from src.map.Constants import LANE_WIDTH
+from src.xml_parse.Exceptions import XMLFormatError
+from src.xml_parse.Constants import IMPORT_INTERSECTION_SPEED_LIMIT
+
+# exported names of the driver and vehicle parameters, in the order of the profile constructors
+DRIVER_PARAMETERS = ('brake_factor', 'follow_time', 'max_accel', 'min_accel', 'max_speed', 'accel_time',
+                     'update_time')
+VEHICLE_PARAMETERS = ('width', 'length', 'max_accel', 'max_decel', 'mass', 'max_speed')
+
+
+def import_xml(load_location, model=None):
+    """
+    Main function of import that reads an xml file created by export_xml back into a map. The file is read with
+    iterparse and every road, intersection and profile table is cleared as soon as it has been read, so memory does
+    not grow with the size of the file. References to intersections and profiles are resolved once the whole file
+    has been read, so they can point forwards in the file.
+    :param load_location: location of the xml file
+    :param model: model to load the map into, its roads and intersections are replaced but its profiles are kept.
+    The model is only changed once the whole file has been read without errors.
+    :return: model holding the imported map
+    """
+    reader = MapReader()
+    try:
+        context = ET.iterparse(load_location, events=('start', 'end'))
+        _, root = next(context)
+        if root.tag != "map":
+            raise XMLFormatError('Root element is {}, expected map'.format(root.tag))
+        depth = 1
+        for event, element in context:
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                reader.read_element(element)
+                root.clear()
+    except ET.ParseError as error:
+        raise XMLFormatError('Malformed xml: {}'.format(error))
+
+    roads, intersections = reader.resolve()
+
+    if model is None:
+        model = MapModel()
+    else:
+        model.clear(keep_profiles=True)
+    model.add_intersections(intersections)
+    model.add_roads(roads)
+    model.driver_profiles.extend(reader.driver_profiles)
+    model.vehicle_profiles.extend(reader.vehicle_profiles)
+    model.spawning_profiles.extend(reader.spawning_profiles)
+    return model
+
+
+class MapReader(object):
+    """
+    This class collects the children of the map element while the file is being read. Roads and intersections are
+    created straight away, but the intersections and profiles they refer to are only looked up in resolve().
+    """
+
+    def __init__(self):
+        self.roads = []
+        self.intersections = []
+        self.intersection_names = {}
+        self.pending_roads = []
+        self.pending_profiles = []
+        self.pending_cycles = []
+        self.profile_table = {}
+        self.profiles_by_parameters = {}
+        self.driver_profiles = []
+        self.vehicle_profiles = []
+        self.spawning_profiles = []
+
+    def read_element(self, element):
+        """
+        Reads one child of the map element
+        :param element: road, intersection or profiles element
+        :return: None
+        """
+        if element.tag == "road":
+            self.read_road(element)
+        elif element.tag == "intersection":
+            self.read_intersection(element)
+        elif element.tag == "profiles":
+            for profile in element.findall("profile"):
+                profile_id = profile.get("id")
+                if profile_id is None:
+                    raise XMLFormatError('Profile in the profile table is missing its id')
+                self.profile_table[profile_id] = self.read_profile(profile)
+        else:
+            raise XMLFormatError('Unexpected element {} in map'.format(element.tag))
+
+    def read_road(self, element):
+        """
+        Creates a road from its element. Its coordinates are filled in by resolve()
+        :param element: road element
+        :return: None
+        """
+        name = element.get("name")
+        in_lanes = parse_number(child_text(element, "incoming_lanes"))
+        out_lanes = parse_number(child_text(element, "outgoing_lanes"))
+        compatible_angle = parse_number(child_text(element, "angle_radians"))
+        anchor_coordinate = parse_coordinates(child_text(element, "anchor_point"))
+        length = parse_number(child_text(element, "length"))
+        speed_limit = parse_number(child_text(element, "speed_limit"))
+
+        angle = ((5 * math.pi / 2) - compatible_angle) % (2 * math.pi)
+        road = Road.create_import_road(length, out_lanes, in_lanes, angle, speed_limit, name)
+        self.roads.append(road)
+        self.pending_roads.append((road, anchor_coordinate, element.findtext("start_intersection"),
+                                   element.findtext("end_intersection")))
+
+    def read_intersection(self, element):
+        """
+        Creates an intersection from its element, including its traffic cycle and inline spawning profiles
+        :param element: intersection element
+        :return: None
+        """
+        name = element.get("name")
+        if name in self.intersection_names:
+            raise XMLFormatError('Intersection {} is defined twice'.format(name))
+
+        center = parse_coordinates(child_text(element, "center_point"))
+        radius = parse_number(child_text(element, "radius"))
+        if radius <= 0:
+            raise XMLFormatError('Intersection {} has radius {}, it must be positive'.format(name, radius))
+        intersection = Intersection(center, radius, IMPORT_INTERSECTION_SPEED_LIMIT)
+        self.intersections.append(intersection)
+        self.intersection_names[name] = intersection
+
+        profiles = element.find("spawning_profiles")
+        if profiles is not None:
+            for profile in profiles.findall("profile"):
+                intersection.add_spawning_profile(self.read_profile(profile))
+            profile_ids = [profile_id.text for profile_id in profiles.findall("profile_id")]
+            if len(profile_ids) > 0:
+                self.pending_profiles.append((intersection, profile_ids))
+
+        traffic_cycle = element.find("traffic_cycle")
+        if traffic_cycle is not None:
+            intersection.set_yellow_length(parse_number(child_text(traffic_cycle, "yellow_light")))
+            for i, cycle in enumerate(traffic_cycle.findall("cycle")):
+                cycle_roads = [parse_road_index(road) for road in (cycle.findtext("roads") or "").split()]
+                intersection.add_cycle("Cycle {}".format(i), cycle_roads, parse_number(child_text(cycle, "timing")))
+            self.pending_cycles.append((name, intersection))
+
+    def read_profile(self, element):
+        """
+        Creates a spawning profile from a profile element. Profiles with the same parameters are only created once.
+        :param element: profile element holding a driver and a vehicle element
+        :return: spawning profile
+        """
+        driver = element.find("driver")
+        vehicle = element.find("vehicle")
+        if driver is None or vehicle is None:
+            raise XMLFormatError('Profile is missing its driver or vehicle')
+        driver_values = tuple(child_text(driver, parameter) for parameter in DRIVER_PARAMETERS)
+        vehicle_values = tuple(child_text(vehicle, parameter) for parameter in VEHICLE_PARAMETERS)
+
+        parameters = driver_values + vehicle_values
+        if parameters in self.profiles_by_parameters:
+            return self.profiles_by_parameters[parameters]
+
+        name = "Imported {}".format(len(self.spawning_profiles))
+        driver_profile = DriverProfile(name, *[parse_number(value) for value in driver_values])
+        vehicle_profile = VehicleProfile(name, *[parse_number(value) for value in vehicle_values])
+        spawning_profile = SpawningProfile(name, driver_profile, vehicle_profile)
+
+        self.driver_profiles.append(driver_profile)
+        self.vehicle_profiles.append(vehicle_profile)
+        self.spawning_profiles.append(spawning_profile)
+        self.profiles_by_parameters[parameters] = spawning_profile
+        return spawning_profile
+
+    def resolve(self):
+        """
+        Connects the roads to their intersections, places them, and attaches the profiles that intersections refer
+        to by id. Roads are added to the connections of their intersections in file order, which is the order the
+        traffic cycles count connections in, so their road indices are checked once every road is connected.
+        :return: tuple of the list of roads and the list of intersections
+        """
+        for road, anchor_coordinate, start_name, end_name in self.pending_roads:
+            start_intersection = self.find_intersection(road, start_name)
+            end_intersection = self.find_intersection(road, end_name)
+            convert_road_from_simulation_size(road, anchor_coordinate, start_intersection, end_intersection)
+            if start_intersection is not None:
+                road.add_start_connection(start_intersection)
+                start_intersection.add_outgoing_connection(road)
+            if end_intersection is not None:
+                road.add_end_connection(end_intersection)
+                end_intersection.add_incoming_connection(road)
+
+        for name, intersection in self.pending_cycles:
+            road_count = len(intersection.get_connections())
+            for cycle_roads in intersection.green_cycle_roads:
+                for index in cycle_roads:
+                    if index >= road_count:
+                        raise XMLFormatError('Traffic cycle of intersection {} refers to road index {}, it has {} '
+                                             'roads'.format(name, index, road_count))
+
+        for intersection, profile_ids in self.pending_profiles:
+            for profile_id in profile_ids:
+                if profile_id not in self.profile_table:
+                    raise XMLFormatError('Intersection refers to unknown profile {}'.format(profile_id))
+                intersection.add_spawning_profile(self.profile_table[profile_id])
+
+        return self.roads, self.intersections
+
+    def find_intersection(self, road, name):
+        """
+        :return: intersection with the given exported name, or None if there is no name
+        """
+        if name is None:
+            return None
+        if name not in self.intersection_names:
+            raise XMLFormatError('Road {} refers to unknown intersection {}'.format(road.get_name(), name))
+        return self.intersection_names[name]
+
+
+def convert_road_from_simulation_size(road, anchor_coordinate, start_intersection, end_intersection):
+    """
+    Reverses convert_road_to_simulation_size: takes the chords back out of the road's length and moves its start
+    back onto the circumference of its start intersection, or off the anchor point if it has none
+    :param road: the imported Road, holding the simulation length
+    :param anchor_coordinate: anchor point read from the xml file
+    :param start_intersection: intersection at the start of the road or None
+    :param end_intersection: intersection at the end of the road or None
+    :return: None
+    """
+    length = road.get_length()
+    road_width = (road.get_in_lanes() + road.get_out_lanes()) * LANE_WIDTH
+    compatible_angle = road.get_compatible_angle()
+
+    if start_intersection is not None:
+        intersection_radius = start_intersection.get_radius()
+        length -= chord_depth(road, road_width, intersection_radius)
+        start_coordinate = Coordinates(start_intersection.get_center().get_x() +
+                                       intersection_radius * math.cos(compatible_angle),
+                                       start_intersection.get_center().get_y() +
+                                       intersection_radius * math.sin(compatible_angle))
+    else:
+        start_coordinate = Coordinates(anchor_coordinate.get_x() -
+                                       math.cos(compatible_angle - math.pi / 2) * (road_width / 2),
+                                       anchor_coordinate.get_y() -
+                                       math.sin(compatible_angle - math.pi / 2) * (road_width / 2))
+    if end_intersection is not None:
+        length -= chord_depth(road, road_width, end_intersection.get_radius())
+
+    road.length = length
+    road.start_coord = start_coordinate
+    road.end_coord = Coordinates(start_coordinate.get_x() + length * math.cos(compatible_angle),
+                                 start_coordinate.get_y() + length * math.sin(compatible_angle))
+
+
+def chord_depth(road, road_width, intersection_radius):
+    """
+    :param road: the imported Road
+    :param road_width: width of the road across all of its lanes
+    :param intersection_radius: radius of an intersection at one end of the road
+    :return: distance from the chord the road ends on to the circumference of the intersection
+    """
+    if road_width / 2.0 > intersection_radius:
+        raise XMLFormatError('Road {} is {} wide, too wide for an intersection of radius {}'.format(
+            road.get_name(), road_width, intersection_radius))
+    chord_angle = math.asin((road_width / 2.0) / intersection_radius)
+    return intersection_radius - math.cos(chord_angle) * intersection_radius
+
+
+def child_text(element, tag):
+    """
+    :return: text of the given child of the element
+    """
+    text = element.findtext(tag)
+    if text is None:
+        raise XMLFormatError('{} {} is missing its {}'.format(element.tag, element.get("name", ""), tag))
+    return text
+
+
+def parse_number(text):
+    """
+    :return: the text as an int if it is written as one, and as a float otherwise
+    """
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            raise XMLFormatError('{} is not a number'.format(text))
+
+
+def parse_road_index(text):
+    """
+    :return: the text as the position of a road in the connections of an intersection
+    """
+    try:
+        index = int(text)
+    except ValueError:
+        index = -1
+    if index < 0:
+        raise XMLFormatError('{} is not a road index'.format(text))
+    return index
+
+
+def parse_coordinates(text):
+    """
+    :return: Coordinates from a space separated pair of numbers
+    """
+    values = text.split()
+    if len(values) != 2:
+        raise XMLFormatError('{} is not a coordinate pair'.format(text))
+    return Coordinates(parse_number(values[0]), parse_number(values[1]))
@@ -0,0 +1,435 @@
+import sys
+import os
+import json
+import threading
+import queue
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.DriverProfile import DriverProfile
+from src.map.VehicleProfile import VehicleProfile
+from src.map.SpawningProfile import SpawningProfile
+from src.map.MapModel import MapModel
+from src.xml_parse.Exceptions import JournalFormatError
+
+# the journal is compacted into a snapshot once it holds this many records and more records than the snapshot
+COMPACT_MIN_RECORDS = 10000
+
+SNAPSHOT_SUFFIX = '.snapshot'
+
+# suffix of journal and snapshot files that could not be replayed and were moved aside
+SET_ASIDE_SUFFIX = '.bad'
+
+# roles of a road in the connection list of an intersection
+START_ROLE = 's'
+END_ROLE = 'e'
+
+
+class Journal(object):
+    """
+    This class keeps a crash recovery copy of a map model on disk. Every change the model reports is turned into a
+    small record, such as the new state of one road, and appended to the journal file by a background thread, so an
+    edit costs the same however large the map is. The thread also folds the records into the latest record per road
+    and intersection, and every so often writes that state as a snapshot and empties the journal. replay() rebuilds
+    the map from the snapshot and the journal.
+
+    Records are one JSON list per line. Replaying a record twice gives the same map, so a crash between writing a
+    snapshot and emptying the journal loses nothing.
+    """
+
+    def __init__(self, location, compact_records=COMPACT_MIN_RECORDS):
+        """
+        Establishes a journal that is neither replayed nor started
+
+        :param location: location of the journal file, the snapshot is written next to it
+        :param compact_records: minimum number of journal records before the journal is compacted
+
+        :type location: str
+        :type compact_records: int
+        """
+        self.location = location
+        self.snapshot_location = location + SNAPSHOT_SUFFIX
+        self.compact_records = compact_records
+        self.model = None
+        self.object_ids = {}
+        self.last_profiles = None
+        self.queue = queue.Queue()
+        self.thread = None
+
+        # only used by the writer thread
+        self.state = {}
+        self.journal_file = None
+        self.journal_records = 0
+
+    # ---- recovery ----
+
+    def replay(self, model):
+        """
+        Loads the map saved by the snapshot and the journal into a model, replacing its roads, intersections and
+        profiles. Roads and intersections get new ids.
+        :param model: model to load the map into
+        :type model: MapModel
+        :return: True if a map was found, False if there was nothing to replay
+        """
+        state = {}
+        found = False
+        try:
+            for location in (self.snapshot_location, self.location):
+                if os.path.exists(location):
+                    found = True
+                    for record in read_records(location):
+                        apply_record(state, record)
+            if not found:
+                return False
+            build_model(state, model)
+        except (TypeError, ValueError, IndexError, KeyError) as error:
+            raise JournalFormatError('Journal records do not describe a map: {!r}'.format(error))
+        return True
+
+    def set_aside(self):
+        """
+        Moves the snapshot and the journal out of the way, once replay() has failed on them, so that the next session
+        starts from an empty journal. Files set aside before are replaced.
+        :return: list of the locations the files were moved to
+        """
+        moved = []
+        for location in (self.snapshot_location, self.location):
+            if os.path.exists(location):
+                os.replace(location, location + SET_ASIDE_SUFFIX)
+                moved.append(location + SET_ASIDE_SUFFIX)
+        return moved
+
+    # ---- recording ----
+
+    def start(self, model):
+        """
+        Starts recording the changes of a model. The current state of the model is written as a new snapshot first.
+        :param model: model to be recorded
+        :type model: MapModel
+        :return: None
+        """
+        self.model = model
+        self.object_ids = {}
+        records = []
+        for road in model.get_roads():
+            road_id = model.road_id(road)
+            self.object_ids[road] = road_id
+            records.append(road_record(road_id, road))
+        for intersection in model.get_intersections():
+            intersection_id = model.intersection_id(intersection)
+            self.object_ids[intersection] = intersection_id
+            records.append(intersection_record(intersection_id, intersection, model))
+        self.last_profiles = profiles_record(model)
+        records.append(self.last_profiles)
+
+        self.queue.put(('snapshot', records))
+        self.thread = threading.Thread(target=self._run, name='journal')
+        self.thread.daemon = True
+        self.thread.start()
+        model.add_listener(self.map_changed)
+
+    def map_changed(self, map_object, dirty_bounds):
+        """
+        Listener of the map model. Records the new state of the object that changed, or its removal.
+        :param map_object: road or intersection that changed, None if the whole map changed
+        :param dirty_bounds: bounding boxes covered by the object before and after the change
+        :return: None
+        """
+        model = self.model
+        if map_object is None:
+            self.object_ids = {}
+            self.queue.put(('record', ['clear']))
+            return
+
+        if type(map_object) is Road:
+            road_id = model.road_id(map_object)
+            if road_id is None:
+                self._record_removal('remove_road', map_object)
+            else:
+                self.object_ids[map_object] = road_id
+                self.queue.put(('record', road_record(road_id, map_object)))
+            # the connection lists and cycles of the intersections at its ends changed as well
+            for intersection in (map_object.get_start_connection(), map_object.get_end_connection()):
+                intersection_id = model.intersection_id(intersection)
+                if intersection_id is not None:
+                    self.queue.put(('record', intersection_record(intersection_id, intersection, model)))
+        elif type(map_object) is Intersection:
+            intersection_id = model.intersection_id(map_object)
+            if intersection_id is None:
+                self._record_removal('remove_intersection', map_object)
+                return
+            self.object_ids[map_object] = intersection_id
+            self.queue.put(('record', intersection_record(intersection_id, map_object, model)))
+
+    def record_profiles(self):
+        """
+        Records the driver, vehicle and spawning profiles of the model if they changed. The model does not report
+        changes to its profiles, so this has to be called after they were edited.
+        :return: None
+        """
+        record = profiles_record(self.model)
+        if record != self.last_profiles:
+            self.last_profiles = record
+            self.queue.put(('record', record))
+
+    def compact(self):
+        """
+        Asks the writer thread to write a snapshot and empty the journal
+        :return: None
+        """
+        self.queue.put(('compact', None))
+
+    def flush(self):
+        """
+        Waits until every record so far is written to disk
+        :return: None
+        """
+        if self.thread is None:
+            return
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        done.wait()
+
+    def stop(self):
+        """
+        Stops recording, writes the remaining records and closes the journal
+        :return: None
+        """
+        if self.thread is None:
+            return
+        self.model.remove_listener(self.map_changed)
+        self.queue.put(('stop', None))
+        self.thread.join()
+        self.thread = None
+
+    def _record_removal(self, kind, map_object):
+        object_id = self.object_ids.pop(map_object, None)
+        if object_id is not None:
+            self.queue.put(('record', [kind, object_id]))
+
+    # ---- writer thread ----
+
+    def _run(self):
+        running = True
+        while running:
+            item = self.queue.get()
+            # write everything that is waiting before flushing, so bursts of edits share one flush
+            waiting = []
+            while True:
+                action, value = item
+                if action == 'record':
+                    self._append(value)
+                elif action == 'snapshot':
+                    self.state = {}
+                    for record in value:
+                        apply_record(self.state, record)
+                    self._write_snapshot()
+                elif action == 'compact':
+                    self._write_snapshot()
+                elif action == 'flush':
+                    waiting.append(value)
+                elif action == 'stop':
+                    running = False
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if self.journal_file is not None:
+                self.journal_file.flush()
+                os.fsync(self.journal_file.fileno())
+            for done in waiting:
+                done.set()
+
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+
+    def _append(self, record):
+        apply_record(self.state, record)
+        self.journal_file.write(json.dumps(record, separators=(',', ':')))
+        self.journal_file.write('\n')
+        self.journal_records += 1
+        if self.journal_records >= self.compact_records and self.journal_records > len(self.state):
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        temporary_location = self.snapshot_location + '.tmp'
+        with open(temporary_location, 'w') as snapshot_file:
+            for record in self.state.values():
+                snapshot_file.write(json.dumps(record, separators=(',', ':')))
+                snapshot_file.write('\n')
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_location, self.snapshot_location)
+
+        if self.journal_file is not None:
+            self.journal_file.close()
+        self.journal_file = open(self.location, 'w')
+        self.journal_records = 0
+
+
+def road_record(road_id, road):
+    """
+    :return: record of the current state of a road
+    """
+    return ['road', road_id, road.start_coord.x, road.start_coord.y, road.end_coord.x, road.end_coord.y,
+            road.length, road.out_lanes, road.in_lanes, road.angle, road.speed_limit, road.name]
+
+
+def intersection_record(intersection_id, intersection, model):
+    """
+    :return: record of the current state of an intersection, its connections refer to roads by their ids in the model
+    """
+    connections = []
+    for road in intersection.connections:
+        road_id = model.road_id(road)
+        if road_id is None:
+            continue
+        if road.start_connection is intersection:
+            role = START_ROLE
+        elif road.end_connection is intersection:
+            role = END_ROLE
+        else:
+            role = ''
+        connections.append([road_id, role])
+
+    cycles = [[name, list(roads), time] for name, roads, time in
+              zip(intersection.cycle_names, intersection.green_cycle_roads, intersection.green_cycle_times)]
+    profiles = [profile.get_spawning_profile_name() for profile in intersection.spawn_profiles]
+    return ['intersection', intersection_id, intersection.center.x, intersection.center.y, intersection.radius,
+            intersection.speed_limit, intersection.yellow_light_length, connections, cycles, profiles]
+
+
+def profiles_record(model):
+    """
+    :return: record of the driver, vehicle and spawning profiles of a model
+    """
+    drivers = [[driver.driver_profile_name, driver.over_braking_factor, driver.following_time, driver.max_accel,
+                driver.min_accel, driver.max_speed, driver.accel_time, driver.update_time_ms]
+               for driver in model.driver_profiles]
+    vehicles = [[vehicle.profile_name, vehicle.width, vehicle.length, vehicle.max_accel, vehicle.max_braking_decel,
+                 vehicle.mass, vehicle.max_speed] for vehicle in model.vehicle_profiles]
+    spawning = [[profile.profile_name, index_of(model.driver_profiles, profile.driver_profile),
+                 index_of(model.vehicle_profiles, profile.vehicle_profile)] for profile in model.spawning_profiles]
+    return ['profiles', drivers, vehicles, spawning]
+
+
+def index_of(values, value):
+    """
+    :return: position of the object in the list, compared by identity, or None if it is not in the list
+    """
+    for index, other in enumerate(values):
+        if other is value:
+            return index
+    return None
+
+
+def apply_record(state, record):
+    """
+    Folds a record into a state holding the latest record of every road, intersection and of the profiles
+    :param state: dictionary from ('road', id), ('intersection', id) or ('profiles',) to the latest record
+    :param record: record to be applied
+    :return: None
+    """
+    kind = record[0]
+    if kind == 'road' or kind == 'intersection':
+        state[(kind, record[1])] = record
+    elif kind == 'remove_road':
+        state.pop(('road', record[1]), None)
+    elif kind == 'remove_intersection':
+        state.pop(('intersection', record[1]), None)
+    elif kind == 'profiles':
+        state[('profiles',)] = record
+    elif kind == 'clear':
+        for key in [key for key in state if key[0] != 'profiles']:
+            del state[key]
+    else:
+        raise JournalFormatError('Unknown journal record {}'.format(kind))
+
+
+def read_records(location):
+    """
+    Reads the records of a journal or snapshot file. A torn last line, left by a crash while it was written, is
+    skipped.
+    :param location: location of the file
+    :return: list of records
+    """
+    with open(location, 'r') as journal_file:
+        lines = journal_file.readlines()
+
+    records = []
+    for number, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            if number == len(lines) - 1 and not line.endswith('\n'):
+                break
+            raise JournalFormatError('Malformed journal record on line {} of {}'.format(number + 1, location))
+        if type(record) is not list or not record:
+            raise JournalFormatError('Malformed journal record on line {} of {}'.format(number + 1, location))
+        records.append(record)
+    return records
+
+
+def build_model(state, model=None):
+    """
+    Creates the roads, intersections and profiles held by a state of latest records and loads them into a model
+    :param state: state built by apply_record
+    :param model: model to load the map into, its contents are replaced
+    :return: model holding the map
+    """
+    if model is None:
+        model = MapModel()
+
+    drivers = []
+    vehicles = []
+    spawning_profiles = []
+    profiles = state.get(('profiles',))
+    if profiles is not None:
+        drivers = [DriverProfile(*values) for values in profiles[1]]
+        vehicles = [VehicleProfile(*values) for values in profiles[2]]
+        for name, driver_index, vehicle_index in profiles[3]:
+            spawning_profiles.append(SpawningProfile(name, None if driver_index is None else drivers[driver_index],
+                                                     None if vehicle_index is None else vehicles[vehicle_index]))
+    profiles_by_name = {profile.profile_name: profile for profile in spawning_profiles}
+
+    roads = {}
+    for key in sorted(key for key in state if key[0] == 'road'):
+        (kind, road_id, start_x, start_y, end_x, end_y, length, out_lanes, in_lanes, angle, speed_limit,
+         name) = state[key]
+        roads[road_id] = Road(Coordinates(start_x, start_y), Coordinates(end_x, end_y), length, out_lanes, in_lanes,
+                              angle, speed_limit, name)
+
+    intersections = []
+    for key in sorted(key for key in state if key[0] == 'intersection'):
+        (kind, intersection_id, center_x, center_y, radius, speed_limit, yellow_light_length, connections, cycles,
+         profile_names) = state[key]
+        intersection = Intersection(Coordinates(center_x, center_y), radius, speed_limit)
+        intersection.yellow_light_length = yellow_light_length
+        for road_id, role in connections:
+            road = roads.get(road_id)
+            if road is None:
+                continue
+            intersection.connections.append(road)
+            if role == START_ROLE:
+                road.add_start_connection(intersection)
+            elif role == END_ROLE:
+                road.add_end_connection(intersection)
+        for name, cycle_roads, time in cycles:
+            intersection.add_cycle(name, cycle_roads, time)
+        for name in profile_names:
+            if name in profiles_by_name:
+                intersection.add_spawning_profile(profiles_by_name[name])
+        intersections.append(intersection)
+
+    model.clear()
+    model.driver_profiles.extend(drivers)
+    model.vehicle_profiles.extend(vehicles)
+    model.spawning_profiles.extend(spawning_profiles)
+    model.add_intersections(intersections)
+    model.add_roads([roads[road_id] for road_id in sorted(roads)])
+    return model
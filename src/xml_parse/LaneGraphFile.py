@@ -0,0 +1,118 @@
+import sys
+import os
+import struct
+import hashlib
+from array import array
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.LaneGraph import LaneGraph, LANE_GRAPH_ARRAYS
+from src.xml_parse.Exceptions import BinaryFormatError
+from src.xml_parse.Constants import LANE_GRAPH_EXTENSION
+
+LANE_GRAPH_MAGIC = b'TSLG'
+LANE_GRAPH_VERSION = 2
+
+# the header stores the size and sha256 digest of the xml map the graph was compiled from, then the number of items
+# of every array in LANE_GRAPH_ARRAYS. The arrays follow it back to back as little endian 4 byte integers and 8 byte
+# doubles.
+LANE_GRAPH_HEADER = struct.Struct('<4sIQ32s' + 'Q' * len(LANE_GRAPH_ARRAYS))
+FINGERPRINT_CHUNK_SIZE = 1 << 20
+ITEM_SIZES = {'i': 4, 'd': 8}
+
+
+def lane_graph_location(xml_location):
+    """
+    :param xml_location: location of an exported xml map
+    :return: location of the lane graph exported alongside it, the xml location with LANE_GRAPH_EXTENSION in place
+    of its extension
+    """
+    return os.path.splitext(xml_location)[0] + LANE_GRAPH_EXTENSION
+
+
+def xml_fingerprint(xml_location):
+    """
+    :param xml_location: location of an xml map
+    :return: tuple of the size in bytes and the sha256 digest of the file
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(xml_location, 'rb') as xml_file:
+        for chunk in iter(lambda: xml_file.read(FINGERPRINT_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.digest()
+
+
+def export_lane_graph(graph, save_location, fingerprint):
+    """
+    Saves a compiled lane graph, so the simulator can load it instead of building it from the xml map
+    :param graph: lane graph from compile_lane_graph
+    :param save_location: where to save the lane graph file
+    :param fingerprint: xml_fingerprint of the xml map the graph was compiled from
+    :return: None
+    """
+    with open(save_location, 'wb') as binary_file:
+        write_lane_graph(graph, binary_file, fingerprint)
+
+
+def write_lane_graph(graph, binary_file, fingerprint):
+    """
+    Writes a lane graph to an open binary file handle
+    :param graph: lane graph from compile_lane_graph
+    :param binary_file: binary file handle to write to
+    :param fingerprint: xml_fingerprint of the xml map the graph was compiled from
+    :return: None
+    """
+    counts = [len(getattr(graph, name)) for name, _ in LANE_GRAPH_ARRAYS]
+    binary_file.write(LANE_GRAPH_HEADER.pack(LANE_GRAPH_MAGIC, LANE_GRAPH_VERSION, fingerprint[0], fingerprint[1],
+                                             *counts))
+    for name, typecode in LANE_GRAPH_ARRAYS:
+        values = getattr(graph, name)
+        if values.itemsize == ITEM_SIZES[typecode] and sys.byteorder == 'little':
+            binary_file.write(values.tobytes())
+        else:
+            binary_file.write(struct.pack('<{}{}'.format(len(values), typecode), *values))
+
+
+def load_lane_graph(load_location, xml_location):
+    """
+    Reads a lane graph file written by export_lane_graph. A graph that was not compiled from the xml map as it is now
+    is refused, since the map may have been exported again without it.
+    :param load_location: location of the lane graph file
+    :param xml_location: location of the xml map the graph belongs to
+    :return: LaneGraph
+    """
+    with open(load_location, 'rb') as binary_file:
+        data = binary_file.read()
+
+    if len(data) < LANE_GRAPH_HEADER.size:
+        raise BinaryFormatError('{} is too short to be a lane graph'.format(load_location))
+    header = LANE_GRAPH_HEADER.unpack_from(data, 0)
+    if header[0] != LANE_GRAPH_MAGIC:
+        raise BinaryFormatError('{} is not a lane graph'.format(load_location))
+    if header[1] != LANE_GRAPH_VERSION:
+        raise BinaryFormatError('Unsupported lane graph version {}'.format(header[1]))
+
+    if (header[2], header[3]) != xml_fingerprint(xml_location):
+        raise BinaryFormatError('{} was not compiled from {}'.format(load_location, xml_location))
+
+    counts = header[4:]
+    expected = LANE_GRAPH_HEADER.size + sum(count * ITEM_SIZES[typecode]
+                                            for count, (_, typecode) in zip(counts, LANE_GRAPH_ARRAYS))
+    if len(data) != expected:
+        raise BinaryFormatError('{} is truncated'.format(load_location))
+
+    graph = LaneGraph()
+    offset = LANE_GRAPH_HEADER.size
+    for count, (name, typecode) in zip(counts, LANE_GRAPH_ARRAYS):
+        size = count * ITEM_SIZES[typecode]
+        values = array(typecode)
+        if values.itemsize == ITEM_SIZES[typecode] and sys.byteorder == 'little':
+            values.frombytes(data[offset:offset + size])
+        else:
+            values.extend(struct.unpack_from('<{}{}'.format(count, typecode), data, offset))
+        setattr(graph, name, values)
+        offset += size
+    return graph
+
@@ -0,0 +1,79 @@
+"""
+Prints the connected parts of a map file and the roads missing an intersection at either end, so a map refused by
+the export can be fixed without opening it in the MapBuilder.
+
+Usage: python src/xml_parse/MapReport.py map.xml
+
+Roads and intersections are named by their ids in the file. The exit status is 1 if the map is not connected and 2
+if the file cannot be read.
+"""
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.xml_parse.Import import import_xml
+from src.xml_parse.Exceptions import XMLFormatError
+from src.xml_parse.Utils import find_components, describe_bounds
+
+
+def report_lines(roads, intersections):
+    """
+    :param roads: list of the roads in the map, ids are their positions in the list
+    :param intersections: list of the intersections in the map, ids are their positions in the list
+    :return: list of the lines of the report
+    """
+    road_ids = {road: road_id for road_id, road in enumerate(roads)}
+    intersection_ids = {intersection: intersection_id for intersection_id, intersection in enumerate(intersections)}
+    components, dangling_roads = find_components(roads, intersections)
+
+    lines = ["{} separate parts".format(len(components))]
+    for number, component in enumerate(components):
+        lines.append("part {}: {} roads, {} intersections, from {}".format(
+            number, len(component.roads), len(component.intersections), describe_bounds(component.bounds)))
+        lines.append("  roads: {}".format(' '.join(str(road_id) for road_id in
+                                                   sorted(road_ids[road] for road in component.roads))))
+        lines.append("  intersections: {}".format(' '.join(str(intersection_id) for intersection_id in
+                                                           sorted(intersection_ids[intersection]
+                                                                  for intersection in component.intersections))))
+
+    lines.append("{} dangling roads".format(len(dangling_roads)))
+    for road in dangling_roads:
+        missing = [side for side, connection in (("start", road.get_start_connection()),
+                                               ("end", road.get_end_connection())) if connection is None]
+        start = road.get_start_coords()
+        end = road.get_end_coords()
+        lines.append("road {} '{}' has no intersection at its {}, from {}".format(
+            road_ids[road], road.get_name(), " and ".join(missing),
+            describe_bounds((start.get_x(), start.get_y(), end.get_x(), end.get_y()))))
+    return lines
+
+
+def main(argv=None):
+    """
+    :param argv: command line arguments, sys.argv when None
+    :return: exit status, 1 if the map is not connected and 2 if the file cannot be read
+    """
+    parser = argparse.ArgumentParser(description="Reports the connected parts and dangling roads of a map file")
+    parser.add_argument("map_file", help="xml file written by the MapBuilder")
+    arguments = parser.parse_args(argv)
+
+    try:
+        model = import_xml(arguments.map_file)
+    except (XMLFormatError, OSError) as error:
+        print("{}: {}".format(arguments.map_file, error), file=sys.stderr)
+        return 2
+    except Exception as error:
+        # any other failure to load is still a file that cannot be read, never a map that is not connected
+        print("{}: {}: {}".format(arguments.map_file, type(error).__name__, error), file=sys.stderr)
+        return 2
+    roads = model.get_roads()
+    intersections = model.get_intersections()
+    for line in report_lines(roads, intersections):
+        print(line)
+    return 0 if model.is_connected() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
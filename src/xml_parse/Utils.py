@@ -1,44 +1,38 @@
 import math
 from src.map.Constants import LANE_WIDTH
 from src.xml_parse.Exceptions import XMLFormatError
-from src.xml_parse.Constants import SIG_FIGS
+from src.map.Intersection import Intersection
+from src.xml_parse.Constants import SIG_FIGS, OVERLAP_TOLERANCE
 
 
 def is_connected_traffic_map(roads, intersections):
-    # return True
     """
-    Verifies that a collection of intersections and roads is fully connected
+    Verifies that a collection of intersections and roads is fully connected. The traversal keeps its visited
+    roads and intersections in identity-keyed sets so that the whole check runs in O(V + E)
     :param roads: list of roads in the map
     :param intersections: list of intersections in the map
     :return: boolean on whether the map is fully connected
     """
-    to_visit_roads = []
-    visited_roads = []
-    visited_intersections = []
-
     if len(roads) == 0:
         if len(intersections) == 0 or len(intersections) == 1:
             return True
         else:
             return False
 
-    to_visit_roads.append(roads[0])
+    to_visit_roads = [roads[0]]
+    visited_roads = {roads[0]}
+    visited_intersections = set()
 
     while len(to_visit_roads) > 0:
         road = to_visit_roads.pop()
-        visited_roads.append(road)
-        new_roads = []
-        if road.get_start_connection() is not None and road.get_start_connection() not in visited_intersections:
-            new_roads.extend(road.get_start_connection().get_connections())
-            visited_intersections.append(road.get_start_connection())
-        if road.get_end_connection() is not None and road.get_end_connection() not in visited_intersections:
-            new_roads.extend(road.get_end_connection().get_connections())
-            visited_intersections.append(road.get_end_connection())
-        new_roads = list(set(new_roads))
-        new_roads = remove_visited_roads(new_roads, visited_roads)
-        new_roads = remove_visited_roads(new_roads, to_visit_roads)
-        for new_road in new_roads:
-            to_visit_roads.append(new_road)
+        for connection in (road.get_start_connection(), road.get_end_connection()):
+            if connection is None or connection in visited_intersections:
+                continue
+            visited_intersections.add(connection)
+            for new_road in connection.get_connections():
+                if new_road not in visited_roads:
+                    visited_roads.add(new_road)
+                    to_visit_roads.append(new_road)
 
     if len(roads) == len(visited_roads) and len(intersections) == len(visited_intersections):
         return True
@@ -46,19 +40,158 @@ def is_connected_traffic_map(roads, intersections):
         return False
 
 
+
+class MapComponent(object):
+    """
+    One connected part of a map, the roads and intersections that can be reached from each other
+    """
+
+    def __init__(self, roads, intersections, bounds):
+        """
+        :param roads: list of the roads in the component
+        :param intersections: list of the intersections in the component
+        :param bounds: (min_x, min_y, max_x, max_y) covering every road and intersection of the component
+        """
+        self.roads = roads
+        self.intersections = intersections
+        self.bounds = bounds
+
+    def __len__(self):
+        return len(self.roads) + len(self.intersections)
+
+
+def find_components(roads, intersections):
+    """
+    Splits a map into its connected components, unlike is_connected_traffic_map which only tells whether there is
+    more than one. Every road and intersection is visited once, so this runs in O(V + E). Connections to
+    intersections that are not in the map are not followed.
+    :param roads: list of roads in the map
+    :param intersections: list of intersections in the map
+    :return: tuple of the list of MapComponent in the order their first road or intersection appears in the map, and
+    the list of dangling roads, the roads missing an intersection at their start or end
+    """
+    remaining = set(roads)
+    remaining.update(intersections)
+    components = []
+    for start in list(roads) + list(intersections):
+        if start not in remaining:
+            continue
+        remaining.discard(start)
+        component_roads = []
+        component_intersections = []
+        to_visit = [start]
+        while to_visit:
+            map_object = to_visit.pop()
+            if isinstance(map_object, Intersection):
+                component_intersections.append(map_object)
+                neighbours = map_object.connections
+            else:
+                component_roads.append(map_object)
+                neighbours = (map_object.start_connection, map_object.end_connection)
+            for neighbour in neighbours:
+                if neighbour in remaining:
+                    remaining.discard(neighbour)
+                    to_visit.append(neighbour)
+        components.append(MapComponent(component_roads, component_intersections,
+                                       component_bounds(component_roads, component_intersections)))
+
+    dangling_roads = [road for road in roads if road.start_connection is None or road.end_connection is None]
+    return components, dangling_roads
+
+
+def component_bounds(roads, intersections):
+    """
+    Same as merging SpatialIndex.bounding_box over every road and intersection, without the method calls that
+    dominate on large maps
+    :param roads: list of roads
+    :param intersections: list of intersections
+    :return: (min_x, min_y, max_x, max_y) tuple, None if both lists are empty
+    """
+    xs = []
+    ys = []
+    for road in roads:
+        for point in road.get_points():
+            xs.append(point.x)
+            ys.append(point.y)
+    for intersection in intersections:
+        center = intersection.center
+        xs.append(center.x - intersection.radius)
+        xs.append(center.x + intersection.radius)
+        ys.append(center.y - intersection.radius)
+        ys.append(center.y + intersection.radius)
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def describe_bounds(bounds):
+    """
+    :param bounds: (min_x, min_y, max_x, max_y) bounding box
+    :return: readable string of the corners of the box
+    """
+    return "({:.0f}, {:.0f}) to ({:.0f}, {:.0f})".format(*bounds)
+
+
 def check_overload_intersection(intersection):
-    # road_angle_pairs = list()  # List of of angles where the roads edges intersect the intersection
-    #
-    # for road in intersection.get_connections():
-    #     width = (road.get_out_lanes() + road.get_in_lanes()) * LANE_WIDTH
-    #     if road.get_start_connection() is intersection:
-    #         angle = road.get_angle()
-    #         angle_to_edge = math.
-    #     elif road.get_end_connection() is intersection:
-    #         angle = add_angles(road.get_angle(), math.pi)
-    #     else:
-    #         raise XMLFormatError("Intersection has a road connected but not vice versa")
-    return
+    """
+    Finds the roads of an intersection that overlap where they meet its circle. Every road covers an arc of the
+    circle given by its lanes on either side of its median. The arcs are sorted by where they begin and swept once,
+    keeping the arcs that are still open, so an intersection with k roads is checked in O(k log k).
+    :param intersection: intersection to check
+    :type intersection: Intersection
+    :return: list of (road, road) pairs whose arcs overlap, empty if the intersection is valid
+    """
+    arcs = []
+    for road in intersection.get_connections():
+        arcs.extend(road_arcs(road, intersection))
+
+    # arcs running past 2 PI overlap the arcs at the start of the circle, so every arc is swept a second time shifted
+    # by a full turn. Pairs of two shifted arcs were already found unshifted.
+    full_turn = 2 * math.pi
+    sweep = [(lower, upper, road, False) for lower, upper, road in arcs]
+    sweep.extend((lower + full_turn, upper + full_turn, road, True) for lower, upper, road in arcs)
+    sweep.sort(key=lambda arc: arc[0])
+
+    overlaps = []
+    found = set()
+    open_arcs = []
+    for lower, upper, road, shifted in sweep:
+        open_arcs = [arc for arc in open_arcs if arc[0] > lower + OVERLAP_TOLERANCE]
+        for other_upper, other_road, other_shifted in open_arcs:
+            pair = (min(id(road), id(other_road)), max(id(road), id(other_road)))
+            if not (shifted and other_shifted) and pair not in found:
+                found.add(pair)
+                overlaps.append((other_road, road))
+        open_arcs.append((upper, road, shifted))
+    return overlaps
+
+
+def road_arcs(road, intersection):
+    """
+    Gets the arcs of an intersection circle covered by a road, one for each end of the road connected to it. Angles
+    follow Road.angle. A road wider than the intersection covers half of the circle.
+    :param road: road connected to the intersection
+    :param intersection: intersection the road is connected to
+    :type road: Road
+    :type intersection: Intersection
+    :return: list of (lower angle, upper angle, road) tuples with the lower angle in [0, 2 PI)
+    """
+    radius = intersection.get_radius()
+    in_angle = math.asin(min(1.0, road.get_in_lanes() * LANE_WIDTH / radius))
+    out_angle = math.asin(min(1.0, road.get_out_lanes() * LANE_WIDTH / radius))
+
+    arcs = []
+    if road.get_start_connection() is intersection:
+        # the incoming lanes are on the left of the road, towards lower angles
+        lower = (road.get_angle() - in_angle) % (2 * math.pi)
+        arcs.append((lower, lower + in_angle + out_angle, road))
+    if road.get_end_connection() is intersection:
+        # seen from the intersection the road points the other way, so its sides are swapped
+        lower = (road.get_angle() + math.pi - out_angle) % (2 * math.pi)
+        arcs.append((lower, lower + in_angle + out_angle, road))
+    if not arcs:
+        raise XMLFormatError("Intersection has a road connected but not vice versa")
+    return arcs
 
 
 def remove_visited_roads(roads, visited_roads):
@@ -0,0 +1,249 @@
+import math
+import sys
+import os
+import gc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Constants import LANE_WIDTH
+from src.xml_parse.Constants import CONTACT_TOLERANCE
+
+
+def find_overlaps(roads, intersections):
+    """
+    Finds every pair of roads and intersections whose shapes overlap. A road is not compared with the intersections
+    at its ends, nor with roads sharing one of those intersections, since they meet there by design and
+    check_overload_intersection checks how they meet.
+
+    Candidate pairs are found by sweeping a line over the bounding boxes in rows, so only boxes near each other in
+    both x and y are compared. Candidate pairs are then tested exactly with the separating axis theorem on the road
+    rectangles and intersection circles. Shapes that only touch do not overlap.
+    :param roads: list of the roads in the map
+    :param intersections: list of the intersections in the map
+    :return: list of (map object, map object) pairs, in the order of the roads followed by the intersections
+    """
+    map_objects = list(roads) + list(intersections)
+    if len(map_objects) < 2:
+        return []
+
+    # the bounds are allocated in one burst, automatic garbage collection would otherwise walk them many times over
+    # while they are built
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        bounds = [road_bounds(road) for road in roads]
+        bounds.extend([intersection_bounds(intersection) for intersection in intersections])
+        candidates = candidate_pairs(bounds)
+    finally:
+        if collecting:
+            gc.enable()
+
+    num_roads = len(roads)
+    shapes = {}
+
+    def shape(index):
+        if index not in shapes:
+            map_object = map_objects[index]
+            if index < num_roads:
+                shapes[index] = polygon_shape(map_object)
+            else:
+                center = map_object.get_center()
+                shapes[index] = (center.get_x(), center.get_y(), map_object.get_radius())
+        return shapes[index]
+
+    overlaps = []
+    for first, second in candidates:
+        if second < num_roads:
+            if shares_intersection(map_objects[first], map_objects[second]):
+                continue
+            overlapping = polygons_overlap(shape(first), shape(second))
+        elif first < num_roads:
+            road = map_objects[first]
+            if map_objects[second] is road.start_connection or map_objects[second] is road.end_connection:
+                continue
+            overlapping = polygon_circle_overlap(shape(first), shape(second))
+        else:
+            overlapping = circles_overlap(shape(first), shape(second))
+
+        if overlapping:
+            overlaps.append((first, second))
+
+    overlaps.sort()
+    return [(map_objects[first], map_objects[second]) for first, second in overlaps]
+
+
+def shares_intersection(first, second):
+    """
+    :param first: road
+    :param second: another road
+    :return: boolean whether the roads start or end at a common intersection
+    """
+    ends = (second.start_connection, second.end_connection)
+    return ((first.start_connection is not None and first.start_connection in ends) or
+            (first.end_connection is not None and first.end_connection in ends))
+
+
+def road_bounds(road):
+    """
+    Same as SpatialIndex.bounding_box for a road, without the method calls that dominate on large maps. The corners
+    are offset from the start and end points the way Road.get_points does, without creating them, since roads that
+    were never drawn do not have them cached yet. Adding offsets is monotonic, so the smallest corner coordinate is the
+    smaller end point plus the smaller offset.
+    :param road: road whose rectangle is bounded
+    :type road: Road
+    :return: (min_x, min_y, max_x, max_y) tuple
+    """
+    left_radius = road.in_lanes * LANE_WIDTH
+    right_radius = road.out_lanes * LANE_WIDTH
+    right_angle = road.angle + (math.pi / 2.0)
+    left_angle = road.angle - (math.pi / 2.0)
+    left_x = left_radius * math.sin(left_angle)
+    left_y = left_radius * math.cos(left_angle)
+    right_x = right_radius * math.sin(right_angle)
+    right_y = right_radius * math.cos(right_angle)
+
+    start_x = road.start_coord.x
+    start_y = road.start_coord.y
+    end_x = road.end_coord.x
+    end_y = road.end_coord.y
+    if start_x > end_x:
+        start_x, end_x = end_x, start_x
+    if start_y > end_y:
+        start_y, end_y = end_y, start_y
+    if left_x > right_x:
+        left_x, right_x = right_x, left_x
+    if left_y > right_y:
+        left_y, right_y = right_y, left_y
+    return start_x + left_x, start_y + left_y, end_x + right_x, end_y + right_y
+
+
+def intersection_bounds(intersection):
+    """
+    Same as SpatialIndex.bounding_box for an intersection, without the method calls
+    :param intersection: intersection whose circle is bounded
+    :type intersection: Intersection
+    :return: (min_x, min_y, max_x, max_y) tuple
+    """
+    center = intersection.center
+    radius = intersection.radius
+    return center.x - radius, center.y - radius, center.x + radius, center.y + radius
+
+
+def candidate_pairs(bounds):
+    """
+    Finds the pairs of objects whose bounding boxes overlap. The map is cut into horizontal rows about as high as a
+    typical box, and a line sweeps over the boxes sorted by their left edge. Each row keeps the boxes in it that the
+    line is still inside, so a box is only compared with the boxes near it in both x and y, whichever way the map is
+    laid out. A pair sharing several rows is only reported from the row holding the larger min_y of the two boxes,
+    the first row both of them are in.
+    :param bounds: bounding boxes of the objects
+    :return: list of (index, index) pairs with the smaller index first
+    """
+    if not bounds:
+        return []
+    row_height = grid_row_height(bounds)
+    # rows start at the lowest box rather than at 0, so a map laid out along the x axis lies in a single row
+    origin = min([box[1] for box in bounds])
+
+    order = sorted(range(len(bounds)), key=lambda index: bounds[index][0])
+    rows = {}
+    pairs = []
+    for index in order:
+        min_x, min_y, max_x, max_y = bounds[index]
+        first_row = int((min_y - origin) // row_height)
+        last_row = int((max_y - origin) // row_height)
+        for row in range(first_row, last_row + 1):
+            active = rows.get(row)
+            if active is None:
+                rows[row] = [index]
+                continue
+            active = [other for other in active if bounds[other][2] >= min_x]
+            for other in active:
+                other_box = bounds[other]
+                if other_box[1] <= max_y and min_y <= other_box[3] and (
+                        row == first_row or int((other_box[1] - origin) // row_height) == row):
+                    pairs.append((other, index) if other < index else (index, other))
+            active.append(index)
+            rows[row] = active
+    return pairs
+
+
+def grid_row_height(bounds):
+    """
+    :param bounds: bounding boxes of the objects
+    :return: height of the sweep rows, twice the median of the larger side of the boxes, so most boxes lie in a
+    single row however long a few of the roads are
+    """
+    sides = sorted([max(box[2] - box[0], box[3] - box[1]) for box in bounds])
+    side = sides[len(sides) // 2]
+    return 2 * side if side > 0 else 1.0
+
+
+def polygon_shape(road):
+    """
+    Gets the corners of a road and the unit normals of its edges, the axes the separating axis test projects on
+    :param road: road whose rectangle is used
+    :type road: Road
+    :return: tuple of the list of (x, y) corners and the list of (x, y) axes
+    """
+    corners = [(point.get_x(), point.get_y()) for point in road.get_points()]
+    axes = []
+    for delta_x, delta_y in road.get_edge_vectors():
+        length = math.hypot(delta_x, delta_y)
+        if length > 0:
+            axes.append((-delta_y / length, delta_x / length))
+    return corners, axes
+
+
+def polygons_overlap(first, second):
+    """
+    :param first: corners and axes of a convex polygon, see polygon_shape
+    :param second: corners and axes of another convex polygon
+    :return: boolean whether the polygons overlap by more than CONTACT_TOLERANCE
+    """
+    for axis_x, axis_y in first[1] + second[1]:
+        first_min, first_max = project(first[0], axis_x, axis_y)
+        second_min, second_max = project(second[0], axis_x, axis_y)
+        if first_max <= second_min + CONTACT_TOLERANCE or second_max <= first_min + CONTACT_TOLERANCE:
+            return False
+    return True
+
+
+def polygon_circle_overlap(polygon, circle):
+    """
+    :param polygon: corners and axes of a convex polygon, see polygon_shape
+    :param circle: (center x, center y, radius) tuple
+    :return: boolean whether the polygon and the circle overlap by more than CONTACT_TOLERANCE
+    """
+    corners, axes = polygon
+    center_x, center_y, radius = circle
+
+    # besides the polygon edges, the circle can only be separated along the axis through its closest corner
+    closest_x, closest_y = min(corners, key=lambda corner: (corner[0] - center_x) ** 2 + (corner[1] - center_y) ** 2)
+    distance = math.hypot(closest_x - center_x, closest_y - center_y)
+    if distance > 0:
+        axes = axes + [((closest_x - center_x) / distance, (closest_y - center_y) / distance)]
+
+    for axis_x, axis_y in axes:
+        polygon_min, polygon_max = project(corners, axis_x, axis_y)
+        center = center_x * axis_x + center_y * axis_y
+        if polygon_max <= center - radius + CONTACT_TOLERANCE or center + radius <= polygon_min + CONTACT_TOLERANCE:
+            return False
+    return True
+
+
+def circles_overlap(first, second):
+    """
+    :param first: (center x, center y, radius) tuple
+    :param second: (center x, center y, radius) tuple
+    :return: boolean whether the circles overlap by more than CONTACT_TOLERANCE
+    """
+    return math.hypot(first[0] - second[0], first[1] - second[1]) < first[2] + second[2] - CONTACT_TOLERANCE
+
+
+def project(corners, axis_x, axis_y):
+    """
+    :return: tuple of the smallest and largest projection of the corners on the axis
+    """
+    projections = [x * axis_x + y * axis_y for x, y in corners]
+    return min(projections), max(projections)
@@ -0,0 +1,166 @@
+import pytest
+import sys
+import os
+import math
+import random
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.MapModel import MapModel
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.Connectivity import Connectivity
+from src.xml_parse.Utils import is_connected_traffic_map
+
+
+def count_components(model):
+    """
+    Counts the components of a model by walking it, the way the connectivity is checked at export
+    :return: number of components
+    """
+    intersection_roads = {intersection: [] for intersection in model.get_intersections()}
+    for road in model.get_roads():
+        for intersection in (road.get_start_connection(), road.get_end_connection()):
+            if intersection in intersection_roads:
+                intersection_roads[intersection].append(road)
+
+    seen = set()
+    components = 0
+    for start in model.get_roads() + model.get_intersections():
+        if start in seen:
+            continue
+        components += 1
+        seen.add(start)
+        to_visit = [start]
+        while to_visit:
+            map_object = to_visit.pop()
+            if map_object in intersection_roads:
+                neighbours = intersection_roads[map_object]
+            else:
+                neighbours = [intersection for intersection in (map_object.get_start_connection(),
+                                                                map_object.get_end_connection())
+                              if intersection in intersection_roads]
+            for neighbour in neighbours:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    to_visit.append(neighbour)
+    return components
+
+
+def test_connectivity():
+    """
+    Tests that the components of a model follow roads and intersections being added, reconnected, removed and put
+    back
+    :return: Tests pass if the component count matches a full walk of the map after every edit
+    """
+    model = MapModel()
+    assert model.is_connected()
+    assert model.component_count() == 0
+
+    first = Intersection(Coordinates(0, 0), 20, 25)
+    second = Intersection(Coordinates(200, 0), 20, 25)
+    model.add_intersections([first, second])
+    assert model.component_count() == 2
+    assert not model.is_connected()
+
+    road = first.add_connection(math.pi / 2, 160, 1, 1, 30, 'joining')
+    model.add_road(road)
+    assert model.component_count() == 2
+    road.add_end_connection(second)
+    second.add_incoming_connection(road)
+    model.update(road)
+    assert model.component_count() == 1
+    assert model.is_connected()
+
+    # removing the only road between them splits the map again, putting it back joins it
+    removed = model.remove_road(0)
+    assert model.component_count() == 2
+    first.add_outgoing_connection(removed)
+    second.add_incoming_connection(removed)
+    model.restore_road(0, removed)
+    assert model.component_count() == 1
+
+    model.remove_intersection(1)
+    assert model.component_count() == 1
+    model.clear()
+    assert model.component_count() == 0
+
+
+def test_connectivity_random_edits():
+    """
+    Tests the components against a full walk of the map during a long run of random edits
+    :return: Tests pass if the component count and is_connected always agree with the walk
+    """
+    random.seed(3)
+    model = MapModel()
+    removed_roads = []
+
+    for step in range(600):
+        intersections = model.get_intersections()
+        roads = model.get_roads()
+        action = random.random()
+        if action < 0.25 or len(intersections) < 2:
+            model.add_intersection(Intersection(Coordinates(random.uniform(0, 1000), 0), 10, 25))
+        elif action < 0.55:
+            start, end = random.sample(intersections, 2)
+            road = start.add_connection(0, 10, 1, 1, 25, str(step))
+            if random.random() < 0.8:
+                road.add_end_connection(end)
+                end.add_incoming_connection(road)
+            model.add_road(road)
+        elif action < 0.65 and roads:
+            # moving the end of a road to another intersection or detaching it
+            road = random.choice(roads)
+            if road.get_end_connection() is not None:
+                road.get_end_connection().connections.remove(road)
+            end = random.choice(intersections + [None])
+            road.add_end_connection(end)
+            if end is not None:
+                end.add_incoming_connection(road)
+            model.update(road)
+        elif action < 0.8 and roads:
+            road_id = model.road_id(random.choice(roads))
+            removed_roads.append((road_id, model.remove_road(road_id)))
+        elif action < 0.9 and intersections:
+            model.remove_intersection(model.intersection_id(random.choice(intersections)))
+        elif removed_roads:
+            road_id, road = removed_roads.pop(random.randrange(len(removed_roads)))
+            for intersection in (road.get_start_connection(), road.get_end_connection()):
+                if intersection is not None and intersection in model:
+                    intersection.connections.append(road)
+                else:
+                    # its intersection was removed meanwhile
+                    if road.get_start_connection() is intersection:
+                        road.add_start_connection(None)
+                    if road.get_end_connection() is intersection:
+                        road.add_end_connection(None)
+            model.restore_road(road_id, road)
+
+        if step % 3 == 0:
+            expected = count_components(model)
+            assert model.component_count() == expected
+            assert model.is_connected() == is_connected_traffic_map(model.get_roads(), model.get_intersections())
+
+
+def test_local_rebuild():
+    """
+    Tests that a removal only rebuilds the component it was in, and that several removals share one rebuild
+    :return: Tests pass if the members of other components are left alone
+    """
+    connectivity = Connectivity()
+    for intersection_id in range(4):
+        connectivity.add_intersection(intersection_id)
+    for road_id, (start, end) in enumerate([(0, 1), (1, 2), (2, 0)]):
+        connectivity.add_road(road_id)
+        connectivity.set_road_ends(road_id, start, end)
+    assert connectivity.component_count() == 2
+
+    untouched = connectivity.members[connectivity.find(7)]
+    connectivity.remove_road(0)
+    connectivity.remove_road(1)
+    assert len(connectivity.dirty_roots) == 1
+    assert connectivity.component_count() == 3
+    assert connectivity.members[connectivity.find(7)] is untouched
+    # intersections 0 and 2 are still joined by road 2, intersection 1 is on its own
+    assert connectivity.find(1) == connectivity.find(5) == connectivity.find(4)
+    assert connectivity.find(3) != connectivity.find(1)
@@ -1,9 +1,11 @@
 import pytest
 import sys
 import os
+import math
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
-from src.map.Coordinates import Coordinates
+from src.map.Coordinates import Coordinates, CoordinateBuffer
+from src.map.Intersection import Intersection
 
 
 def get_coord_x(x, y):
@@ -56,4 +58,75 @@ def test_coord_y():
     assert get_coord_y(.2234, .7337) != .2234
 
 
+def test_coordinates_slots():
+    """
+    Test that coordinate points do not carry a per-instance dictionary
+    :return: Tests pass if the coordinate only stores its x and y values
+    """
+    coord = Coordinates(1, 2)
+    assert not hasattr(coord, '__dict__')
+    with pytest.raises(AttributeError):
+        coord.z = 3
+
+
+def test_coordinate_buffer():
+    """
+    Test function for the array backed coordinate buffer
+    :return: Tests pass if points can be stored, read and moved by index
+    """
+    buffer = CoordinateBuffer()
+    assert len(buffer) == 0
+
+    assert buffer.append(3, 2) == 0
+    assert buffer.append(2.4, 26.2) == 1
+    assert list(buffer.extend([Coordinates(.2234, .7337)])) == [2]
+
+    assert len(buffer) == 3
+    assert buffer.data.typecode == 'd'
+    assert buffer.get_x(1) == 2.4
+    assert buffer.get_y(1) == 26.2
+    assert list(buffer.iter_xy()) == [(3, 2), (2.4, 26.2), (.2234, .7337)]
+
+    copy = buffer.to_coordinates(2)
+    assert type(copy) is Coordinates
+    assert copy.get_x() == .2234
+
+    buffer.set(0, 5, 6)
+    assert buffer.get_x(0) == 5
+    assert buffer.get_y(0) == 6
+
+    with pytest.raises(IndexError):
+        buffer.get(3)
+    with pytest.raises(ValueError):
+        CoordinateBuffer([1, 2, 3])
+
+    assert list(CoordinateBuffer.from_coordinates([Coordinates(1, 2)]).data) == [1, 2]
+
+
+def test_buffered_coordinates():
+    """
+    Test that buffer views behave like coordinate points and share storage with the buffer
+    :return: Tests pass if reads and writes go through the buffer
+    """
+    buffer = CoordinateBuffer([3, 2, 2.4, 26.2])
+    view = buffer.get(1)
+
+    assert view.get_x() == 2.4
+    assert view.get_y() == 26.2
+    assert view.x == 2.4
+    assert view.y == 26.2
+
+    buffer.set(1, 7, 8)
+    assert view.get_x() == 7
+
+    view.x = 9
+    assert buffer.get_x(1) == 9
+
+    intersection = Intersection(buffer.get(0), 4, 25)
+    road = intersection.add_connection(math.pi / 2, 3, 3, 4, 20, 'Test')
+    assert road.is_on_road(buffer.get(0)) is False
+    assert intersection.is_on_intersection(buffer.get(0))
 
+    points = CoordinateBuffer([8, 1, 7.5, 0, 100, 100])
+    assert road.are_on_road(points) == [road.is_on_road(Coordinates(x, y)) for x, y in points.iter_xy()]
+    assert road.are_on_road(points) == [True, True, False]
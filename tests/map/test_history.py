@@ -0,0 +1,156 @@
+import pytest
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.MapModel import NO_CONNECTION
+from src.map.History import History, AddRoad, AddIntersection, EditObject, AddCycle, ResetLight, AttachProfile, \
+    DetachProfile
+from tests.map.test_map_model import build_model
+
+
+def map_state(model):
+    """
+    :return: comparable summary of the roads, intersections and columns of a model
+    """
+    roads = [(model.road_id(road), road.in_lanes, road.out_lanes, road.speed_limit,
+              model.intersection_id(road.get_start_connection()), model.intersection_id(road.get_end_connection()))
+             for road in model.get_roads()]
+    intersections = [(model.intersection_id(intersection), intersection.radius,
+                      [model.road_id(road) for road in intersection.connections], list(intersection.cycle_names),
+                      list(intersection.spawn_profiles), intersection.yellow_light_length)
+                     for intersection in model.get_intersections()]
+    # rows of undone additions stay in the columns as removed rows, so only the live rows are compared
+    columns = model.road_columns
+    road_rows = [(i, columns.start_intersection[i], columns.end_intersection[i])
+                 for i in range(len(columns.alive)) if columns.alive[i]]
+    intersection_rows = [i for i in range(len(model.intersection_columns.alive)) if model.intersection_columns.alive[i]]
+    return roads, intersections, road_rows, intersection_rows, len(model.spatial_index)
+
+
+def test_undo_redo():
+    """
+    Tests that every command can be undone and redone, leaving the model exactly as it was each time
+    :return: Tests pass if undoing all commands restores the first state and redoing them restores the last
+    """
+    model, intersections, roads = build_model()
+    history = History(model)
+    first, second = intersections
+    states = [map_state(model)]
+
+    def run(command):
+        history.execute(command)
+        states.append(map_state(model))
+        return command
+
+    road = first.add_connection(math.pi, 50, 1, 1, 30, 'new')
+    run(AddRoad(road))
+    run(AddIntersection(road.generate_end_connection(15, 25)))
+
+    # connecting two intersections is adding a road linked to both of them
+    joining = second.add_connection(math.pi, 80, 1, 1, 30, 'connecting')
+    joining.add_end_connection(road.get_end_connection())
+    road.get_end_connection().add_incoming_connection(joining)
+    run(AddRoad(joining))
+
+    run(EditObject(road, {'in_lanes': 3, 'speed_limit': 55}))
+    run(AddCycle(first, 'cycle', [0, 2], 10000))
+    run(EditObject(first, {'yellow_light_length': 4000}))
+    run(ResetLight(first))
+    run(AttachProfile(second, 'profile'))
+    run(DetachProfile(second, 'profile'))
+
+    assert model.road_columns.end_intersection[model.road_id(joining)] == model.intersection_id(
+        road.get_end_connection())
+
+    for state in reversed(states[:-1]):
+        history.undo()
+        assert map_state(model) == state
+    assert history.undo() is None
+    assert model.road_count() == 2
+    assert first.connections == [roads[0]]
+    assert road.get_end_connection() is None
+
+    for state in states[1:]:
+        history.redo()
+        assert map_state(model) == state
+    assert history.redo() is None
+    assert model.road_id(joining) == 3
+    assert model.intersection_id(road.get_end_connection()) == 2
+
+
+def test_undo_road_keeps_cycles():
+    """
+    Tests that undoing the addition of a road renumbers the cycles of its intersection and redoing it restores them
+    :return: Tests pass if the cycles name the same roads after every step
+    """
+    model, intersections, roads = build_model()
+    history = History(model)
+    second = intersections[1]
+    road = second.add_connection(math.pi, 50, 1, 1, 30, 'new')
+    history.execute(AddRoad(road))
+    # cycles made outside of the history, as an imported map has them
+    second.add_cycle('all', [0, 1, 2], 1000)
+    second.add_cycle('new', [2], 1000)
+
+    history.undo()
+    assert second.connections == roads
+    assert second.green_cycle_roads == [[0, 1], []]
+    history.redo()
+    assert second.connections == roads + [road]
+    assert second.green_cycle_roads == [[0, 1, 2], [2]]
+
+
+def test_history_branches_and_depth():
+    """
+    Tests that a new command drops the redo stack and that only the last depth commands are kept
+    :return: Tests pass if the history stays bounded and consistent
+    """
+    model, intersections, roads = build_model()
+    history = History(model, depth=2)
+
+    for lanes in range(1, 5):
+        history.execute(EditObject(roads[0], {'in_lanes': lanes}))
+    assert len(history.undo_stack) == 2
+
+    history.undo()
+    assert roads[0].in_lanes == 3
+    assert history.can_redo()
+    history.execute(EditObject(roads[0], {'out_lanes': 2}))
+    assert not history.can_redo()
+
+    history.undo()
+    history.undo()
+    assert roads[0].in_lanes == 2
+    assert roads[0].out_lanes == 1
+    assert not history.can_undo()
+    assert history.undo() is None
+
+    history.clear()
+    assert not history.can_redo()
+
+
+def test_restore():
+    """
+    Tests that removed objects can be put back under their old ids
+    :return: Tests pass if restored objects get their ids, columns and connections back
+    """
+    model, intersections, roads = build_model()
+
+    model.remove_intersection(1)
+    assert model.road_columns.end_intersection[0] == NO_CONNECTION
+    roads[0].add_end_connection(intersections[1])
+    roads[1].add_start_connection(intersections[1])
+    assert model.restore_intersection(1, intersections[1]) == 1
+    assert model.road_columns.end_intersection[0] == 1
+    assert model.road_columns.start_intersection[1] == 1
+    assert model.intersection_columns.alive[1] == 1
+
+    model.remove_road(1)
+    with pytest.raises(ValueError):
+        model.restore_road(0, roads[1])
+    assert model.restore_road(1, roads[1]) == 1
+    assert model.get_road(1) is roads[1]
+    assert roads[1] in model.spatial_index
@@ -0,0 +1,118 @@
+import pytest
+import sys
+import os
+import math
+import random
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.LaneGraph import compile_lane_graph, lane_pairs, turn_angle, Approach
+from tests.xml.test_import import build_map
+
+
+def test_compile_lane_graph():
+    """
+    Tests the lanes, turn movements and green cycles of a chain of three intersections with a dangling road
+    :return: Tests pass if every arriving lane leads into the lanes of the other roads at its intersection
+    """
+    roads, intersections = build_map()
+    graph = compile_lane_graph(roads, intersections)
+
+    # two lanes out of the start of the first two roads and one back, one lane each way on the dangling road
+    assert list(graph.road_lane_offsets) == [0, 3, 6, 8]
+    assert list(graph.road_forward_lanes) == [2, 2, 1]
+    assert list(graph.road_lanes(1)) == [3, 4, 5]
+    assert [graph.lane_roads[lane] for lane in range(graph.lane_count())] == [0, 0, 0, 1, 1, 1, 2, 2]
+
+    # the first intersection only has the lanes of the first road, which are not turned back onto
+    assert list(graph.intersection_movements(0)) == []
+    assert [(graph.movement_from_roads[movement], graph.movement_to_roads[movement])
+            for movement in graph.intersection_movements(1)] == [(0, 1), (1, 0)]
+    assert [(graph.movement_from_roads[movement], graph.movement_to_roads[movement])
+            for movement in graph.intersection_movements(2)] == [(1, 2), (2, 1)]
+    assert list(graph.movement_turn_angles) == [0, 0, -math.pi / 2, math.pi / 2]
+
+    assert [list(graph.successors(lane)) for lane in range(graph.lane_count())] == [
+        [3], [4], [], [6], [6], [2], [], [5]]
+    assert list(graph.edge_movements) == [0, 0, 2, 2, 1, 3]
+
+    # the cycle of the middle intersection lists both of its connections, the last intersection has no cycle
+    assert [list(graph.green_cycles(movement)) for movement in range(graph.movement_count())] == [[0], [0], [], []]
+
+
+def test_lane_pairs():
+    """
+    Tests that arriving lanes are spread evenly over the departing lanes
+    :return: Tests pass if every lane on both sides is used and lanes keep their order
+    """
+    def pairs(arriving, departing):
+        return lane_pairs(Approach(0, 0, arriving, 0), Approach(1, 10, departing, 0))
+
+    assert pairs(2, 2) == [(0, 10), (1, 11)]
+    assert pairs(1, 3) == [(0, 10), (0, 11), (0, 12)]
+    assert pairs(3, 1) == [(0, 10), (1, 10), (2, 10)]
+    assert pairs(3, 2) == [(0, 10), (1, 10), (1, 11), (2, 11)]
+    assert pairs(2, 3) == [(0, 10), (0, 11), (1, 11), (1, 12)]
+
+    assert turn_angle(0.1, 0.1) == 0
+    assert turn_angle(0, 3 * math.pi / 2) == pytest.approx(-math.pi / 2)
+    assert turn_angle(3 * math.pi / 2, 0) == pytest.approx(math.pi / 2)
+    assert turn_angle(0, math.pi) == pytest.approx(math.pi)
+
+
+def test_lane_graph_random_map():
+    """
+    Tests the CSR arrays of a random map against the roads at every intersection
+    :return: Tests pass if every edge joins lanes of the roads of its movement, and every lane arriving at an
+    intersection with other departing roads has an edge into each of them
+    """
+    random.seed(5)
+    intersections = [Intersection(Coordinates(100 * index, 0), 20, 30) for index in range(30)]
+    roads = []
+    for index in range(80):
+        start = random.choice(intersections)
+        road = start.add_connection(random.uniform(0, 2 * math.pi), 50, random.randint(0, 3), random.randint(0, 3),
+                                    30, str(index))
+        # straight roads cannot start and end at the same intersection
+        end = random.choice([intersection for intersection in intersections if intersection is not start] + [None])
+        if end is not None:
+            road.add_end_connection(end)
+            end.add_incoming_connection(road)
+        roads.append(road)
+    graph = compile_lane_graph(roads, intersections)
+
+    assert graph.lane_count() == sum(road.get_in_lanes() + road.get_out_lanes() for road in roads)
+    assert len(graph.lane_offsets) == graph.lane_count() + 1
+    assert graph.lane_offsets[-1] == len(graph.lane_targets) == len(graph.edge_movements)
+    assert list(graph.lane_offsets) == sorted(graph.lane_offsets)
+
+    movement_lanes = {}
+    for lane in range(graph.lane_count()):
+        for slot in range(graph.lane_offsets[lane], graph.lane_offsets[lane + 1]):
+            movement = graph.edge_movements[slot]
+            assert graph.lane_roads[lane] == graph.movement_from_roads[movement]
+            assert graph.lane_roads[graph.lane_targets[slot]] == graph.movement_to_roads[movement]
+            movement_lanes.setdefault(movement, set()).add(lane)
+
+    def arriving_lanes(road_id, intersection):
+        first = graph.road_lane_offsets[road_id]
+        forward_end = first + graph.road_forward_lanes[road_id]
+        if roads[road_id].get_end_connection() is intersection:
+            return set(range(first, forward_end))
+        return set(range(forward_end, graph.road_lane_offsets[road_id + 1]))
+
+    road_ids = dict((road, index) for index, road in enumerate(roads))
+    for intersection_id, intersection in enumerate(intersections):
+        connected = [road_ids[road] for road in intersection.get_connections()]
+        # roads departing the intersection on at least one lane
+        departing = [road_id for road_id in connected if
+                     arriving_lanes(road_id, intersection) != set(graph.road_lanes(road_id))]
+        expected = set((arriving, other) for arriving in connected for other in departing
+                       if arriving != other and arriving_lanes(arriving, intersection))
+        movements = graph.intersection_movements(intersection_id)
+        assert set((graph.movement_from_roads[movement], graph.movement_to_roads[movement])
+                   for movement in movements) == expected
+        for movement in movements:
+            assert movement_lanes[movement] == arriving_lanes(graph.movement_from_roads[movement], intersection)
@@ -0,0 +1,209 @@
+import pytest
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.MapModel import MapModel, NO_CONNECTION
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+
+
+def build_model():
+    """
+    Builds a model with two intersections joined by one road and a dangling road on the second intersection
+    :return: the model, the intersections and the roads
+    """
+    model = MapModel()
+    first = Intersection(Coordinates(0, 0), 20, 25)
+    second = Intersection(Coordinates(200, 0), 20, 25)
+    joining = first.add_connection(math.pi / 2, 160, 1, 1, 30, 'joining')
+    joining.add_end_connection(second)
+    second.add_incoming_connection(joining)
+    dangling = second.add_connection(0, 100, 2, 1, 40, 'dangling')
+
+    model.add_intersections([first, second])
+    model.add_roads([joining, dangling])
+    return model, [first, second], [joining, dangling]
+
+
+def test_ids_and_lookup():
+    """
+    Tests that objects get stable ids that can be looked up both ways
+    :return: Tests pass if ids and lookups agree
+    """
+    model, intersections, roads = build_model()
+
+    assert model.road_count() == 2
+    assert model.intersection_count() == 2
+    assert model.intersection_id(intersections[1]) == 1
+    assert model.road_id(roads[1]) == 1
+    assert model.get_road(0) is roads[0]
+    assert model.get_intersection(1) is intersections[1]
+    assert model.get_roads() == roads
+    assert model.get_intersections() == intersections
+    assert roads[0] in model
+    assert model.road_id(Intersection(Coordinates(0, 0), 1, 1)) is None
+
+    # adding an object twice keeps its id
+    assert model.add_road(roads[0]) == 0
+    assert model.road_count() == 2
+
+
+def test_columns():
+    """
+    Tests that the columns mirror the objects and follow updates
+    :return: Tests pass if every column row matches its object
+    """
+    model, intersections, roads = build_model()
+    columns = model.road_columns
+
+    assert columns.start_intersection.tolist() == [0, 1]
+    assert columns.end_intersection.tolist() == [1, NO_CONNECTION]
+    assert columns.in_lanes.tolist() == [1, 2]
+    assert columns.out_lanes.tolist() == [1, 1]
+    assert math.isclose(columns.start_x[0], 20)
+    assert math.isclose(columns.end_x[0], 180)
+    assert model.intersection_columns.center_x.tolist() == [0, 200]
+
+    version = model.version
+    roads[1].in_lanes = 4
+    intersections[0].update_radius(30)
+    model.update(roads[1])
+    model.update(intersections[0])
+
+    assert columns.in_lanes[1] == 4
+    assert model.intersection_columns.radius[0] == 30
+    assert model.version > version
+
+
+def test_adjacency():
+    """
+    Tests the compressed sparse row adjacency of intersections to roads
+    :return: Tests pass if every intersection lists its roads in connection order
+    """
+    model, intersections, roads = build_model()
+
+    offsets, road_ids = model.intersection_adjacency()
+
+    assert offsets.tolist() == [0, 1, 3]
+    assert road_ids.tolist() == [0, 0, 1]
+    assert model.intersection_adjacency()[0] is offsets
+
+
+def test_remove():
+    """
+    Tests that removal keeps ids stable and detaches connections
+    :return: Tests pass if the removed objects are gone and the rest keep their ids
+    """
+    model, intersections, roads = build_model()
+
+    assert model.remove_road(1) is roads[1]
+    assert model.remove_road(1) is None
+    assert model.get_road(1) is None
+    assert model.road_count() == 1
+    assert roads[1] not in intersections[1].get_connections()
+    assert model.road_columns.alive.tolist() == [1, 0]
+    assert model.spatial_index.query_point(Coordinates(200, 70)) == []
+
+    model.remove_intersections([1])
+    assert roads[0].get_end_connection() is None
+    assert model.road_columns.end_intersection[0] == NO_CONNECTION
+    assert model.get_intersections() == [intersections[0]]
+
+    offsets, road_ids = model.intersection_adjacency()
+    assert offsets.tolist() == [0, 1, 1]
+
+
+def test_remove_road_renumbers_cycles():
+    """
+    Tests that removing a road drops it from the cycles of its intersections and moves the later positions down
+    :return: Tests pass if the cycles still name the same roads
+    """
+    model = MapModel()
+    center = Intersection(Coordinates(0, 0), 30, 25)
+    model.add_intersection(center)
+    roads = [center.add_connection(angle, 50, 1, 1, 30, str(angle)) for angle in (0, math.pi / 2, math.pi)]
+    model.add_roads(roads)
+    center.add_cycle('last', [2], 1000)
+    center.add_cycle('first two', [0, 1], 1000)
+    center.add_cycle('outer', [0, 2], 1000)
+
+    model.remove_road(model.road_id(roads[0]))
+    assert center.get_connections() == roads[1:]
+    assert center.green_cycle_roads == [[1], [0], [1]]
+    assert [center.get_connections()[index] for index in center.green_cycle_roads[0]] == [roads[2]]
+
+
+def test_clear():
+    """
+    Tests clearing the model with and without its profiles
+    :return: Tests pass if the requested content is removed
+    """
+    model, intersections, roads = build_model()
+    model.driver_profiles.append('driver')
+    profiles = model.driver_profiles
+
+    model.clear(keep_profiles=True)
+    assert model.road_count() == 0
+    assert model.get_intersections() == []
+    assert len(model.spatial_index) == 0
+    assert model.driver_profiles == ['driver']
+
+    model.clear()
+    assert model.driver_profiles is profiles
+    assert profiles == []
+
+
+def test_listeners():
+    """
+    Tests that listeners hear about every change together with the bounding boxes it touched
+    :return: Tests pass if every change is reported with its old and new bounds
+    """
+    model, intersections, roads = build_model()
+    changes = []
+    listener = lambda map_object, dirty_bounds: changes.append((map_object, dirty_bounds))
+    model.add_listener(listener)
+
+    old_bounds = model.spatial_index.get_bounds(intersections[0])
+    intersections[0].update_radius(30)
+    model.update(intersections[0])
+    assert changes[-1] == (intersections[0], [old_bounds, (-30, -30, 30, 30)])
+
+    model.remove_road(1)
+    assert changes[-1][0] is roads[1]
+    assert len(changes[-1][1]) == 1
+
+    model.clear()
+    assert changes[-1] == (None, None)
+
+    model.remove_listener(listener)
+    model.add_intersection(intersections[0])
+    assert len(changes) == 3
+
+
+def test_snapshot():
+    """
+    Tests that a snapshot is linked like the model but does not follow later edits
+    :return: Tests pass if the copies keep the state of the map when the snapshot was taken
+    """
+    model, intersections, roads = build_model()
+    intersections[0].add_cycle('cycle', [0], 2000)
+    snapshot_roads, snapshot_intersections = model.snapshot()
+
+    assert len(snapshot_roads) == 2
+    assert snapshot_roads[0] is not roads[0]
+    assert snapshot_roads[0].get_start_connection() is snapshot_intersections[0]
+    assert snapshot_roads[0].get_end_connection() is snapshot_intersections[1]
+    assert snapshot_intersections[1].connections == snapshot_roads
+
+    roads[0].in_lanes = 3
+    model.update(roads[0])
+    intersections[1].connections.pop()
+    intersections[0].cycle_names.pop()
+    model.remove_road(1)
+
+    assert snapshot_roads[0].in_lanes == 1
+    assert len(snapshot_intersections[1].connections) == 2
+    assert snapshot_intersections[0].cycle_names == ['cycle']
@@ -563,12 +563,15 @@ def test_is_on_road():
 
     road = i.get_connections()[0]
 
-    on_border = Coordinates(5.0, -79.0)
-    on_border2 = Coordinates(5, 50)
+    # the road covers 5 <= x <= 8 and -39 <= y <= 31
+    on_border = Coordinates(5.0, -39.0)
+    on_border2 = Coordinates(5, 20)
     outside_border = Coordinates(100, 61.01)
-    inside_border = Coordinates(7.9, 60.9)
+    inside_border = Coordinates(7.9, 30.9)
     within_road = Coordinates(6.5, 0)
     outside_road = Coordinates(-70, -70)
+    beyond_start = Coordinates(5.0, -79.0)
+    beyond_side = Coordinates(7.9, 60.9)
 
     assert road.is_on_road(on_border)
     assert road.is_on_road(within_road)
@@ -576,6 +579,8 @@ def test_is_on_road():
     assert road.is_on_road(on_border2)
     assert not road.is_on_road(outside_border)
     assert not road.is_on_road(outside_road)
+    assert not road.is_on_road(beyond_start)
+    assert not road.is_on_road(beyond_side)
 
 
 def test_add_start_connection():
@@ -873,3 +878,111 @@ def test_get_end_coords():
     assert test_coords.get_y() == end.get_y()
     assert test_coords.get_x() != start.get_x()
     assert test_coords.get_y() != start.get_y()
+
+
+def test_get_points_cache():
+    """
+    Tests that the corner points are cached and recomputed after any change to the road geometry
+    :return: Asserts true if test cases pass, false if otherwise
+    """
+    road = Road(Coordinates(70, 70), Coordinates(90, 70), 20, 1, 1, math.pi / 2, 40, 'Test')
+
+    points = road.get_points()
+    assert road.get_points() is points
+    assert road.get_edge_vectors() is road.get_edge_vectors()
+
+    road.update_in_lanes(2)
+    assert road.get_points() is not points
+    assert math.isclose(road.get_points()[0].get_y(), 70 + 2 * LANE_WIDTH)
+
+    points = road.get_points()
+    road.update_out_lanes(3)
+    assert road.get_points() is not points
+    assert math.isclose(road.get_points()[1].get_y(), 70 - 3 * LANE_WIDTH)
+
+    # direct attribute writes, as done by the edit dialog, also invalidate the cache
+    road.in_lanes = 1
+    assert math.isclose(road.get_points()[0].get_y(), 70 + LANE_WIDTH)
+
+    road.start_coord = Coordinates(50, 70)
+    assert math.isclose(road.get_points()[0].get_x(), 50)
+
+    road.angle = 0
+    assert math.isclose(road.get_points()[0].get_x(), 50 - LANE_WIDTH)
+
+    road.start_coord.x = 0
+    road.invalidate_geometry()
+    assert math.isclose(road.get_points()[0].get_x(), -LANE_WIDTH)
+
+
+def test_get_edge_vectors():
+    """
+    Tests the edge vectors of the road polygon
+    :return: Asserts true if test cases pass, false if otherwise
+    """
+    road = Road(Coordinates(70, 70), Coordinates(90, 70), 20, 1, 1, math.pi / 2, 40, 'Test')
+
+    edges = road.get_edge_vectors()
+    points = road.get_points()
+
+    assert len(edges) == 4
+    for index, edge in enumerate(edges):
+        next_point = points[(index + 1) % 4]
+        assert math.isclose(edge[0], next_point.get_x() - points[index].get_x(), abs_tol=1e-9)
+        assert math.isclose(edge[1], next_point.get_y() - points[index].get_y(), abs_tol=1e-9)
+
+    assert math.isclose(sum(edge[0] for edge in edges), 0, abs_tol=1e-9)
+    assert math.isclose(sum(edge[1] for edge in edges), 0, abs_tol=1e-9)
+
+
+def test_is_on_road_tolerance():
+    """
+    Tests the tolerance of the is_on_road function on rotated and degenerate roads
+    :return: Asserts true if test cases pass, false if otherwise
+    """
+    i = Intersection(Coordinates(0, 0), 10, 25)
+    road = i.add_connection(math.pi / 4, 100, 1, 1, 20, 'Diagonal')
+
+    direction = (math.sin(math.pi / 4), math.cos(math.pi / 4))
+    normal = (direction[1], -direction[0])
+
+    def along(distance, offset):
+        return Coordinates(direction[0] * distance + normal[0] * offset,
+                           direction[1] * distance + normal[1] * offset)
+
+    assert road.is_on_road(along(50, 0))
+    assert road.is_on_road(along(50, LANE_WIDTH - 0.01))
+    assert not road.is_on_road(along(50, LANE_WIDTH + 0.01))
+    assert road.is_on_road(along(50, LANE_WIDTH + 0.01), tolerance=0.1)
+    assert not road.is_on_road(along(115, 0))
+    assert road.is_on_road(along(115, 0), tolerance=10)
+
+    flat = Road(Coordinates(0, 0), Coordinates(100, 0), 100, 0, 0, math.pi / 2, 20, 'Flat')
+
+    assert flat.is_on_road(Coordinates(50, 0))
+    assert not flat.is_on_road(Coordinates(50, 1))
+    assert not flat.is_on_road(Coordinates(150, 0))
+    assert flat.is_on_road(Coordinates(50, 1), tolerance=1)
+
+
+def test_are_on_road():
+    """
+    Tests that the batched are_on_road function agrees with is_on_road
+    :return: Asserts true if test cases pass, false if otherwise
+    """
+    i = Intersection(Coordinates(1, 1), 4, 25)
+    road = i.add_connection(math.pi / 3, 40, 2, 1, 20, 'Test')
+
+    coords = [Coordinates(x, y) for x in range(-20, 60, 3) for y in range(-40, 60, 3)]
+
+    results = road.are_on_road(coords)
+
+    assert len(results) == len(coords)
+    assert results == [road.is_on_road(coord) for coord in coords]
+    assert any(results)
+    assert not all(results)
+
+    flat = Road(Coordinates(0, 0), Coordinates(100, 0), 100, 0, 0, math.pi / 2, 20, 'Flat')
+
+    assert flat.are_on_road([Coordinates(50, 0), Coordinates(50, 2)]) == [True, False]
+    assert road.are_on_road([]) == []
@@ -0,0 +1,90 @@
+import pytest
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.SpatialIndex import SpatialIndex, bounding_box
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+
+
+def build_index():
+    """
+    Builds an index holding one intersection at (100, 100) with radius 20 and a road leaving it towards +x
+    :return: the index, the intersection and the road
+    """
+    index = SpatialIndex(cell_size=50)
+    intersection = Intersection(Coordinates(100, 100), 20, 25)
+    road = intersection.add_connection(math.pi / 2, 200, 1, 1, 30, 'road')
+    index.insert(intersection)
+    index.insert(road)
+    return index, intersection, road
+
+
+def test_bounding_box():
+    """
+    Tests the bounding boxes computed for intersections and roads
+    :return: Tests pass if the boxes enclose the shapes
+    """
+    index, intersection, road = build_index()
+
+    assert bounding_box(intersection) == (80, 80, 120, 120)
+
+    min_x, min_y, max_x, max_y = bounding_box(road)
+    assert math.isclose(min_x, 120)
+    assert math.isclose(max_x, 320)
+    assert math.isclose(min_y, 90)
+    assert math.isclose(max_y, 110)
+
+
+def test_query_point():
+    """
+    Tests that point queries only report the objects under the point
+    :return: Tests pass if each query returns the expected objects
+    """
+    index, intersection, road = build_index()
+
+    assert len(index) == 2
+    assert index.query_point(Coordinates(100, 100)) == [intersection]
+    assert index.query_point(Coordinates(250, 105)) == [road]
+    assert index.query_point(Coordinates(250, 130)) == []
+    assert index.query_point(Coordinates(-500, -500)) == []
+
+
+def test_query_rect():
+    """
+    Tests that rectangle queries report every object whose bounding box overlaps the rectangle
+    :return: Tests pass if each query returns the expected objects
+    """
+    index, intersection, road = build_index()
+
+    assert index.query_rect(0, 0, 1000, 1000) == [intersection, road]
+    assert index.query_rect(200, 0, 300, 1000) == [road]
+    assert index.query_rect(0, 0, 50, 50) == []
+
+
+def test_update_and_remove():
+    """
+    Tests that the index follows geometry changes and removals
+    :return: Tests pass if queries reflect the latest geometry
+    """
+    index, intersection, road = build_index()
+
+    intersection.update_radius(60)
+    assert index.query_point(Coordinates(100, 155)) == []
+    index.update(intersection)
+    assert index.query_point(Coordinates(100, 155)) == [intersection]
+
+    # updating keeps the original insertion order
+    assert index.query_rect(0, 0, 1000, 1000) == [intersection, road]
+
+    index.remove(road)
+    assert road not in index
+    assert index.query_point(Coordinates(250, 105)) == []
+
+    index.remove(road)
+    index.clear()
+    assert len(index) == 0
+    assert index.cells == {}
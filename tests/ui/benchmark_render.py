@@ -0,0 +1,110 @@
+"""
+Regression benchmark for the MapBuilder canvas. Builds grid shaped maps of increasing size that extend far beyond the
+window, then reports at several zoom levels the time to draw the first frame with empty caches, a full frame from the
+cached raster tiles and a single pan step. Only the part of the map inside the window is drawn, so at full zoom all
+times should stay flat as the map grows. Zoomed out, roads are drawn as lines and, below AGGREGATE_ZOOM, from
+aggregated geometry tiles. Full frames and pans mostly copy cached raster tiles, so they should stay cheap at any
+zoom.
+
+Run from the project folder with 'python tests/ui/benchmark_render.py [sizes...]'. Without a display, set
+QT_QPA_PLATFORM=offscreen.
+"""
+import sys
+import os
+import math
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5 import QtGui, QtCore
+
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+import src.ui.MapBuilder as map_builder
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+ZOOMS = [1.0, 0.2, 0.02]
+
+GRID_SPACING = 200
+
+REPEATS = 20
+
+
+def build_grid_map(num_roads):
+    """
+    Builds rows of intersections joined by horizontal roads, laid out on a square grid
+    :param num_roads: number of roads in the map
+    :return: tuple of the list of roads and the list of intersections
+    """
+    columns = int(math.ceil(math.sqrt(num_roads)))
+    roads = []
+    intersections = []
+    for row in range(columns):
+        previous = None
+        for column in range(columns + 1):
+            if len(roads) == num_roads:
+                break
+            intersection = Intersection(Coordinates(column * GRID_SPACING, row * GRID_SPACING), 30, 25)
+            intersections.append(intersection)
+            if previous is not None:
+                road = previous.add_connection(math.pi / 2, GRID_SPACING - 60, 1, 1, 30, "road")
+                road.add_end_connection(intersection)
+                intersection.add_incoming_connection(road)
+                roads.append(road)
+            previous = intersection
+    return roads, intersections
+
+
+def time_frames(window):
+    """
+    :return: tuple of the seconds spent drawing the first frame, the average seconds spent drawing a full frame from
+    cached tiles and the average seconds spent drawing after a single pan step
+    """
+    window.tile_paths.invalidate(None)
+    window.tile_cache.invalidate(None)
+    window.backing = None
+    start = time.perf_counter()
+    window.grab()
+    first_frame = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        window.backing = None
+        window.grab()
+    full_frame = (time.perf_counter() - start) / REPEATS
+
+    start = time.perf_counter()
+    for i in range(REPEATS):
+        key = QtCore.Qt.Key_D if i % 2 == 0 else QtCore.Qt.Key_S
+        window.keyPressEvent(QtGui.QKeyEvent(QtCore.QEvent.KeyPress, key, QtCore.Qt.NoModifier))
+        window.grab()
+    pan_frame = (time.perf_counter() - start) / REPEATS
+
+    return first_frame, full_frame, pan_frame
+
+
+def main(sizes):
+    map_builder.app = QApplication.instance() or QApplication(sys.argv)
+    window = map_builder.MapBuilder()
+
+    print("{:>10} {:>8} {:>16} {:>16} {:>16}".format("roads", "zoom", "first frame ms", "full frame ms",
+                                                      "pan frame ms"))
+    for size in sizes:
+        roads, intersections = build_grid_map(size)
+        map_builder.map_model.clear(keep_profiles=True)
+        map_builder.map_model.add_intersections(intersections)
+        map_builder.map_model.add_roads(roads)
+
+        for zoom in ZOOMS:
+            window.x_offset = 0
+            window.y_offset = 0
+            window.zoom = zoom
+            first_frame, full_frame, pan_frame = time_frames(window)
+            print("{:>10} {:>8} {:>16.3f} {:>16.3f} {:>16.3f}".format(size, zoom, first_frame * 1e3,
+                                                                       full_frame * 1e3, pan_frame * 1e3))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,121 @@
+"""
+Compares the MapBuilder canvas, which draws from cached raster tiles and picks through the model's spatial index,
+with a QGraphicsScene holding one item per road and intersection, drawn by a QGraphicsView and picked through Qt's
+BSP tree index. For grid shaped maps of increasing size it reports the time to build the scene, the average time of
+one pick at random points, and the time to draw a full frame and a single pan step at several zoom levels.
+
+Run from the project folder with 'python tests/ui/benchmark_scene.py [sizes...]'. Without a display, set
+QT_QPA_PLATFORM=offscreen.
+"""
+import sys
+import os
+import random
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from PyQt5.QtWidgets import QApplication
+
+import src.ui.MapBuilder as map_builder
+from tests.ui.map_scene import MapScene, MapView
+from tests.ui.benchmark_render import build_grid_map, GRID_SPACING
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+ZOOMS = [1.0, 0.2, 0.02]
+
+PICKS = 2000
+
+REPEATS = 10
+
+PAN_STEP = 5
+
+
+def time_picks(object_at, extent):
+    """
+    :param object_at: function returning the object at a point in map coordinates
+    :param extent: side of the square the points are drawn from
+    :return: average seconds per pick
+    """
+    random.seed(1)
+    points = [(random.uniform(0, extent), random.uniform(0, extent)) for _ in range(PICKS)]
+    start = time.perf_counter()
+    for x, y in points:
+        object_at(x, y)
+    return (time.perf_counter() - start) / PICKS
+
+
+def time_canvas(window, zoom):
+    """
+    :return: tuple of the seconds spent drawing a frame with empty caches and the average seconds spent drawing a
+    single pan step with the MapBuilder canvas
+    """
+    window.x_offset = 0
+    window.y_offset = 0
+    window.zoom = zoom
+    window.tile_paths.invalidate(None)
+    window.tile_cache.invalidate(None)
+    window.backing = None
+    start = time.perf_counter()
+    window.grab()
+    full_frame = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        window.x_offset -= PAN_STEP
+        window.grab()
+    return full_frame, (time.perf_counter() - start) / REPEATS
+
+
+def time_view(view, zoom):
+    """
+    :return: tuple of the seconds spent drawing a full frame and the average seconds spent drawing a single pan step
+    with the QGraphicsView
+    """
+    view.set_view(0, 0, zoom)
+    start = time.perf_counter()
+    view.grab()
+    full_frame = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(REPEATS):
+        view.set_view(-PAN_STEP * (i + 1), 0, zoom)
+        view.grab()
+    return full_frame, (time.perf_counter() - start) / REPEATS
+
+
+def main(sizes):
+    map_builder.app = QApplication.instance() or QApplication(sys.argv)
+    window = map_builder.MapBuilder()
+    model = map_builder.map_model
+
+    print("{:>10} {:>8} {:>10} {:>14} {:>14} {:>14} {:>14}".format("roads", "zoom", "canvas", "build ms", "pick us",
+                                                                   "full frame ms", "pan frame ms"))
+    for size in sizes:
+        roads, intersections = build_grid_map(size)
+        model.clear(keep_profiles=True)
+        model.add_intersections(intersections)
+        model.add_roads(roads)
+        extent = GRID_SPACING * len(intersections) ** 0.5
+
+        start = time.perf_counter()
+        scene = MapScene(model)
+        build = time.perf_counter() - start
+        view = MapView(scene)
+        view.resize(window.size())
+        # the BSP tree is built lazily on the first query
+        scene.object_at(0, 0)
+
+        canvas_pick = time_picks(window.object_at, extent)
+        scene_pick = time_picks(scene.object_at, extent)
+        for zoom in ZOOMS:
+            full_frame, pan_frame = time_canvas(window, zoom)
+            print("{:>10} {:>8} {:>10} {:>14} {:>14.2f} {:>14.3f} {:>14.3f}".format(
+                size, zoom, "tiles", "-", canvas_pick * 1e6, full_frame * 1e3, pan_frame * 1e3))
+            full_frame, pan_frame = time_view(view, zoom)
+            print("{:>10} {:>8} {:>10} {:>14.1f} {:>14.2f} {:>14.3f} {:>14.3f}".format(
+                size, zoom, "scene", build * 1e3, scene_pick * 1e6, full_frame * 1e3, pan_frame * 1e3))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
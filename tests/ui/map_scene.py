@@ -0,0 +1,113 @@
+"""
+QGraphicsScene and QGraphicsView of a map, one item per road and intersection, drawn and picked through Qt's BSP tree
+index. This is what benchmark_scene.py compares the MapBuilder canvas against, so it only covers drawing, picking and
+placing the view.
+"""
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from PyQt5.QtWidgets import QGraphicsScene, QGraphicsView, QGraphicsPolygonItem, QGraphicsEllipseItem
+from PyQt5.QtCore import Qt
+from PyQt5 import QtGui, QtCore
+
+# z values keeping intersections drawn and picked above roads
+ROAD_Z = 0
+INTERSECTION_Z = 1
+
+# half the side of the scene rectangle, large enough for any map while the scroll bars stay in int range at MAX_ZOOM
+SCENE_EXTENT = 1e7
+
+
+class RoadItem(QGraphicsPolygonItem):
+    """
+    Scene item of a road, the lane polygon with its center line like the canvas draws it
+    """
+
+    def __init__(self, road):
+        polygon = QtGui.QPolygonF([QtCore.QPointF(point.x, point.y) for point in road.get_points()])
+        super().__init__(polygon)
+        self.map_object = road
+        self.setZValue(ROAD_Z)
+        self.setBrush(Qt.darkGray)
+
+    def paint(self, painter, option, widget=None):
+        painter.setPen(Qt.black)
+        painter.setBrush(self.brush())
+        painter.drawPolygon(self.polygon())
+        painter.setPen(Qt.lightGray)
+        painter.drawLine(QtCore.QPointF(self.map_object.start_coord.x, self.map_object.start_coord.y),
+                         QtCore.QPointF(self.map_object.end_coord.x, self.map_object.end_coord.y))
+
+
+class IntersectionItem(QGraphicsEllipseItem):
+    """
+    Scene item of an intersection, a circle around its center
+    """
+
+    def __init__(self, intersection):
+        center = intersection.center
+        radius = intersection.radius
+        super().__init__(center.x - radius, center.y - radius, radius * 2, radius * 2)
+        self.map_object = intersection
+        self.setZValue(INTERSECTION_Z)
+        self.setBrush(Qt.darkGray)
+
+
+class MapScene(QGraphicsScene):
+    """
+    Scene holding one item per road and intersection of a map model, as it was when the scene was built
+    """
+
+    def __init__(self, model):
+        """
+        :param model: map shown by the scene
+        :type model: MapModel
+        """
+        super().__init__()
+        self.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        for road in model.get_roads():
+            self.addItem(RoadItem(road))
+        for intersection in model.get_intersections():
+            self.addItem(IntersectionItem(intersection))
+
+    def object_at(self, x, y):
+        """
+        :param x: x coordinate in map coordinates
+        :param y: y coordinate in map coordinates
+        :return: topmost road or intersection at the point, None if there is none
+        """
+        items = self.items(QtCore.QPointF(x, y), Qt.IntersectsItemShape, Qt.DescendingOrder)
+        if len(items) == 0:
+            return None
+        return items[0].map_object
+
+
+class MapView(QGraphicsView):
+    """
+    View of a MapScene, panned and zoomed through its transform
+    """
+
+    def __init__(self, scene):
+        """
+        :param scene: scene shown by the view
+        :type scene: MapScene
+        """
+        super().__init__(scene)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setTransformationAnchor(QGraphicsView.NoAnchor)
+        self.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
+        self.setSceneRect(QtCore.QRectF(-SCENE_EXTENT, -SCENE_EXTENT, 2 * SCENE_EXTENT, 2 * SCENE_EXTENT))
+        self.set_view(0, 0, 1.0)
+
+    def set_view(self, x_offset, y_offset, zoom):
+        """
+        Shows the map at the same offsets and zoom as the MapBuilder canvas, screen = map * zoom + offset
+        :return: None
+        """
+        self.setTransform(QtGui.QTransform(zoom, 0, 0, zoom, 0, 0))
+        # the top left corner of the viewport shows the map point at -offset / zoom
+        top_left = self.mapToScene(0, 0)
+        self.translate(top_left.x() + x_offset / zoom, top_left.y() + y_offset / zoom)
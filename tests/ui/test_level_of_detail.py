@@ -0,0 +1,76 @@
+import pytest
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.SpatialIndex import SpatialIndex
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.ui.LevelOfDetail import TilePathCache
+
+
+def build_cache():
+    """
+    Builds a tile cache of size 100 over an intersection at (50, 50) with a road leaving it towards +x
+    :return: the cache, the index, the intersection and the road
+    """
+    index = SpatialIndex()
+    intersection = Intersection(Coordinates(50, 50), 10, 25)
+    road = intersection.add_connection(math.pi / 2, 100, 1, 1, 30, 'road')
+    index.insert(intersection)
+    index.insert(road)
+    return TilePathCache(index, tile_size=100), index, intersection, road
+
+
+def test_tiles_in():
+    """
+    Tests the tiles found for rectangles in map coordinates
+    :return: Tests pass if every overlapping tile is listed
+    """
+    cache, index, intersection, road = build_cache()
+
+    assert cache.tiles_in(0, 0, 99, 99) == [(0, 0)]
+    assert cache.tiles_in(-1, 50, 150, 50) == [(-1, 0), (0, 0), (1, 0)]
+
+
+def test_get_and_invalidate():
+    """
+    Tests that tiles aggregate the objects they overlap and are only rebuilt after an edit touches them
+    :return: Tests pass if tiles hold the expected geometry and are dropped by overlapping edits only
+    """
+    cache, index, intersection, road = build_cache()
+
+    road_path, points = cache.get(0, 0)
+    assert road_path.elementCount() == 2
+    assert points.count() == 1
+    assert cache.get(0, 0)[0] is road_path
+
+    road_path, points = cache.get(1, 0)
+    assert road_path.elementCount() == 2
+    assert points.count() == 0
+    assert cache.get(5, 5)[0].isEmpty()
+    assert len(cache) == 3
+
+    cache.invalidate((120, 40, 160, 60))
+    assert len(cache) == 2
+    cache.invalidate(None)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_eviction():
+    """
+    Tests that a full cache drops the tile that was used the longest time ago
+    :return: Tests pass if recently read tiles survive and the oldest one is evicted
+    """
+    index = SpatialIndex()
+    cache = TilePathCache(index, tile_size=100, capacity=2)
+    first = cache.get(0, 0)
+    cache.get(1, 0)
+    assert cache.get(0, 0) is first
+
+    cache.get(0, 1)
+    assert len(cache) == 2
+    assert (1, 0) not in cache.tiles
+    assert cache.get(0, 0) is first
@@ -0,0 +1,58 @@
+import pytest
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.MapModel import MapModel
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from tests.ui.map_scene import MapScene, MapView
+from PyQt5.QtWidgets import QApplication
+
+app = None
+
+
+def build_scene():
+    """
+    Builds a scene over a model with an intersection at (50, 50) and a road leaving it towards +x
+    :return: the scene, the model, the intersection and the road
+    """
+    global app
+    app = QApplication.instance() or QApplication(sys.argv)
+    model = MapModel()
+    intersection = Intersection(Coordinates(50, 50), 10, 25)
+    road = intersection.add_connection(math.pi / 2, 100, 1, 1, 30, 'road')
+    model.add_intersection(intersection)
+    model.add_road(road)
+    return MapScene(model), model, intersection, road
+
+
+def test_scene_picking():
+    """
+    Tests that picking returns the topmost object under a point
+    :return: Tests pass if intersections win over roads and empty points give None
+    """
+    scene, model, intersection, road = build_scene()
+
+    assert scene.object_at(50, 50) is intersection
+    assert scene.object_at(100, 50) is road
+    assert scene.object_at(500, 500) is None
+    assert len(scene.items()) == 2
+
+
+def test_view_transform():
+    """
+    Tests that the view places the map like the MapBuilder canvas, at map coordinates times zoom plus offset
+    :return: Tests pass if map points land on the expected pixels
+    """
+    scene, model, intersection, road = build_scene()
+    view = MapView(scene)
+    view.resize(400, 300)
+
+    for x_offset, y_offset, zoom in [(0, 0, 1.0), (123, -45, 0.5), (-1000, 300, 2.0)]:
+        view.set_view(x_offset, y_offset, zoom)
+        point = view.mapFromScene(10, 20)
+        assert point.x() == 10 * zoom + x_offset
+        assert point.y() == 20 * zoom + y_offset
@@ -0,0 +1,62 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.ui.TileCache import TileCache
+
+
+def test_tiles_in():
+    """
+    Tests the tiles found for rectangles in pixels relative to the map origin
+    :return: Tests pass if every overlapping tile is listed
+    """
+    cache = TileCache(tile_size=100)
+
+    assert cache.tiles_in(0, 0, 99, 99) == [(0, 0)]
+    assert cache.tiles_in(-1, 50, 100, 50) == [(-1, 0), (0, 0), (1, 0)]
+    assert cache.tiles_in(0, -1, 0, 0) == [(0, -1), (0, 0)]
+    assert cache.map_bounds((1, -1, 0.5)) == (200, -200, 400, 0)
+    assert cache.map_bounds((0, 0, 1.0), 2) == (-2, -2, 102, 102)
+
+
+def test_least_recently_used_eviction():
+    """
+    Tests that a full cache drops the tile that was used the longest time ago
+    :return: Tests pass if recently read tiles survive and the oldest one is evicted
+    """
+    cache = TileCache(tile_size=100, capacity=2)
+    cache.put((0, 0, 1.0), 'a')
+    cache.put((1, 0, 1.0), 'b')
+    assert cache.get((0, 0, 1.0)) == 'a'
+
+    cache.put((0, 0, 0.5), 'c')
+    assert len(cache) == 2
+    assert (1, 0, 1.0) not in cache
+    assert cache.get((1, 0, 1.0)) is None
+    assert cache.get((0, 0, 1.0)) == 'a'
+    assert cache.get((0, 0, 0.5)) == 'c'
+
+
+def test_invalidate():
+    """
+    Tests that edits drop the tiles showing them at every zoom and nothing else
+    :return: Tests pass if only the overlapping tiles are dropped
+    """
+    cache = TileCache(tile_size=100)
+    for key in [(0, 0, 1.0), (1, 0, 1.0), (0, 1, 1.0), (0, 0, 0.5), (3, 3, 0.5)]:
+        cache.put(key, 'tile')
+
+    cache.invalidate((120, 10, 150, 50))
+    assert (1, 0, 1.0) not in cache
+    assert (0, 0, 0.5) not in cache
+    assert len(cache) == 3
+
+    # the outline margin reaches into the tile left of the edit
+    cache.invalidate((101, 110, 150, 150), 2)
+    assert (0, 1, 1.0) not in cache
+    assert len(cache) == 2
+
+    cache.invalidate(None)
+    assert len(cache) == 0
@@ -1,14 +1,20 @@
 import pytest
 import sys
 import os
+import math
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from src.map.Road import Road
 from src.map.Coordinates import Coordinates
 from src.map.Intersection import Intersection
-from src.ui.MapBuilder import MapBuilder, AddDialog, TestClass
-from PyQt5.QtWidgets import QApplication
+from src.ui.MapBuilder import MapBuilder, AddDialog, TestClass, map_model, FRAME_INTERVAL
+from src.ui.ExportWorker import ExportWorker
+from src.xml_parse.LaneGraphFile import lane_graph_location, load_lane_graph
+from src.xml_parse.Journal import Journal, SNAPSHOT_SUFFIX, SET_ASIDE_SUFFIX
+from PyQt5.QtWidgets import QApplication, QMessageBox
+from PyQt5.QtTest import QTest
+from PyQt5 import QtGui, QtCore
 
 
 @pytest.mark.first
@@ -323,3 +329,376 @@ def test_connect_intersections():
 #     assert obj is not None
 #     assert type(obj) is Intersection
 #     assert obj.radius == 90
+
+
+def test_incremental_rendering():
+    """
+    Tests that scrolling the backing pixmap and redrawing only dirty rectangles gives the same picture as drawing
+    the whole map again
+    :return: Test passes if both renderings are identical
+    """
+    tester = TestClass()
+    incremental, full = tester.render_incremental_and_full()
+
+    assert incremental == full
+
+
+def test_level_of_detail_rendering():
+    """
+    Tests incremental rendering zoomed out far enough for roads to become lines, and far enough for the map to be
+    drawn from aggregated tiles
+    :return: Test passes if both renderings are identical at each zoom
+    """
+    tester = TestClass()
+    for zoom in (0.2, 0.05):
+        incremental, full = tester.render_incremental_and_full(zoom)
+
+        assert incremental == full
+
+
+def test_tile_reuse():
+    """
+    Tests that panning back over a part of the map seen before reuses the cached tiles, and that edits only
+    re-render the tiles they touch
+    :return: Test passes if no tile is rendered twice unless it was edited
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    mb.zoom = 1.0
+    mb.x_offset = 0
+    mb.y_offset = 0
+    road = tester.add_dialog_road()[0]
+    mb.grab()
+    tiles = dict(mb.tile_cache.tiles)
+
+    for key in (QtCore.Qt.Key_D, QtCore.Qt.Key_A, QtCore.Qt.Key_S, QtCore.Qt.Key_W):
+        mb.keyPressEvent(QtGui.QKeyEvent(QtCore.QEvent.KeyPress, key, QtCore.Qt.NoModifier))
+        mb.grab()
+    assert all(mb.tile_cache.get(key) is tile for key, tile in tiles.items())
+
+    road.in_lanes = 1
+    map_model.update(road)
+    mb.grab()
+    redrawn = [key for key, tile in tiles.items() if mb.tile_cache.get(key) is not tile]
+    assert 0 < len(redrawn) < len(tiles)
+
+
+def test_menu_follows_selection_and_model():
+    """
+    Tests that the menu state is recomputed when the selection or the map changes, without waiting for a repaint
+    :return: Test passes if the actions are enabled for the current selection
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    intersection = map_model.get_intersections()[0]
+    assert mb.add_action.isEnabled()
+    assert mb.traffic_light_menu.isEnabled()
+    assert not mb.auto_connect.isEnabled()
+
+    map_model.add_intersection(Intersection(Coordinates(800, 250), 40, 25))
+    assert mb.auto_connect.isEnabled()
+
+    road = tester.add_dialog_road()[0]
+    mb.select(road)
+    assert not mb.traffic_light_menu.isEnabled()
+    assert mb.add_action.isEnabled()
+
+    mb.select(None)
+    assert not mb.add_action.isEnabled()
+    assert not mb.edit_action.isEnabled()
+
+
+def test_pan_coalescing():
+    """
+    Tests that a burst of pan keys handled within one frame leads to a single repaint. The frame timer is fired by
+    hand, so the test does not depend on how fast the burst runs.
+    :return: Test passes if the offsets move with every key, nothing is drawn until the frame timer fires and the
+    window is drawn exactly once when it does
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    mb.grab()
+    x_offset = mb.x_offset
+
+    events = []
+
+    class EventRecorder(QtCore.QObject):
+        def eventFilter(self, obj, event):
+            events.append(event.type())
+            return False
+
+    # keep the frame timer from firing on its own during the burst
+    mb.frame_timer.stop()
+    mb.frame_timer.setInterval(60 * 60 * 1000)
+    recorder = EventRecorder()
+    mb.installEventFilter(recorder)
+    # let the window settle first, layout requests left from setting up lead to further repaints
+    for _ in range(100):
+        handled = len(events)
+        QApplication.processEvents()
+        if len(events) == handled:
+            break
+    del events[:]
+
+    for _ in range(10):
+        mb.keyPressEvent(QtGui.QKeyEvent(QtCore.QEvent.KeyPress, QtCore.Qt.Key_D, QtCore.Qt.NoModifier))
+        QApplication.processEvents()
+
+    assert mb.x_offset == x_offset - 50
+    assert mb.frame_timer.isActive()
+    assert QtCore.QEvent.Paint not in events
+
+    # the frame is due
+    mb.frame_timer.stop()
+    mb.frame_timer.timeout.emit()
+    QApplication.processEvents()
+    mb.removeEventFilter(recorder)
+    mb.frame_timer.setInterval(FRAME_INTERVAL)
+
+    assert events.count(QtCore.QEvent.Paint) == 1
+    assert mb.backing_offset == (mb.x_offset, mb.y_offset)
+
+
+def test_undo_redo():
+    """
+    Tests undoing and redoing edits made through the dialogs
+    :return: Test passes if the map and the menu follow the history
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    assert not mb.undo_action.isEnabled()
+
+    road = tester.add_dialog_road()[0]
+    lanes = (road.in_lanes, road.out_lanes)
+    tester.edit_dialog_road()
+    mb.update_menu_bar()
+    assert mb.undo_action.isEnabled()
+    assert (road.in_lanes, road.out_lanes) == (3, 2)
+
+    mb.undo()
+    assert (road.in_lanes, road.out_lanes) == lanes
+    assert mb.redo_action.isEnabled()
+    mb.select(road)
+    mb.undo()
+    assert map_model.road_count() == 0
+    assert map_model.get_intersections()[0].connections == []
+    assert not mb.undo_action.isEnabled()
+
+    mb.redo()
+    mb.redo()
+    assert map_model.get_roads() == [road]
+    assert (road.in_lanes, road.out_lanes) == (3, 2)
+    assert not mb.redo_action.isEnabled()
+
+    mb.reset_file()
+    assert not mb.undo_action.isEnabled()
+
+
+def wait_for_export(mb):
+    """
+    Processes events until the export of a map builder has ended
+    :return: None
+    """
+    for _ in range(1000):
+        if mb.export_worker is None:
+            return
+        QTest.qWait(10)
+    raise AssertionError("export did not end")
+
+
+def test_background_export():
+    """
+    Tests that the map is exported on a worker thread from a snapshot, and that a cancelled export writes nothing
+    :return: Test passes if edits made during the export do not reach the file and cancelling keeps the old file
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    location = "{}/export.xml".format(os.path.dirname(__file__))
+
+    assert mb.start_export(location) is not None
+    assert mb.start_export(location) is None
+    assert not mb.save_action.isEnabled()
+    tester.add_dialog_road()
+    wait_for_export(mb)
+    assert mb.save_action.isEnabled()
+    with open(location) as xml_file:
+        contents = xml_file.read()
+    assert "<intersection" in contents
+    assert "<road" not in contents
+    lanes_location = lane_graph_location(location)
+    assert load_lane_graph(lanes_location, location).lane_count() == 0
+
+    worker = ExportWorker(*map_model.snapshot(), save_location=location)
+    ended = []
+    worker.signals.cancelled.connect(lambda: ended.append('cancelled'))
+    worker.signals.finished.connect(ended.append)
+    worker.cancel()
+    worker.run()
+    assert ended == ['cancelled']
+    with open(location) as xml_file:
+        assert xml_file.read() == contents
+
+    os.remove(location)
+    os.remove(lanes_location)
+
+
+def test_export_failure(monkeypatch):
+    """
+    Tests that an error the exporter does not expect ends the export like any other failure
+    :return: Test passes if the error is reported and the map can be saved again afterwards
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    location = "{}/export.xml".format(os.path.dirname(__file__))
+
+    # a road wider than its intersection has no chord to end on
+    intersection = map_model.get_intersections()[0]
+    intersection.radius = 1
+    map_model.update(intersection)
+    map_model.add_road(intersection.add_connection(math.pi / 2, 100, 2, 2, 30, "wide"))
+
+    warnings = []
+    monkeypatch.setattr(QMessageBox, 'warning', lambda parent, title, text: warnings.append(text))
+    assert mb.start_export(location) is not None
+    wait_for_export(mb)
+    assert warnings == ["Export failed: ValueError: math domain error"]
+    assert mb.save_action.isEnabled()
+    assert mb.export_dialog is None
+    assert not os.path.exists(location)
+
+def test_connectivity_status():
+    """
+    Tests that the status bar shows whether the map is connected as it is edited
+    :return: Test passes if the message follows the number of separate parts
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    assert mb.statusBar().currentMessage() == "Map is connected"
+
+    first = map_model.get_intersections()[0]
+    second = Intersection(Coordinates(800, 250), 40, 25)
+    map_model.add_intersection(second)
+    assert mb.statusBar().currentMessage() == "Map is not connected: 2 separate parts"
+
+    road = first.add_connection(math.pi / 2, 300, 1, 1, 30, "joining")
+    road.add_end_connection(second)
+    second.add_incoming_connection(road)
+    map_model.add_road(road)
+    assert mb.statusBar().currentMessage() == "Map is connected"
+
+    map_model.remove_road(map_model.road_id(road))
+    assert mb.statusBar().currentMessage() == "Map is not connected: 2 separate parts"
+
+
+def test_highlight_components():
+    """
+    Tests that the parts of the map outside the largest one and dangling roads are highlighted until the next edit
+    :return: Test passes if exactly those roads and intersections are highlighted
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+
+    first = map_model.get_intersections()[0]
+    second = Intersection(Coordinates(800, 250), 40, 25)
+    map_model.add_intersection(second)
+    joining = first.add_connection(math.pi / 2, 300, 1, 1, 30, "joining")
+    joining.add_end_connection(second)
+    second.add_incoming_connection(joining)
+    map_model.add_road(joining)
+    dangling = second.add_connection(math.pi / 2, 100, 1, 1, 30, "dangling")
+    map_model.add_road(dangling)
+    island = Intersection(Coordinates(400, 800), 40, 25)
+    map_model.add_intersection(island)
+
+    mb.highlight_action.trigger()
+    assert mb.highlighted == [island, dangling]
+    assert mb.statusBar().currentMessage() == "2 separate parts, 1 dangling roads highlighted"
+    mb.repaint()
+
+    map_model.remove_intersection(map_model.intersection_id(island))
+    assert mb.highlighted == []
+    assert mb.statusBar().currentMessage() == "Map is connected"
+
+
+def test_open_file(monkeypatch):
+    """
+    Tests opening a saved map through the File menu handler, and that a file that cannot be read is reported
+    :return: Test passes if the saved map replaces the current one and a malformed file leaves the map unchanged
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    assert mb.open_action in mb.menuBar().actions()[0].menu().actions()
+    location = "{}/open.xml".format(os.path.dirname(__file__))
+
+    tester.add_dialog_road()
+    counts = (map_model.road_count(), map_model.intersection_count())
+    mb.start_export(location)
+    wait_for_export(mb)
+    mb.reset_file()
+    assert (map_model.road_count(), map_model.intersection_count()) != counts
+
+    assert mb.open_file(location)
+    assert (map_model.road_count(), map_model.intersection_count()) == counts
+
+    warnings = []
+    monkeypatch.setattr(QMessageBox, 'warning', lambda parent, title, text: warnings.append(text))
+    with open(location, 'w') as xml_file:
+        xml_file.write('<map><road>')
+    assert not mb.open_file(location)
+    assert "Malformed xml" in warnings[0]
+    assert (map_model.road_count(), map_model.intersection_count()) == counts
+
+    os.remove(location)
+    os.remove(lane_graph_location(location))
+
+
+def test_recover(monkeypatch):
+    """
+    Tests starting from the journal of the last session, and that a journal that cannot be replayed is moved aside
+    :return: Test passes if a good journal restores its map and a corrupt one leads to the default first road
+    """
+    tester = TestClass()
+    tester.setup()
+    mb = tester.map_builder
+    mb.reset_file()
+    location = "{}/recover.journal".format(os.path.dirname(__file__))
+    tester.add_dialog_road()
+    counts = (map_model.road_count(), map_model.intersection_count())
+
+    journal = Journal(location)
+    journal.start(map_model)
+    journal.stop()
+    mb.reset_file()
+    assert mb.recover(Journal(location))
+    assert (map_model.road_count(), map_model.intersection_count()) == counts
+
+    warnings = []
+    monkeypatch.setattr(QMessageBox, 'warning', lambda parent, title, text: warnings.append(text))
+    with open(location, 'w') as journal_file:
+        journal_file.write('["road", 0, 1]\n')
+    assert not mb.recover(Journal(location))
+    assert "could not be recovered" in warnings[0]
+    assert (map_model.road_count(), map_model.intersection_count()) == (0, 1)
+    assert not os.path.exists(location)
+    assert not os.path.exists(location + SNAPSHOT_SUFFIX)
+
+    for path in (location, location + SNAPSHOT_SUFFIX):
+        os.remove(path + SET_ASIDE_SUFFIX)
@@ -0,0 +1,50 @@
+"""
+Regression benchmark for exporting in the background. For chain shaped maps of increasing size it reports the time
+the editing thread spends taking the snapshot of the model, which is all the map builder waits for before the export
+runs on the thread pool, and for comparison the time of the export itself. The snapshot only copies objects, so it
+should stay a small fraction of the export.
+
+Run from the project folder with 'python tests/xml/benchmark_background_export.py [sizes...]'
+"""
+import sys
+import os
+import time
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.MapModel import MapModel
+from src.xml_parse.Export import export_xml
+from tests.xml.benchmark_export import build_profiled_chain_map
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def main(sizes):
+    print("{:>10} {:>14} {:>12} {:>14}".format("roads", "snapshot ms", "export s", "progress calls"))
+    handle, save_location = tempfile.mkstemp(suffix='.xml')
+    os.close(handle)
+    try:
+        for size in sizes:
+            roads, intersections = build_profiled_chain_map(size)
+            model = MapModel()
+            model.add_intersections(intersections)
+            model.add_roads(roads)
+
+            start = time.perf_counter()
+            snapshot_roads, snapshot_intersections = model.snapshot()
+            snapshot = time.perf_counter() - start
+
+            reports = []
+            start = time.perf_counter()
+            export_xml(snapshot_roads, snapshot_intersections, save_location,
+                       progress=lambda *report: reports.append(report))
+            export = time.perf_counter() - start
+
+            print("{:>10} {:>14.2f} {:>12.3f} {:>14}".format(size, snapshot * 1e3, export, len(reports)))
+    finally:
+        os.remove(save_location)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
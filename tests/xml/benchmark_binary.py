@@ -0,0 +1,65 @@
+"""
+Regression benchmark for the binary map format. Saves chain shaped maps of increasing size with export_binary and
+reports the time to write them, the time to open them with load_binary and the time to decode a thousand random
+roads and intersections. Opening only reads the header, so it should take well under a millisecond at any size.
+
+Run from the project folder with 'python tests/xml/benchmark_binary.py [sizes...]'
+"""
+import sys
+import os
+import time
+import random
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.xml_parse.Binary import export_binary, load_binary
+from tests.xml.benchmark_export import build_profiled_chain_map
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+RANDOM_READS = 1000
+
+
+def time_binary(roads, intersections):
+    """
+    Writes a map, opens it and reads random records from it
+    :return: tuple of seconds spent writing, opening and reading, and the size of the file in bytes
+    """
+    handle, save_location = tempfile.mkstemp(suffix='.bin')
+    os.close(handle)
+    try:
+        start = time.perf_counter()
+        export_binary(roads, intersections, save_location)
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        binary_map = load_binary(save_location)
+        load_time = time.perf_counter() - start
+
+        road_ids = [random.randrange(binary_map.road_count()) for _ in range(RANDOM_READS)]
+        intersection_ids = [random.randrange(binary_map.intersection_count()) for _ in range(RANDOM_READS)]
+        start = time.perf_counter()
+        for road_id in road_ids:
+            binary_map.road(road_id)
+        for intersection_id in intersection_ids:
+            binary_map.intersection(intersection_id)
+        read_time = time.perf_counter() - start
+
+        binary_map.close()
+        return write_time, load_time, read_time, os.path.getsize(save_location)
+    finally:
+        os.remove(save_location)
+
+
+def main(sizes):
+    print("{:>10} {:>12} {:>12} {:>16} {:>10}".format("roads", "write s", "load ms", "random read ms", "file MB"))
+    for size in sizes:
+        roads, intersections = build_profiled_chain_map(size)
+        write_time, load_time, read_time, file_size = time_binary(roads, intersections)
+        print("{:>10} {:>12.4f} {:>12.4f} {:>16.4f} {:>10.2f}".format(size, write_time, load_time * 1e3,
+                                                                     read_time * 1e3, file_size / 1e6))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
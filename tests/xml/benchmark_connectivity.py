@@ -0,0 +1,63 @@
+"""
+Benchmark for is_connected_traffic_map. Builds chain shaped maps of increasing size and reports the time spent per
+road so that the linear scaling of the traversal can be checked by eye.
+
+Run from the project folder with 'python tests/xml/benchmark_connectivity.py [sizes...]'
+"""
+import sys
+import os
+import math
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.xml_parse.Utils import is_connected_traffic_map
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def build_chain_map(num_roads):
+    """
+    Builds a map where every road joins two consecutive intersections, laid out along the x axis
+    :param num_roads: number of roads in the chain
+    :return: tuple of the list of roads and the list of intersections
+    """
+    intersections = [Intersection(Coordinates(index * 40, 0), 10, 25) for index in range(num_roads + 1)]
+    roads = []
+    for index in range(num_roads):
+        road = Road(Coordinates(index * 40 + 10, 0), Coordinates(index * 40 + 30, 0), 20, 1, 1, math.pi / 2, 25,
+                    str(index))
+        road.add_start_connection(intersections[index])
+        road.add_end_connection(intersections[index + 1])
+        intersections[index].add_outgoing_connection(road)
+        intersections[index + 1].add_incoming_connection(road)
+        roads.append(road)
+    return roads, intersections
+
+
+def time_connectivity(num_roads):
+    """
+    Times a single connectivity check on a chain map
+    :param num_roads: number of roads in the chain
+    :return: seconds spent in is_connected_traffic_map
+    """
+    roads, intersections = build_chain_map(num_roads)
+    start = time.perf_counter()
+    connected = is_connected_traffic_map(roads, intersections)
+    elapsed = time.perf_counter() - start
+    assert connected
+    return elapsed
+
+
+def main(sizes):
+    print("{:>10} {:>12} {:>14}".format("roads", "seconds", "us per road"))
+    for size in sizes:
+        elapsed = time_connectivity(size)
+        print("{:>10} {:>12.4f} {:>14.3f}".format(size, elapsed, elapsed / size * 1e6))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
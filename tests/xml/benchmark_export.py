@@ -0,0 +1,83 @@
+"""
+Regression benchmark for the xml export. Exports chain shaped maps of increasing size with make_xml and stream_xml
+and reports the time spent per road and the peak memory allocated by the export itself. Intersection ids are looked
+up in constant time, so the time per road should stay flat as the map grows, and the streaming writer should keep
+its peak memory flat as well. Every intersection spawns with the same profile, so writing a shared profile table
+instead of inlining the profiles should make the file and the export time much smaller.
+
+Run from the project folder with 'python tests/xml/benchmark_export.py [sizes...]'
+"""
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.DriverProfile import DriverProfile
+from src.map.VehicleProfile import VehicleProfile
+from src.map.SpawningProfile import SpawningProfile
+from src.xml_parse.Export import make_xml, stream_xml
+from tests.xml.benchmark_connectivity import build_chain_map
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+
+def build_profiled_chain_map(num_roads):
+    """
+    Builds a chain map where every intersection spawns vehicles with the same profile
+    :param num_roads: number of roads in the chain
+    :return: tuple of the list of roads and the list of intersections
+    """
+    roads, intersections = build_chain_map(num_roads)
+    profile = SpawningProfile("Default", DriverProfile("Default", 8, 2, 2, 0, 30, 3, 1),
+                              VehicleProfile("Default", 5, 15, 2, 2, 1000, 65))
+    for intersection in intersections:
+        intersection.add_spawning_profile(profile)
+    return roads, intersections
+
+
+def stream_shared_xml(roads, intersections, save_location):
+    """
+    Streams the map with a shared profile table instead of inline profiles
+    """
+    stream_xml(roads, intersections, save_location, inline_profiles=False)
+
+
+def time_export(export, roads, intersections):
+    """
+    Runs an export twice, once timed and once with allocation tracing, since tracing slows the export down
+    :param export: export function taking roads, intersections and a save location
+    :return: tuple of seconds spent, peak bytes allocated during the export and size of the file in bytes
+    """
+    handle, save_location = tempfile.mkstemp(suffix='.xml')
+    os.close(handle)
+    try:
+        start = time.perf_counter()
+        export(roads, intersections, save_location)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        export(roads, intersections, save_location)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak, os.path.getsize(save_location)
+    finally:
+        os.remove(save_location)
+
+
+def main(sizes):
+    print("{:>18} {:>10} {:>12} {:>14} {:>12} {:>12}".format("export", "roads", "seconds", "us per road",
+                                                             "peak MB", "file MB"))
+    for size in sizes:
+        roads, intersections = build_profiled_chain_map(size)
+        for export in (make_xml, stream_xml, stream_shared_xml):
+            elapsed, peak, file_size = time_export(export, roads, intersections)
+            print("{:>18} {:>10} {:>12.4f} {:>14.3f} {:>12.2f} {:>12.2f}".format(export.__name__, size, elapsed,
+                                                                              elapsed / size * 1e6, peak / 1e6,
+                                                                              file_size / 1e6))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,65 @@
+"""
+Regression benchmark for the xml import. Exports a profiled chain map that is about as large as the requested file
+size, then imports it again and reports the time spent per road and the peak memory allocated by the import itself.
+Elements are cleared as soon as they have been read, so the peak should stay close to the size of the imported
+objects rather than growing with the size of the file.
+
+Run from the project folder with 'python tests/xml/benchmark_import.py [megabytes...]'
+"""
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.xml_parse.Export import stream_xml
+from src.xml_parse.Import import import_xml
+from tests.xml.benchmark_export import build_profiled_chain_map
+
+DEFAULT_SIZES = [10, 100]
+
+# approximate size of one road and one intersection with an inline profile in the exported file
+BYTES_PER_ROAD = 865
+
+
+def time_import(save_location):
+    """
+    Runs the import twice, once timed and once with allocation tracing, since tracing slows the import down
+    :param save_location: location of the xml file
+    :return: tuple of seconds spent, peak bytes allocated during the import and number of imported roads
+    """
+    start = time.perf_counter()
+    model = import_xml(save_location)
+    elapsed = time.perf_counter() - start
+    road_count = model.road_count()
+    del model
+
+    tracemalloc.start()
+    import_xml(save_location)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, road_count
+
+
+def main(sizes):
+    print("{:>10} {:>10} {:>12} {:>14} {:>12}".format("file MB", "roads", "seconds", "us per road", "peak MB"))
+    for size in sizes:
+        handle, save_location = tempfile.mkstemp(suffix='.xml')
+        os.close(handle)
+        try:
+            roads, intersections = build_profiled_chain_map(int(size * 1e6 / BYTES_PER_ROAD))
+            stream_xml(roads, intersections, save_location)
+            del roads, intersections
+
+            elapsed, peak, road_count = time_import(save_location)
+            print("{:>10.1f} {:>10} {:>12.4f} {:>14.3f} {:>12.2f}".format(os.path.getsize(save_location) / 1e6,
+                                                                      road_count, elapsed,
+                                                                      elapsed / road_count * 1e6, peak / 1e6))
+        finally:
+            os.remove(save_location)
+
+
+if __name__ == '__main__':
+    main([float(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
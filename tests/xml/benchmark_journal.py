@@ -0,0 +1,70 @@
+"""
+Regression benchmark for the crash recovery journal. For chain shaped maps of increasing size it reports the time an
+edit spends on the editing thread, the time until a burst of edits is on disk, the time to replay the map, and for
+comparison the time of one full xml save. Edits only append a record, so both edit times should stay flat as the map
+grows, while a full save grows with the map.
+
+Run from the project folder with 'python tests/xml/benchmark_journal.py [sizes...]'
+"""
+import sys
+import os
+import random
+import time
+import tempfile
+import shutil
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.MapModel import MapModel
+from src.xml_parse.Export import stream_xml
+from src.xml_parse.Journal import Journal
+from tests.xml.benchmark_connectivity import build_chain_map
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+EDITS = 2000
+
+
+def main(sizes):
+    print("{:>10} {:>14} {:>16} {:>14} {:>12}".format("roads", "edit us", "edit on disk us", "replay s",
+                                                       "xml save s"))
+    directory = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            roads, intersections = build_chain_map(size)
+            model = MapModel()
+            model.add_intersections(intersections)
+            model.add_roads(roads)
+
+            location = os.path.join(directory, "map{}.journal".format(size))
+            journal = Journal(location)
+            journal.start(model)
+            journal.flush()
+
+            random.seed(1)
+            edited = [model.get_road(random.randrange(size)) for _ in range(EDITS)]
+            start = time.perf_counter()
+            for road in edited:
+                road.speed_limit += 1
+                model.update(road)
+            edit = (time.perf_counter() - start) / EDITS
+            journal.flush()
+            on_disk = (time.perf_counter() - start) / EDITS
+            journal.stop()
+
+            start = time.perf_counter()
+            Journal(location).replay(MapModel())
+            replay = time.perf_counter() - start
+
+            start = time.perf_counter()
+            stream_xml(model.get_roads(), model.get_intersections(), os.path.join(directory, "map.xml"))
+            save = time.perf_counter() - start
+
+            print("{:>10} {:>14.2f} {:>16.2f} {:>14.3f} {:>12.3f}".format(size, edit * 1e6, on_disk * 1e6, replay,
+                                                                         save))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
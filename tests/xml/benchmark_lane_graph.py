@@ -0,0 +1,58 @@
+"""
+Benchmark for the lane graph exported next to the xml map. Compiles chain shaped maps of increasing size, saves the
+lane graph and reports the time the simulator saves at startup by loading it instead of compiling it.
+
+Run from the project folder with 'python tests/xml/benchmark_lane_graph.py [sizes...]'
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.LaneGraph import compile_lane_graph
+from src.xml_parse.Export import stream_xml
+from src.xml_parse.LaneGraphFile import export_lane_graph, load_lane_graph, xml_fingerprint
+from tests.xml.benchmark_connectivity import build_chain_map
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def time_lane_graph(num_roads):
+    """
+    Times compiling, saving and loading the lane graph of a chain map. Loading includes checking the fingerprint of
+    the xml map.
+    :param num_roads: number of roads in the chain
+    :return: tuple of the seconds spent compiling, saving and loading, and the size of the file in bytes
+    """
+    roads, intersections = build_chain_map(num_roads)
+    save_location = "{}/benchmark.lanes".format(os.path.dirname(__file__))
+    # the lane graph is checked against the xml it was compiled from when it is loaded
+    xml_location = "{}/benchmark.xml".format(os.path.dirname(__file__))
+    stream_xml(roads, intersections, xml_location)
+
+    start = time.perf_counter()
+    graph = compile_lane_graph(roads, intersections)
+    compiled = time.perf_counter()
+    export_lane_graph(graph, save_location, xml_fingerprint(xml_location))
+    saved = time.perf_counter()
+    loaded_graph = load_lane_graph(save_location, xml_location)
+    loaded = time.perf_counter()
+
+    size = os.path.getsize(save_location)
+    os.remove(save_location)
+    os.remove(xml_location)
+    assert loaded_graph.lane_targets == graph.lane_targets
+    return compiled - start, saved - compiled, loaded - saved, size
+
+
+def main(sizes):
+    print("{:>10} {:>12} {:>12} {:>12} {:>12}".format("roads", "compile s", "save s", "load s", "kilobytes"))
+    for size in sizes:
+        compile_time, save_time, load_time, file_size = time_lane_graph(size)
+        print("{:>10} {:>12.4f} {:>12.4f} {:>12.4f} {:>12.1f}".format(size, compile_time, save_time, load_time,
+                                                                     file_size / 1024))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,82 @@
+"""
+Regression benchmark for find_overlaps. For chain shaped maps of increasing size, laid out along the x axis and
+along the y axis, it reports the time of the check and, for the smaller maps, of testing every pair of shapes. The
+sweep only tests shapes near each other in both x and y, so its time per road should stay nearly flat as the map
+grows, whichever way the map runs, while the all pairs time grows with the map. A map of 100000 roads should be
+checked in well under a second.
+
+Run from the project folder with 'python tests/xml/benchmark_validation.py [sizes...]'
+"""
+import sys
+import os
+import time
+from itertools import combinations
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.SpatialIndex import bounding_box
+from src.xml_parse.Validation import find_overlaps
+from tests.xml.benchmark_connectivity import build_chain_map
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# largest map that is also checked pair by pair
+ALL_PAIRS_LIMIT = 2000
+
+
+def build_vertical_chain_map(num_roads):
+    """
+    Builds the map of build_chain_map laid out along the y axis, where every shape shares its x range with all others
+    :param num_roads: number of roads in the chain
+    :return: tuple of the list of roads and the list of intersections
+    """
+    intersections = [Intersection(Coordinates(0, index * 40), 10, 25) for index in range(num_roads + 1)]
+    roads = []
+    for index in range(num_roads):
+        road = Road(Coordinates(0, index * 40 + 10), Coordinates(0, index * 40 + 30), 20, 1, 1, 0, 25, str(index))
+        road.add_start_connection(intersections[index])
+        road.add_end_connection(intersections[index + 1])
+        intersections[index].add_outgoing_connection(road)
+        intersections[index + 1].add_incoming_connection(road)
+        roads.append(road)
+    return roads, intersections
+
+
+def all_pairs_candidates(roads, intersections):
+    """
+    Counts the pairs with overlapping bounding boxes by comparing every pair, the work the sweep avoids
+    :return: number of candidate pairs
+    """
+    bounds = [bounding_box(map_object) for map_object in roads + intersections]
+    count = 0
+    for first, second in combinations(bounds, 2):
+        if not (first[0] > second[2] or second[0] > first[2] or first[1] > second[3] or second[1] > first[3]):
+            count += 1
+    return count
+
+
+def main(sizes):
+    print("{:>10} {:>10} {:>12} {:>14} {:>16}".format("roads", "layout", "sweep s", "us per road", "all pairs s"))
+    for size in sizes:
+        for layout, build in [("x axis", build_chain_map), ("y axis", build_vertical_chain_map)]:
+            roads, intersections = build(size)
+            start = time.perf_counter()
+            overlaps = find_overlaps(roads, intersections)
+            elapsed = time.perf_counter() - start
+            assert overlaps == []
+
+            all_pairs = ""
+            if size <= ALL_PAIRS_LIMIT:
+                start = time.perf_counter()
+                all_pairs_candidates(roads, intersections)
+                all_pairs = "{:.3f}".format(time.perf_counter() - start)
+
+            print("{:>10} {:>10} {:>12.3f} {:>14.3f} {:>16}".format(size, layout, elapsed, elapsed / size * 1e6,
+                                                                    all_pairs))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,107 @@
+import pytest
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.MapModel import MapModel, NO_CONNECTION
+import src.xml_parse.Exceptions as EX
+from src.xml_parse.Export import export_xml
+from src.xml_parse.Binary import export_binary, load_binary
+from tests.xml.test_import import build_map, assert_same_map
+
+
+def test_binary_records():
+    roads, intersections = build_map()
+    save_location = "{}/map.bin".format(os.path.dirname(__file__))
+    export_binary(roads, intersections, save_location)
+
+    with load_binary(save_location) as binary_map:
+        assert binary_map.road_count() == 3
+        assert binary_map.intersection_count() == 3
+
+        road = binary_map.road(2)
+        assert road.name == "dangling"
+        assert road.start_intersection == 2
+        assert road.end_intersection == NO_CONNECTION
+        assert road.in_lanes == 1
+        assert math.isclose(road.end_x, roads[2].get_end_coords().get_x())
+
+        intersection = binary_map.intersection(1)
+        assert intersection.connections == [0, 1]
+        assert intersection.yellow_light == 3000
+        assert intersection.cycles[0].name == "cycle"
+        assert intersection.cycles[0].roads == [0, 1]
+        assert intersection.profiles == [0, 1]
+        assert binary_map.intersection(0).profiles == [0]
+        assert binary_map.intersection(2).cycles == []
+
+        name, driver_id, vehicle_id = binary_map.profile(1)
+        assert name == "b"
+        assert binary_map.vehicle(vehicle_id)[1:3] == (4, 6)
+        assert driver_id == 0
+
+        assert [record.name for record in binary_map.iter_roads()] == ["road", "road", "dangling"]
+        with pytest.raises(IndexError):
+            binary_map.road(3)
+
+    os.remove(save_location)
+
+
+def test_binary_to_model():
+    roads, intersections = build_map()
+    save_location = "{}/map.bin".format(os.path.dirname(__file__))
+    made = "{}/made.xml".format(os.path.dirname(__file__))
+    loaded = "{}/loaded.xml".format(os.path.dirname(__file__))
+    export_binary(roads, intersections, save_location)
+
+    model = MapModel()
+    model.driver_profiles.append('driver')
+    model.add_intersection(Intersection(Coordinates(0, 0), 10, 10))
+    with load_binary(save_location) as binary_map:
+        assert binary_map.to_model(model) is model
+
+    assert_same_map(roads, intersections, model)
+    assert model.driver_profiles[1:] == [model.get_intersections()[0].get_spawning_profile_list()[0].driver_profile]
+    assert len(model.vehicle_profiles) == 2
+    assert [road.get_name() for road in model.get_roads()] == ["road", "road", "dangling"]
+
+    export_xml(roads, intersections, made)
+    export_xml(model.get_roads(), model.get_intersections(), loaded)
+    with open(made, 'rb') as made_file, open(loaded, 'rb') as loaded_file:
+        assert made_file.read() == loaded_file.read()
+
+    # empty maps are valid too
+    export_binary([], [], save_location)
+    with load_binary(save_location) as binary_map:
+        assert binary_map.to_model().road_count() == 0
+
+    os.remove(save_location)
+    os.remove(made)
+    os.remove(loaded)
+
+
+def test_binary_errors():
+    save_location = "{}/map.bin".format(os.path.dirname(__file__))
+    roads, intersections = build_map()
+    export_binary(roads, intersections, save_location)
+    with open(save_location, 'rb') as binary_file:
+        data = binary_file.read()
+
+    documents = [
+        (b'TSMB', 'too short'),
+        (b'XXXX' + data[4:], 'not a binary map'),
+        (data[:4] + b'\x07' + data[5:], 'Unsupported binary map version 7'),
+        (data[:-1], 'truncated'),
+    ]
+    for document, message in documents:
+        with open(save_location, 'wb') as binary_file:
+            binary_file.write(document)
+        with pytest.raises(EX.BinaryFormatError) as context:
+            load_binary(save_location)
+        assert context.match(message)
+
+    os.remove(save_location)
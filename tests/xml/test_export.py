@@ -11,7 +11,9 @@ from src.map.Intersection import Intersection
 import src.xml_parse.Exceptions as EX
 import filecmp
 from src.xml_parse.Export import *
+import src.xml_parse.Export as export_module
 from src.xml_parse.Utils import *
+from src.xml_parse.Constants import EXPORT_TEMP_SUFFIX
 
 
 def test_convert_road_to_simulation_size():
@@ -76,7 +78,7 @@ def test_make_xml():
     intersections.append(intersection)
     with pytest.raises(EX.XMLFormatError) as context:
         export_xml(roads, intersections, "{}/temp.xml".format(os.path.dirname(__file__)))
-    assert context.match('Map is not connected')
+    assert context.match('Map is not connected: 2 separate parts, apart from the largest at \\(30, 50\\) to \\(70, 90\\)')
 
     assert not os.path.isfile("{}/temp.xml".format(os.path.dirname(__file__)))
 
@@ -107,4 +109,277 @@ def test_utils():
     temp = remove_visited_roads(roads, visited)
     assert len(temp) == 1
 
-    check_overload_intersection([])
+    assert check_overload_intersection(Intersection(Coordinates(0, 0), 20, 30)) == []
+
+
+def test_check_overload_intersection():
+    """
+    Tests that roads are reported when they overlap on an intersection circle, including across angle 0, and that an
+    export of such a map is refused
+    :return: Tests pass if exactly the overlapping pairs are reported
+    """
+    intersection = Intersection(Coordinates(0, 0), 40, 30)
+    north = intersection.add_connection(0, 50, 1, 1, 30, "north")
+    east = intersection.add_connection(math.pi / 2, 50, 2, 2, 30, "east")
+    south = Road(Coordinates(0, -100), Coordinates(0, -40), 60, 1, 1, 0, 30, "south")
+    south.add_end_connection(intersection)
+    intersection.add_incoming_connection(south)
+    assert check_overload_intersection(intersection) == []
+    assert valid_intersections([intersection])
+
+    # the arcs of touching roads share only their end
+    touching = intersection.add_connection(math.pi / 2 + math.asin(20 / 40) + math.asin(10 / 40), 50, 1, 1, 30,
+                                           "touching")
+    assert check_overload_intersection(intersection) == []
+
+    # 1 radian is within the 2 lanes of east, and the arc of north runs past 2 PI into the arc of wrapped
+    close = intersection.add_connection(1, 50, 1, 1, 30, "close")
+    wrapped = intersection.add_connection(0.3, 50, 1, 1, 30, "wrapped")
+    pairs = {frozenset((first.name, second.name)) for first, second in check_overload_intersection(intersection)}
+    assert pairs == {frozenset(("east", "close")), frozenset(("north", "wrapped"))}
+    assert not valid_intersections([intersection])
+
+    # a road starting and ending on the intersection covers two arcs half a turn apart
+    intersection.connections = [south]
+    south.add_start_connection(intersection)
+    assert check_overload_intersection(intersection) == []
+
+    loose = Intersection(Coordinates(0, 0), 40, 30)
+    loose.add_incoming_connection(north)
+    with pytest.raises(EX.XMLFormatError) as context:
+        check_overload_intersection(loose)
+    assert context.match('Intersection has a road connected but not vice versa')
+
+    roads = [north, east, close, wrapped, touching]
+    intersection.connections = list(roads)
+    for road in roads:
+        road.add_start_connection(intersection)
+    with pytest.raises(EX.XMLFormatError) as context:
+        export_xml(roads, [intersection], "{}/temp.xml".format(os.path.dirname(__file__)))
+    assert context.match('Roads overlap on an intersection')
+    assert not os.path.isfile("{}/temp.xml".format(os.path.dirname(__file__)))
+
+
+def test_is_connected_traffic_map():
+    assert is_connected_traffic_map([], [])
+    assert is_connected_traffic_map([], [Intersection(Coordinates(0, 0), 20, 30)])
+    assert not is_connected_traffic_map([], [Intersection(Coordinates(0, 0), 20, 30),
+                                             Intersection(Coordinates(90, 0), 20, 30)])
+
+    first = Intersection(Coordinates(0, 0), 20, 30)
+    second = Intersection(Coordinates(100, 0), 20, 30)
+    third = Intersection(Coordinates(200, 0), 20, 30)
+    first_road = first.add_connection(math.pi / 2, 60, 1, 1, 30, "first")
+    first_road.add_end_connection(second)
+    second.add_incoming_connection(first_road)
+    second_road = second.add_connection(math.pi / 2, 60, 1, 1, 30, "second")
+    second_road.add_end_connection(third)
+    third.add_incoming_connection(second_road)
+
+    assert is_connected_traffic_map([first_road, second_road], [first, second, third])
+    assert is_connected_traffic_map([second_road, first_road], [third, first, second])
+
+    dangling = third.add_connection(0, 60, 1, 1, 30, "dangling")
+    assert is_connected_traffic_map([first_road, second_road, dangling], [first, second, third])
+
+    island = Intersection(Coordinates(500, 500), 20, 30)
+    island_road = island.add_connection(0, 60, 1, 1, 30, "island")
+    assert not is_connected_traffic_map([first_road, second_road, dangling, island_road],
+                                        [first, second, third, island])
+
+
+def test_find_components():
+    """
+    Tests that a map is split into its connected parts with their bounding boxes, and that roads missing an
+    intersection at either end are reported
+    :return: Tests pass if every road and intersection is in the part it can reach
+    """
+    assert find_components([], []) == ([], [])
+
+    first = Intersection(Coordinates(0, 0), 20, 30)
+    second = Intersection(Coordinates(100, 0), 20, 30)
+    first_road = first.add_connection(math.pi / 2, 60, 1, 1, 30, "first")
+    first_road.add_end_connection(second)
+    second.add_incoming_connection(first_road)
+    dangling = second.add_connection(0, 60, 1, 1, 30, "dangling")
+    island = Intersection(Coordinates(500, 500), 20, 30)
+    island_road = island.add_connection(0, 60, 1, 1, 30, "island")
+    lone = Intersection(Coordinates(-300, 0), 10, 30)
+    # a road whose intersection was left out of the map
+    outside = Intersection(Coordinates(900, 900), 10, 30)
+    stray = outside.add_connection(0, 60, 1, 1, 30, "stray")
+
+    components, dangling_roads = find_components([island_road, first_road, dangling, stray],
+                                                 [first, second, island, lone])
+    assert [(component.roads, component.intersections) for component in components] == [
+        ([island_road], [island]), ([first_road, dangling], [second, first]), ([stray], []), ([], [lone])]
+    assert dangling_roads == [island_road, dangling, stray]
+
+    assert components[1].bounds == (-20, -20, 120, 80)
+    assert components[3].bounds == (-310, -10, -290, 10)
+    assert len(components[1]) == 4
+
+
+class NoIndexList(list):
+    """
+    List that refuses linear index lookups, used to make sure the export never scans the intersection list
+    """
+    def index(self, *args):
+        raise AssertionError('linear intersection lookup')
+
+
+def test_make_xml_intersection_ids():
+    intersections = NoIndexList(Intersection(Coordinates(100 * i, 0), 20, 30) for i in range(3))
+    roads = []
+    for start, end in [(0, 1), (1, 2)]:
+        road = intersections[start].add_connection(math.pi / 2, 60, 1, 1, 30, "road")
+        road.add_end_connection(intersections[end])
+        intersections[end].add_incoming_connection(road)
+        roads.append(road)
+
+    assert get_intersection_ids(intersections) == {intersection: index for index, intersection in
+                                                   enumerate(intersections)}
+
+    save_location = "{}/temp.xml".format(os.path.dirname(__file__))
+    make_xml(roads, intersections, save_location)
+    tree = ET.parse(save_location)
+    os.remove(save_location)
+
+    assert [road.find('start_intersection').text for road in tree.getroot().iter('road')] == ['0', '1']
+    assert [road.find('end_intersection').text for road in tree.getroot().iter('road')] == ['1', '2']
+
+
+def test_stream_xml(monkeypatch):
+    driver = DriverProfile("a", .1, 3, 6, 0, 200, 10, 30)
+    vehicle = VehicleProfile("a", 5, 5, 5, .1, 200, 200)
+    spawning = SpawningProfile("a", driver, vehicle)
+
+    intersections = [Intersection(Coordinates(150 * i, 10 * i), 20 + i, 30) for i in range(4)]
+    roads = []
+    for start, end in [(0, 1), (1, 2), (2, 3)]:
+        road = intersections[start].add_connection(math.pi / 2, 110, 1, 2, 30, "road")
+        road.add_end_connection(intersections[end])
+        intersections[end].add_incoming_connection(road)
+        roads.append(road)
+    roads.append(intersections[3].add_connection(0, 50, 1, 1, 30, "dangling"))
+    intersections[0].add_spawning_profile(spawning)
+    intersections[2].add_spawning_profile(spawning)
+    intersections[2].add_cycle("cycle", [0, 1], 2000)
+
+    made = "{}/made.xml".format(os.path.dirname(__file__))
+    streamed = "{}/streamed.xml".format(os.path.dirname(__file__))
+
+    for map_roads, map_intersections in [(roads, intersections), ([], [])]:
+        make_xml(map_roads, map_intersections, made)
+        stream_xml(map_roads, map_intersections, streamed)
+        with open(made, 'rb') as made_file, open(streamed, 'rb') as streamed_file:
+            assert made_file.read() == streamed_file.read()
+
+    # the map has 8 elements, so small chunks are flushed several times, with and without a partial last chunk
+    for chunk_size in [1, 2, 3, 8]:
+        monkeypatch.setattr(export_module, 'XML_CHUNK_SIZE', chunk_size)
+        for inline_profiles in [True, False]:
+            make_xml(roads, intersections, made, inline_profiles=inline_profiles)
+            stream_xml(roads, intersections, streamed, inline_profiles=inline_profiles)
+            with open(made, 'rb') as made_file, open(streamed, 'rb') as streamed_file:
+                assert made_file.read() == streamed_file.read()
+    monkeypatch.undo()
+
+    export_xml(roads, intersections, streamed, streaming=True)
+    export_xml(roads, intersections, made, streaming=False)
+    assert filecmp.cmp(made, streamed, shallow=False)
+
+    os.remove(made)
+    os.remove(streamed)
+
+
+def test_shared_profile_table():
+    driver = DriverProfile("a", .1, 3, 6, 0, 200, 10, 30)
+    vehicle = VehicleProfile("a", 5, 5, 5, .1, 200, 200)
+    spawning = SpawningProfile("a", driver, vehicle)
+    same_values = SpawningProfile("b", DriverProfile("b", .1, 3, 6, 0, 200, 10, 30), vehicle)
+    other = SpawningProfile("c", driver, VehicleProfile("c", 4, 5, 5, .1, 200, 200))
+
+    intersections = [Intersection(Coordinates(150 * i, 0), 20, 30) for i in range(3)]
+    roads = []
+    for start, end in [(0, 1), (1, 2)]:
+        road = intersections[start].add_connection(math.pi / 2, 110, 1, 2, 30, "road")
+        road.add_end_connection(intersections[end])
+        intersections[end].add_incoming_connection(road)
+        roads.append(road)
+    intersections[0].add_spawning_profile(spawning)
+    intersections[1].add_spawning_profile(same_values)
+    intersections[1].add_spawning_profile(other)
+    intersections[2].add_spawning_profile(spawning)
+
+    inline = "{}/inline.xml".format(os.path.dirname(__file__))
+    shared = "{}/shared.xml".format(os.path.dirname(__file__))
+    made = "{}/made.xml".format(os.path.dirname(__file__))
+
+    # the default stays the inline format
+    export_xml(roads, intersections, inline)
+    make_xml(roads, intersections, made, inline_profiles=True)
+    assert filecmp.cmp(inline, made, shallow=False)
+    assert ET.parse(inline).getroot().find("profiles") is None
+
+    export_xml(roads, intersections, shared, inline_profiles=False)
+    make_xml(roads, intersections, made, inline_profiles=False)
+    assert filecmp.cmp(shared, made, shallow=False)
+
+    root = ET.parse(shared).getroot()
+    table = root.find("profiles")
+    assert root[0] is table
+    assert [profile.get("id") for profile in table] == ["0", "1"]
+    assert table[1].find("vehicle/width").text == "4"
+
+    inline_profiles = ET.parse(inline).getroot().findall("intersection/spawning_profiles/profile")
+    assert ET.tostring(table[0][0]) == ET.tostring(inline_profiles[0][0])
+
+    references = [[profile_id.text for profile_id in element.findall("spawning_profiles/profile_id")]
+                  for element in root.findall("intersection")]
+    assert references == [["0"], ["0", "1"], ["0"]]
+    assert root.find("intersection/spawning_profiles/profile") is None
+    assert root.find("intersection/frequency") is not None
+
+    os.remove(inline)
+    os.remove(shared)
+    os.remove(made)
+
+
+def test_export_progress():
+    """
+    Tests that an export reports every stage in order and that cancelling it from the progress callback leaves the
+    existing file untouched
+    :return: Tests pass if the stages are reported and a cancelled export writes nothing
+    """
+    roads = []
+    intersections = []
+    intersection = Intersection(Coordinates(50, 70), 20, 40)
+    road = Road(Coordinates(90, 70), Coordinates(70, 70), 20, 1, 1, math.pi, 60, "road")
+    intersection.add_incoming_connection(road)
+    road.add_end_connection(intersection)
+    roads.append(road)
+    intersections.append(intersection)
+    location = "{}/temp.xml".format(os.path.dirname(__file__))
+
+    reports = []
+    export_xml(roads, intersections, location, progress=lambda *report: reports.append(report))
+    assert reports == [('validation', 0, 3), ('validation', 1, 3), ('validation', 2, 3), ('validation', 3, 3),
+                       ('roads', 0, 1), ('roads', 1, 1), ('intersections', 0, 1), ('intersections', 1, 1),
+                       ('write', 0, 1), ('write', 1, 1)]
+    with open(location, 'rb') as xml_file:
+        contents = xml_file.read()
+
+    def cancel(stage, done, total):
+        if stage == 'intersections':
+            raise EX.ExportCancelled()
+
+    road.speed_limit = 30
+    for streaming in (True, False):
+        with pytest.raises(EX.ExportCancelled):
+            export_xml(roads, intersections, location, streaming=streaming, progress=cancel)
+        with open(location, 'rb') as xml_file:
+            assert xml_file.read() == contents
+        assert not os.path.isfile(location + EXPORT_TEMP_SUFFIX)
+
+    os.remove(location)
@@ -0,0 +1,177 @@
+import pytest
+import sys
+import os
+import math
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.DriverProfile import DriverProfile
+from src.map.SpawningProfile import SpawningProfile
+from src.map.VehicleProfile import VehicleProfile
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.MapModel import MapModel
+import src.xml_parse.Exceptions as EX
+from src.xml_parse.Export import export_xml
+from src.xml_parse.Import import import_xml
+
+
+def build_map():
+    """
+    Builds a chain of three intersections with a dangling road, spawning profiles and a traffic cycle
+    :return: tuple of the list of roads and the list of intersections
+    """
+    driver = DriverProfile("a", .1, 3, 6, 0, 200, 10, 30)
+    vehicle = VehicleProfile("a", 5, 5, 5, .1, 200, 200)
+    spawning = SpawningProfile("a", driver, vehicle)
+    other = SpawningProfile("b", driver, VehicleProfile("b", 4, 6, 5, .1, 200, 200))
+
+    intersections = [Intersection(Coordinates(150 * i, 10 * i), 20 + i, 30) for i in range(3)]
+    roads = []
+    for start, end in [(0, 1), (1, 2)]:
+        road = intersections[start].add_connection(math.pi / 2, 110, 1, 2, 30, "road")
+        road.add_end_connection(intersections[end])
+        intersections[end].add_incoming_connection(road)
+        roads.append(road)
+    roads.append(intersections[2].add_connection(0, 50, 1, 1, 30, "dangling"))
+    intersections[0].add_spawning_profile(spawning)
+    intersections[1].add_spawning_profile(spawning)
+    intersections[1].add_spawning_profile(other)
+    intersections[1].add_cycle("cycle", [0, 1], 2000)
+    intersections[1].set_yellow_length(3000)
+    return roads, intersections
+
+
+def assert_same_map(roads, intersections, model):
+    """
+    Checks that an imported model matches the map it was exported from
+    """
+    imported_roads = model.get_roads()
+    imported_intersections = model.get_intersections()
+    assert len(imported_roads) == len(roads)
+    assert len(imported_intersections) == len(intersections)
+
+    for road, imported in zip(roads, imported_roads):
+        assert math.isclose(imported.get_length(), road.get_length())
+        assert math.isclose(imported.get_start_coords().get_x(), road.get_start_coords().get_x(), abs_tol=1e-9)
+        assert math.isclose(imported.get_start_coords().get_y(), road.get_start_coords().get_y(), abs_tol=1e-9)
+        assert math.isclose(imported.get_end_coords().get_x(), road.get_end_coords().get_x(), abs_tol=1e-9)
+        assert math.isclose(imported.get_end_coords().get_y(), road.get_end_coords().get_y(), abs_tol=1e-9)
+        assert math.isclose(math.sin(imported.get_angle()), math.sin(road.get_angle()), abs_tol=1e-9)
+        assert math.isclose(math.cos(imported.get_angle()), math.cos(road.get_angle()), abs_tol=1e-9)
+        assert imported.get_in_lanes() == road.get_in_lanes()
+        assert imported.get_out_lanes() == road.get_out_lanes()
+        for connection, imported_connection in [(road.get_start_connection(), imported.get_start_connection()),
+                                                (road.get_end_connection(), imported.get_end_connection())]:
+            if connection is None:
+                assert imported_connection is None
+            else:
+                assert intersections.index(connection) == imported_intersections.index(imported_connection)
+
+    for intersection, imported in zip(intersections, imported_intersections):
+        assert imported.get_center().get_x() == intersection.get_center().get_x()
+        assert imported.get_center().get_y() == intersection.get_center().get_y()
+        assert imported.get_radius() == intersection.get_radius()
+        assert [roads.index(road) for road in intersection.get_connections()] == \
+            [imported_roads.index(road) for road in imported.get_connections()]
+        assert imported.green_cycle_roads == intersection.green_cycle_roads
+        assert imported.green_cycle_times == intersection.green_cycle_times
+        assert imported.yellow_light_length == intersection.yellow_light_length
+        assert len(imported.get_spawning_profile_list()) == len(intersection.get_spawning_profile_list())
+        for profile, imported_profile in zip(intersection.get_spawning_profile_list(),
+                                             imported.get_spawning_profile_list()):
+            assert imported_profile.vehicle_profile.width == profile.vehicle_profile.width
+            assert imported_profile.driver_profile.over_braking_factor == profile.driver_profile.over_braking_factor
+
+
+def test_import_xml():
+    roads, intersections = build_map()
+    save_location = "{}/import.xml".format(os.path.dirname(__file__))
+
+    for inline_profiles in (True, False):
+        export_xml(roads, intersections, save_location, inline_profiles=inline_profiles)
+        model = import_xml(save_location)
+        assert_same_map(roads, intersections, model)
+
+        # identical profiles are only created once
+        imported = model.get_intersections()
+        assert imported[0].get_spawning_profile_list()[0] is imported[1].get_spawning_profile_list()[0]
+        assert len(model.spawning_profiles) == 2
+        assert len(model.driver_profiles) == 2
+
+        # the imported map exports to the same file again
+        with open(save_location, 'rb') as xml_file:
+            exported = xml_file.read()
+        export_xml(model.get_roads(), model.get_intersections(), save_location, inline_profiles=inline_profiles)
+        with open(save_location, 'rb') as xml_file:
+            assert xml_file.read() == exported
+
+    os.remove(save_location)
+
+
+def test_import_into_model():
+    roads, intersections = build_map()
+    save_location = "{}/import.xml".format(os.path.dirname(__file__))
+    export_xml(roads, intersections, save_location)
+
+    model = MapModel()
+    model.driver_profiles.append('driver')
+    model.add_intersection(Intersection(Coordinates(0, 0), 10, 10))
+
+    assert import_xml(save_location, model) is model
+    assert model.intersection_count() == 3
+    assert model.road_count() == 3
+    assert model.driver_profiles[0] == 'driver'
+    assert model.road_columns.end_intersection.tolist() == [1, 2, -1]
+
+    with open(save_location, 'w') as xml_file:
+        xml_file.write('<map><road name="0"><length>1</length></road>')
+    with pytest.raises(EX.XMLFormatError):
+        import_xml(save_location, model)
+    # a failed import leaves the model alone
+    assert model.road_count() == 3
+
+    os.remove(save_location)
+
+
+def test_import_errors():
+    save_location = "{}/import.xml".format(os.path.dirname(__file__))
+    road = '<road name="0"><length>10</length><incoming_lanes>1</incoming_lanes>' \
+           '<outgoing_lanes>1</outgoing_lanes><angle_radians>0</angle_radians><anchor_point>0 0</anchor_point>' \
+           '<speed_limit>30</speed_limit>{}</road>'
+    documents = [
+        ('<map>' + road.format('') + '</map>', None),
+        ('<map>' + road.format('<end_intersection>4</end_intersection>') + '</map>', 'unknown intersection 4'),
+        ('<map><road name="0"><length>10</length></road></map>', 'missing its incoming_lanes'),
+        ('<map><intersection name="0"><center_point>0</center_point><radius>2</radius></intersection></map>',
+         'not a coordinate pair'),
+        ('<map><intersection name="0"><center_point>0 0</center_point><radius>two</radius></intersection></map>',
+         'not a number'),
+        ('<map><intersection name="0"><center_point>0 0</center_point><radius>2</radius><spawning_profiles>'
+         '<profile_id>3</profile_id></spawning_profiles></intersection></map>', 'unknown profile 3'),
+        ('<map><intersection name="0"><center_point>0 0</center_point><radius>2</radius><traffic_cycle>'
+         '<yellow_light>3000</yellow_light><cycle><roads>0 a</roads><timing>2000</timing></cycle></traffic_cycle>'
+         '</intersection></map>', 'a is not a road index'),
+        ('<map><intersection name="0"><center_point>0 0</center_point><radius>0</radius></intersection></map>',
+         'radius 0, it must be positive'),
+        ('<map>' + road.format('<end_intersection>0</end_intersection>') + '<intersection name="0">'
+         '<center_point>0 0</center_point><radius>5</radius></intersection></map>', 'too wide'),
+        ('<map>' + road.format('<end_intersection>0</end_intersection>') + '<intersection name="0">'
+         '<center_point>0 0</center_point><radius>20</radius><traffic_cycle><yellow_light>3000</yellow_light><cycle>'
+         '<roads>0 1</roads><timing>2000</timing></cycle></traffic_cycle></intersection></map>',
+         'refers to road index 1, it has 1 roads'),
+        ('<roads />', 'expected map'),
+        ('<map><road>', 'Malformed xml'),
+    ]
+
+    for document, message in documents:
+        with open(save_location, 'w') as xml_file:
+            xml_file.write(document)
+        if message is None:
+            assert import_xml(save_location).road_count() == 1
+        else:
+            with pytest.raises(EX.XMLFormatError) as context:
+                import_xml(save_location)
+            assert context.match(message)
+
+    os.remove(save_location)
@@ -0,0 +1,176 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.MapModel import MapModel
+from src.map.History import History, AddRoad, AddIntersection, EditObject, AddCycle, AttachProfile
+import src.xml_parse.Exceptions as EX
+from src.xml_parse.Export import export_xml
+from src.xml_parse.Journal import Journal, SNAPSHOT_SUFFIX, SET_ASIDE_SUFFIX
+from tests.xml.test_import import build_map
+
+
+def build_model():
+    """
+    Builds a model holding the map of build_map and its profiles
+    :return: the model
+    """
+    roads, intersections = build_map()
+    model = MapModel()
+    for profile in intersections[1].get_spawning_profile_list():
+        if profile.driver_profile not in model.driver_profiles:
+            model.driver_profiles.append(profile.driver_profile)
+        model.vehicle_profiles.append(profile.vehicle_profile)
+        model.spawning_profiles.append(profile)
+    model.add_intersections(intersections)
+    model.add_roads(roads)
+    return model
+
+
+def exported(model):
+    """
+    :return: contents of the xml file exported from a model
+    """
+    location = "{}/journal.xml".format(os.path.dirname(__file__))
+    export_xml(model.get_roads(), model.get_intersections(), location)
+    with open(location, 'rb') as xml_file:
+        contents = xml_file.read()
+    os.remove(location)
+    return contents
+
+
+def remove_journal(location):
+    for path in (location, location + SNAPSHOT_SUFFIX):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def test_journal_replay():
+    """
+    Tests that a map edited while a journal is recording is rebuilt by replaying the journal, as after a crash
+    :return: Tests pass if the replayed map exports to the same file as the edited one
+    """
+    location = "{}/map.journal".format(os.path.dirname(__file__))
+    remove_journal(location)
+    model = build_model()
+    assert not Journal(location).replay(MapModel())
+
+    journal = Journal(location)
+    journal.start(model)
+    history = History(model)
+    first, second, third = model.get_intersections()
+
+    history.execute(AddCycle(third, "new cycle", [0, 1], 8000))
+    road = third.add_connection(2.0, 80, 2, 1, 40, "new")
+    history.execute(AddRoad(road))
+    history.execute(AddIntersection(road.generate_end_connection(25, 30)))
+    history.execute(EditObject(road, {'out_lanes': 2}))
+    history.execute(EditObject(first, {'radius': 35, 'yellow_light_length': 2500}))
+    history.execute(AttachProfile(first, model.spawning_profiles[1]))
+    history.undo()
+    model.remove_road(model.road_id(model.get_roads()[2]))
+    model.vehicle_profiles[0].width = 7
+    journal.record_profiles()
+    journal.flush()
+
+    # replay without stopping the journal, like after a crash
+    replayed = MapModel()
+    assert Journal(location).replay(replayed)
+    assert exported(replayed) == exported(model)
+    assert replayed.vehicle_profiles[0].width == 7
+    assert [profile.profile_name for profile in replayed.spawning_profiles] == ["a", "b"]
+
+    model.clear(keep_profiles=True)
+    model.add_intersection(Intersection(Coordinates(5, 5), 10, 25))
+    journal.stop()
+    replayed = MapModel()
+    Journal(location).replay(replayed)
+    assert exported(replayed) == exported(model)
+    assert replayed.intersection_count() == 1
+
+    remove_journal(location)
+
+
+def test_journal_compaction():
+    """
+    Tests that the journal is folded into a snapshot once it grows, and that replay restarts from the snapshot
+    :return: Tests pass if the journal stays short and replay gives the same map
+    """
+    location = "{}/map.journal".format(os.path.dirname(__file__))
+    remove_journal(location)
+    model = build_model()
+    journal = Journal(location, compact_records=10)
+    journal.start(model)
+
+    road = model.get_roads()[0]
+    for lanes in range(100):
+        road.in_lanes = lanes % 2 + 1
+        model.update(road)
+    journal.flush()
+
+    with open(location) as journal_file:
+        assert len(journal_file.readlines()) < 20
+    replayed = MapModel()
+    Journal(location).replay(replayed)
+    assert exported(replayed) == exported(model)
+
+    journal.compact()
+    journal.stop()
+    assert os.path.getsize(location) == 0
+    replayed = MapModel()
+    Journal(location).replay(replayed)
+    assert exported(replayed) == exported(model)
+
+    remove_journal(location)
+
+
+def test_journal_errors():
+    """
+    Tests that a torn last record is skipped, that damaged records are reported and that the damaged files can be
+    moved aside
+    :return: Tests pass if only the torn record is skipped and nothing is left to replay once the files are set aside
+    """
+    location = "{}/map.journal".format(os.path.dirname(__file__))
+    remove_journal(location)
+    model = build_model()
+    journal = Journal(location)
+    journal.start(model)
+    model.update(model.get_roads()[0])
+    journal.stop()
+
+    with open(location, 'a') as journal_file:
+        journal_file.write('["road",0,1.5')
+    replayed = MapModel()
+    assert Journal(location).replay(replayed)
+    assert exported(replayed) == exported(model)
+
+    with open(location, 'a') as journal_file:
+        journal_file.write('\n["unknown"]\n')
+    with pytest.raises(EX.JournalFormatError) as context:
+        Journal(location).replay(MapModel())
+    assert context.match('Malformed journal record on line')
+
+    with open(location, 'w') as journal_file:
+        journal_file.write('["unknown"]\n')
+    with pytest.raises(EX.JournalFormatError) as context:
+        Journal(location).replay(MapModel())
+    assert context.match('Unknown journal record unknown')
+
+    # well formed json that does not hold the fields of a road
+    for record in ['["road"]', '["road", 0, 1]', '["intersection", 0, 1, 2, 3, 4, 5, 6, 7, 8]']:
+        with open(location, 'w') as journal_file:
+            journal_file.write(record + '\n')
+        with pytest.raises(EX.JournalFormatError) as context:
+            Journal(location).replay(MapModel())
+        assert context.match('do not describe a map')
+
+    journal = Journal(location)
+    moved = [location + SNAPSHOT_SUFFIX + SET_ASIDE_SUFFIX, location + SET_ASIDE_SUFFIX]
+    assert journal.set_aside() == moved
+    assert not journal.replay(MapModel())
+    for path in moved:
+        os.remove(path)
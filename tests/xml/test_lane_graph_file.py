@@ -0,0 +1,89 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.LaneGraph import compile_lane_graph, LANE_GRAPH_ARRAYS
+import src.xml_parse.Exceptions as EX
+from src.xml_parse.Export import export_xml, make_xml
+from src.xml_parse.LaneGraphFile import export_lane_graph, load_lane_graph, lane_graph_location, xml_fingerprint
+from src.xml_parse.Constants import EXPORT_TEMP_SUFFIX
+from tests.xml.test_import import build_map
+
+
+def test_lane_graph_round_trip():
+    """
+    Tests that a lane graph is loaded from its file exactly as it was compiled, and that broken files are refused
+    :return: Tests pass if every array survives the round trip
+    """
+    roads, intersections = build_map()
+    graph = compile_lane_graph(roads, intersections)
+    xml_location = "{}/temp.xml".format(os.path.dirname(__file__))
+    location = lane_graph_location(xml_location)
+    make_xml(roads, intersections, xml_location)
+    export_lane_graph(graph, location, xml_fingerprint(xml_location))
+    try:
+        loaded = load_lane_graph(location, xml_location)
+        for name, _ in LANE_GRAPH_ARRAYS:
+            assert getattr(loaded, name) == getattr(graph, name)
+        assert list(loaded.successors(4)) == [6]
+
+        with open(location, 'rb') as lanes_file:
+            data = lanes_file.read()
+        with open(location, 'wb') as lanes_file:
+            lanes_file.write(data[:-1])
+        with pytest.raises(EX.BinaryFormatError) as context:
+            load_lane_graph(location, xml_location)
+        assert context.match('truncated')
+
+        with open(location, 'wb') as lanes_file:
+            lanes_file.write(b'XXXX' + data[4:])
+        with pytest.raises(EX.BinaryFormatError) as context:
+            load_lane_graph(location, xml_location)
+        assert context.match('not a lane graph')
+
+        # the xml is replaced by another map while the lane graph stays
+        with open(location, 'wb') as lanes_file:
+            lanes_file.write(data)
+        make_xml(roads[:2], intersections, xml_location)
+        with pytest.raises(EX.BinaryFormatError) as context:
+            load_lane_graph(location, xml_location)
+        assert context.match('was not compiled from')
+    finally:
+        os.remove(location)
+        os.remove(xml_location)
+
+
+def test_export_lane_graph():
+    """
+    Tests that export_xml writes the lane graph next to the xml map, removes it when exporting without one, and that
+    a cancelled export writes neither
+    :return: Tests pass if the exported lane graph matches the compiled one and no stale or temporary files are left
+    """
+    roads, intersections = build_map()
+    location = "{}/temp.xml".format(os.path.dirname(__file__))
+    lanes_location = lane_graph_location(location)
+    assert lanes_location == "{}/temp.lanes".format(os.path.dirname(__file__))
+
+    stages = []
+    export_xml(roads, intersections, location, lane_graph=True, progress=lambda stage, *_: stages.append(stage))
+    assert 'lanes' in stages
+    assert load_lane_graph(lanes_location, location).lane_targets == \
+        compile_lane_graph(roads, intersections).lane_targets
+
+    # exporting another map to the same place without a lane graph must not leave the old one next to it
+    export_xml([], [Intersection(Coordinates(0, 0), 20, 30)], location)
+    assert not os.path.isfile(lanes_location)
+    os.remove(location)
+
+    def cancel(stage, done, total):
+        if stage == 'write':
+            raise EX.ExportCancelled()
+
+    with pytest.raises(EX.ExportCancelled):
+        export_xml(roads, intersections, location, lane_graph=True, progress=cancel)
+    for leftover in (location, lanes_location, location + EXPORT_TEMP_SUFFIX, lanes_location + EXPORT_TEMP_SUFFIX):
+        assert not os.path.isfile(leftover)
@@ -0,0 +1,70 @@
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.xml_parse.Export import make_xml
+from src.xml_parse.MapReport import main, report_lines
+import src.xml_parse.MapReport as map_report
+from tests.xml.test_import import build_map
+
+
+def test_report_lines():
+    """
+    Tests the report of a map with a separate intersection and a dangling road
+    :return: Tests pass if the parts and the dangling road are listed by their ids
+    """
+    roads, intersections = build_map()
+    intersections.append(Intersection(Coordinates(0, 500), 10, 30))
+
+    lines = report_lines(roads, intersections)
+    assert lines[0] == "2 separate parts"
+    assert lines[1].startswith("part 0: 3 roads, 3 intersections, from (-20, -20) to ")
+    assert lines[2] == "  roads: 0 1 2"
+    assert lines[3] == "  intersections: 0 1 2"
+    assert lines[4] == "part 1: 0 roads, 1 intersections, from (-10, 490) to (10, 510)"
+    assert lines[5] == "  roads: "
+    assert lines[6] == "  intersections: 3"
+    assert lines[7] == "1 dangling roads"
+    assert lines[8].startswith("road 2 'dangling' has no intersection at its end, from ")
+
+
+def test_main(capsys, monkeypatch):
+    """
+    Tests the command line report of a map file, and of a file that cannot be read
+    :return: Tests pass if the report is printed and the exit status tells whether the map is connected, and every
+    failure to load the file gives status 2
+    """
+    roads, intersections = build_map()
+    location = "{}/temp.xml".format(os.path.dirname(__file__))
+    make_xml(roads, intersections, location)
+    try:
+        assert main([location]) == 0
+        assert capsys.readouterr().out.startswith("1 separate parts\n")
+
+        make_xml(roads, intersections + [Intersection(Coordinates(0, 500), 10, 30)], location)
+        assert main([location]) == 1
+        assert capsys.readouterr().out.startswith("2 separate parts\n")
+
+        with open(location, 'w') as xml_file:
+            xml_file.write('<map><road>')
+        assert main([location]) == 2
+        assert "Malformed xml" in capsys.readouterr().err
+
+        with open(location, 'w') as xml_file:
+            xml_file.write('<map><intersection name="0"><center_point>0 0</center_point><radius>0</radius>'
+                           '</intersection></map>')
+        assert main([location]) == 2
+        assert "it must be positive" in capsys.readouterr().err
+
+        def fail(load_location):
+            raise ZeroDivisionError("division by zero")
+
+        monkeypatch.setattr(map_report, 'import_xml', fail)
+        assert main([location]) == 2
+        assert capsys.readouterr().err == "{}: ZeroDivisionError: division by zero\n".format(location)
+    finally:
+        os.remove(location)
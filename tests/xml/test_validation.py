@@ -0,0 +1,125 @@
+import pytest
+import sys
+import os
+import math
+import random
+from itertools import combinations
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.map.Road import Road
+from src.map.Intersection import Intersection
+from src.map.Coordinates import Coordinates
+from src.map.SpatialIndex import bounding_box
+import src.xml_parse.Exceptions as EX
+from src.xml_parse.Export import export_xml
+from src.xml_parse.Validation import find_overlaps, polygon_shape, polygons_overlap, polygon_circle_overlap, \
+    circles_overlap, shares_intersection, candidate_pairs
+from tests.xml.test_import import build_map
+
+
+def straight_road(start_x, start_y, angle, length, name):
+    """
+    :return: a road with one lane each way, starting at the given point and running along angle like Road.angle
+    """
+    end = Coordinates(start_x + length * math.sin(angle), start_y + length * math.cos(angle))
+    return Road(Coordinates(start_x, start_y), end, length, 1, 1, angle, 30, name)
+
+
+def names(pairs):
+    return [(first.name, second.name) for first, second in pairs]
+
+
+def test_find_overlaps():
+    """
+    Tests that crossing roads, roads running through intersections and overlapping intersections are reported, while
+    roads meeting at their intersections and touching shapes are not
+    :return: Tests pass if exactly the conflicting pairs are reported
+    """
+    roads, intersections = build_map()
+    assert find_overlaps(roads, intersections) == []
+    assert find_overlaps([], []) == []
+
+    horizontal = straight_road(0, 1000, math.pi / 2, 200, "horizontal")
+    vertical = straight_road(100, 900, 0, 200, "vertical")
+    # one lane is 10 wide, so this road touches the lower edge of horizontal without overlapping it
+    touching = straight_road(0, 1020, math.pi / 2, 50, "touching")
+    crossed = Intersection(Coordinates(150, 1000), 15, 30)
+    crossed.name = "crossed"
+    first = Intersection(Coordinates(500, 500), 30, 30)
+    first.name = "first"
+    second = Intersection(Coordinates(550, 500), 30, 30)
+    second.name = "second"
+    # exactly touching circles
+    third = Intersection(Coordinates(610, 500), 30, 30)
+    third.name = "third"
+
+    pairs = find_overlaps([horizontal, vertical, touching], [crossed, first, second, third])
+    assert names(pairs) == [("horizontal", "vertical"), ("horizontal", "crossed"), ("first", "second")]
+
+    # a road is not compared with its own intersections or with roads sharing them
+    horizontal.add_end_connection(crossed)
+    vertical.add_start_connection(crossed)
+    assert shares_intersection(horizontal, vertical)
+    assert not shares_intersection(horizontal, touching)
+    assert names(find_overlaps([horizontal, vertical], [crossed])) == []
+
+
+def test_find_overlaps_matches_all_pairs():
+    """
+    Tests the sweep against comparing every pair of a random map, with shapes of very different sizes so that long
+    shapes cover many rows and stay in them while many short ones pass
+    :return: Tests pass if both report the same pairs, and the sweep reports every overlapping pair of boxes once
+    """
+    random.seed(7)
+    roads = [straight_road(random.uniform(0, 2000), random.uniform(0, 2000), random.uniform(0, 2 * math.pi),
+                           random.choice([5, 40, 600]), str(index)) for index in range(150)]
+    intersections = [Intersection(Coordinates(random.uniform(0, 2000), random.uniform(0, 2000)),
+                                  random.choice([5, 20, 200]), 30) for _ in range(50)]
+
+    expected = []
+    for first, second in combinations(roads + intersections, 2):
+        if isinstance(first, Road) and isinstance(second, Road):
+            overlapping = polygons_overlap(polygon_shape(first), polygon_shape(second))
+        elif isinstance(first, Road):
+            overlapping = polygon_circle_overlap(polygon_shape(first), (second.center.x, second.center.y,
+                                                                        second.radius))
+        else:
+            overlapping = circles_overlap((first.center.x, first.center.y, first.radius),
+                                          (second.center.x, second.center.y, second.radius))
+        if overlapping:
+            expected.append((first, second))
+
+    assert len(expected) > 50
+    assert find_overlaps(roads, intersections) == expected
+
+    # boxes on both sides of the origin, including points and boxes that only touch
+    bounds = [bounding_box(map_object) for map_object in roads + intersections]
+    bounds += [(-1500, -5, -1000, 5), (-1000, 5, -1000, 5), (-3, -3, -1, -1), (-1, -1, 4, 4)]
+    pairs = candidate_pairs(bounds)
+    assert len(pairs) == len(set(pairs))
+    assert sorted(pairs) == [(first, second) for first, second in combinations(range(len(bounds)), 2)
+                             if bounds[first][0] <= bounds[second][2] and bounds[second][0] <= bounds[first][2] and
+                             bounds[first][1] <= bounds[second][3] and bounds[second][1] <= bounds[first][3]]
+
+
+def test_export_overlapping_map():
+    """
+    Tests that an export of a map with an intersection covering a road elsewhere in the map is refused
+    :return: Tests pass if export_xml raises and writes no file
+    """
+    roads, intersections = build_map()
+    corner = roads[2].generate_end_connection(20, 30)
+    road = corner.add_connection(3 * math.pi / 2, 100, 1, 1, 30, "west")
+    # generated intersections are as large as the length given, this one reaches back over the first road
+    large = road.generate_end_connection(120, 30)
+    roads.append(road)
+    intersections.extend([corner, large])
+    assert [(first, second) for first, second in find_overlaps(roads, intersections)
+            if first is roads[0]] == [(roads[0], large)]
+
+    location = "{}/temp.xml".format(os.path.dirname(__file__))
+    with pytest.raises(EX.XMLFormatError) as context:
+        export_xml(roads, intersections, location)
+    assert context.match('Roads or intersections overlap')
+    assert not os.path.isfile(location)